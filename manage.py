@@ -1,36 +1,40 @@
 #!/usr/bin/env python
 
-import glob
 import json
 import os
-import re
-from typing import Dict, Union
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 
 import click
-import requests
-from bs4 import BeautifulSoup
-from graphviz import Digraph
 
-from othello.board import Board
-from othello.game import Game
-from othello.openings_tree import OpeningsTree
+from othello.profiling import PROFILE_MODES, Profiler, print_hot_functions
+
+if TYPE_CHECKING:
+    from graphviz import Digraph
+
+# Commands import what they need when they run, so short commands like
+# `openings show` don't pay for loading numpy, PIL, flask or requests.
 
 PGN_FOLDER: str = "./pgn"
 
 
 def generate_tree(
-    dot: Digraph,
-    board: Board,
+    dot: "Digraph",
+    moves: List[int],
     node: Union[str, Dict[str, Union[dict, str]]],
     move_sequence: str = "",
 ) -> None:
-    board_name = board.get_image_file_name()
+    from othello.board import Board
+    from othello.replay import replay_cache
+
+    board = replay_cache.board(moves)
     board_name = board.write_image()
     dot.node(board_name, label="", shape="plaintext", image=board_name)
 
     if isinstance(node, str):
 
-        if node == "transposition":
+        # leaves without a score only end a line
+        if node in ["transposition", ""]:
             return
 
         child_name = board_name + node
@@ -39,117 +43,472 @@ def generate_tree(
         return
 
     for move, subtree in node.items():
-        child = board.do_move(Board.field_to_index(move))
-        child_name = child.write_image()
-        dot.node(child_name, label="", shape="plaintext", image=child_name)
-        dot.edge(board_name, child_name)
-
         move_sequence_prefix = move_sequence + " " + move
         try:
-            generate_tree(dot, child, subtree, move_sequence + " " + move)
+            child_moves = moves + [Board.field_to_index(move)]
+            child_name = replay_cache.board(child_moves).get_image_file_name()
+            dot.edge(board_name, child_name)
+
+            generate_tree(dot, child_moves, subtree, move_sequence_prefix)
         except ValueError as e:
             print(f"at {move_sequence_prefix}: {e}")
             exit(1)
 
 
 @click.group()
-def cli() -> None:
-    pass
+@click.option("--profile", type=click.Choice(PROFILE_MODES), default=None)
+@click.option("--profile-output", type=str, default="profile", show_default=True)
+@click.option("--profile-top", type=int, default=20, show_default=True)
+@click.pass_context
+def cli(
+    ctx: click.Context, profile: Optional[str], profile_output: str, profile_top: int
+) -> None:
+    if not profile:
+        return
 
+    profiler = Profiler(profile)
 
-@cli.command()
-def update_tree_images() -> None:
-    dot = Digraph(format="png")
-    board = Board()
+    def finish_profiling() -> None:
+        profiler.stop()
+        pstats_filename, collapsed_filename = profiler.write(profile_output)
+        print()
+        print_hot_functions(pstats_filename, profile_top)
+        print(f"Wrote {pstats_filename} and {collapsed_filename}")
 
-    with open("white.json", "r") as json_file:
-        tree_root = json.load(json_file)
+    ctx.call_on_close(finish_profiling)
+    profiler.start()
 
-    generate_tree(dot, board, tree_root)
-    dot.render("white", cleanup=True)
 
-    dot = Digraph(format="png")
-    board = Board()
+@cli.command()
+def update_tree_images() -> None:
+    from graphviz import Digraph
+
+    from othello.board import BLACK, WHITE
+    from othello.openings_tree import OpeningsTree
 
-    with open("black.json", "r") as json_file:
-        tree_root = json.load(json_file)
+    openings_tree = OpeningsTree.from_file("openings.json")
 
-    generate_tree(dot, board, tree_root)
-    dot.render("black", cleanup=True)
+    for color, name in [(WHITE, "white"), (BLACK, "black")]:
+        dot = Digraph(format="png")
+        generate_tree(dot, [], openings_tree.export_nested(color))
+        dot.render(name, cleanup=True)
 
 
 @cli.command()
 @click.argument("username", type=str)
-def download_playok_games(username: str) -> None:
-    response = requests.get(
-        f"https://www.playok.com/en/stat.phtml?u={username}&g=rv&sk=2"
-    )
-    response.raise_for_status()
-
-    soup = BeautifulSoup(response.text, "html.parser")
+@click.option("--workers", type=int, default=4, show_default=True)
+@click.option("--rate", type=float, default=4.0, show_default=True)
+def download_playok_games(username: str, workers: int, rate: float) -> None:
+    from othello.playok import PlayOKDownloader
 
-    downloaded_files = 0
+    downloader = PlayOKDownloader(PGN_FOLDER, workers=workers, requests_per_second=rate)
+    result = downloader.download(username)
 
-    for trs in soup.find_all("tr")[1:]:
-        tds = trs.findChildren("td")
-        date = tds[0].text.strip().split(" ")[0]
-        link = tds[-1].find("a", recursive=True)["href"]
+    for game_id, error in sorted(result.failed.items()):
+        print(f"Failed to download game {game_id}: {error}")
 
-        match = re.search("[0-9]+", link)
+    print(f"Downloaded {len(result.downloaded)} files in {result.seconds:.2f}s.")
 
-        if not match:
-            raise ValueError("regex didn't match")
 
-        game_id = match.group(0)
-        filename = os.path.join(PGN_FOLDER, date, game_id + ".pgn")
+@cli.command()
+@click.option("--clients", type=int, default=16, show_default=True)
+@click.option("--seconds", type=float, default=10.0, show_default=True)
+@click.option("--server", type=click.Choice(["subprocess", "thread"]), default=None)
+@click.option("--url", type=str, default=None)
+@click.option("--mistake-rate", type=float, default=0.2, show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+def loadtest(
+    clients: int,
+    seconds: float,
+    server: Optional[str],
+    url: Optional[str],
+    mistake_rate: float,
+    seed: int,
+) -> None:
+    from training.loadtest import Server, run_load_test
 
-        os.makedirs(os.path.join(PGN_FOLDER, date), exist_ok=True)
+    if url:
+        report = run_load_test(url, clients, seconds, mistake_rate, seed)
+    else:
+        with Server(server or "subprocess") as running_server:
+            report = run_load_test(
+                running_server.url, clients, seconds, mistake_rate, seed
+            )
+
+    print("endpoint         requests  errors    req/s   p50 ms   p95 ms   p99 ms")
+    for endpoint, stats in sorted(report.endpoints.items()):
+        print(
+            f"{endpoint:<15} {len(stats.latencies):>9} {stats.errors:>7} "
+            f"{report.throughput(endpoint):>8.1f} "
+            f"{1000 * stats.percentile(50):>8.1f} "
+            f"{1000 * stats.percentile(95):>8.1f} "
+            f"{1000 * stats.percentile(99):>8.1f}"
+        )
+
+    print()
+    print(
+        f"{report.requests()} requests in {report.seconds:.2f}s "
+        f"({report.throughput():.1f} req/s), {report.sessions} sessions "
+        f"with {clients} clients"
+    )
 
-        if os.path.exists(filename):
-            continue
 
-        game_response = requests.get(f"https://www.playok.com{link}")
-        game_response.raise_for_status()
+@cli.command()
+@click.option("--trace-memory", is_flag=True, help="Serve /api/debug/memory.")
+@click.option(
+    "--live-url",
+    type=str,
+    default=None,
+    help="WebSocket URL of manage.py liveserver, e.g. ws://localhost:5001/.",
+)
+def runserver(trace_memory: bool, live_url: Optional[str]) -> None:
+    if trace_memory:
+        from othello.memory import start_tracing
+
+        start_tracing()
 
-        with open(filename, "w") as game_file:
-            game_file.write(game_response.text)
+    from training.app import app
 
-        downloaded_files += 1
+    if live_url:
+        app.config["LIVE_URL"] = live_url
 
-    print(f"Downloaded {downloaded_files} files.")
+    app.run(host="0.0.0.0", port=5000, debug=True)
 
 
 @cli.command()
-def runserver() -> None:
-    from training.app import app
+@click.option("--host", type=str, default="0.0.0.0", show_default=True)
+@click.option("--port", type=int, default=5001, show_default=True)
+@click.option("--database", type=str, default=None)
+def liveserver(host: str, port: int, database: Optional[str]) -> None:
+    # a separate process next to runserver, which tells the page where to connect
+    import asyncio
 
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    from othello.mistakes import MistakeStore
+    from training.live import LiveServer
+
+    with MistakeStore() as mistake_store:
+        server = LiveServer(database=database, mistake_store=mistake_store)
+        print(f"Serving live boards on ws://{host}:{port}/")
+        print(f"Pass --live-url ws://HOST:{port}/ to manage.py runserver")
+        asyncio.run(server.run(host, port))
+
+
+@cli.command()
+@click.option("--steps", type=int, default=1000, show_default=True)
+def memory(steps: int) -> None:
+    from othello.memory import start_tracing
+
+    # tracing starts first, so everything below is attributed
+    start_tracing()
+
+    from othello.board import Board
+    from othello.memory import memory_usage
+    from othello.selfplay import xot_positions
+    from training.blueprints.api.views import (
+        load_openings,
+        memory_entries,
+        memory_sites,
+        training_step,
+    )
+    from training.steps import TrainingStepCache
+
+    # the structures of a server that trained the first steps of the book
+    openings = load_openings()
+    step_cache = TrainingStepCache(training_step)
+    board_ids = [
+        step["board"]
+        for lines in openings.steps.values()
+        for line in lines
+        for step in line
+    ]
+    for board_id in board_ids[:steps]:
+        step_cache.get(board_id)
+        openings.book.children(Board.from_id(board_id))
+
+    entries = memory_entries(step_cache)
+    entries["xot_positions"] = len(xot_positions())
+    usages = memory_usage(memory_sites() + [("xot_positions", xot_positions)], entries)
+
+    print("structure                bytes   entries  bytes/entry")
+    for usage in usages:
+        per_entry = usage.bytes_per_entry()
+        per_entry_text = f"{per_entry:.1f}" if per_entry is not None else "-"
+        print(
+            f"{usage.name:<18} {usage.size:>11} {usage.entries:>9} "
+            f"{per_entry_text:>12}"
+        )
 
 
 @cli.command()
 @click.argument("player_name", type=str)
 @click.argument("path", type=str)
+@click.option("--watch", is_flag=True)
+@click.option("--interval", type=float, default=2.0, show_default=True)
+@click.option("--debounce", type=float, default=1.0, show_default=True)
+@click.option("--database", type=str, default=None)
+@click.option("--queue", is_flag=True, help="Queue unknown positions, don't ask.")
 def check_pgn(
     player_name: str,
     path: str,
+    watch: bool,
+    interval: float,
+    debounce: float,
+    database: Optional[str],
+    queue: bool,
 ) -> None:
-
-    if os.path.isdir(path):
-        filenames = sorted(list(glob.glob(path + "/**/*.pgn")), reverse=True)
-    else:
-        filenames = [path]
+    from othello.archive import ARCHIVE_SUFFIX, GameArchive
+    from othello.game import Game
+    from othello.mistakes import MistakeStore
+    from othello.openings_tree import OpeningsTree
+    from othello.pgn_watch import PGNChecker
 
     openings_filename = "openings.json"
     openings_tree = OpeningsTree.from_file(openings_filename)
 
-    for i, filename in enumerate(filenames):
-        print(f"checking file {i+1}/{len(filenames)}: {filename}")
-        game = Game.from_pgn(filename)
+    if database:
+        # the book of player_name in the database, written as it changes
+        from othello.openings_db import SQLiteOpeningsTree
+
+        openings_tree = SQLiteOpeningsTree(database, player_name)
+
+    job_queue = None
+    if queue:
+        from othello.jobs import JobQueue
+
+        job_queue = JobQueue()
+
+    with MistakeStore() as mistake_store:
+        if path.endswith(ARCHIVE_SUFFIX):
+            with GameArchive(path) as archive:
+                for i, game in enumerate(archive):
+                    filename = game.metadata.get("Filename", "")
+                    print(f"checking game {i+1}/{len(archive)}: {filename}")
+                    openings_tree.check(game, player_name, mistake_store, job_queue)
+                    openings_tree.save(openings_filename)
+            return
+
+        if os.path.isdir(path):
+            # only new or changed files are checked, see othello/pgn_watch.py
+            checker = PGNChecker(
+                path,
+                openings_tree,
+                openings_filename,
+                player_name,
+                mistake_store,
+                job_queue,
+            )
+            checker.check_folder()
+
+            if watch:
+                print(f"watching {path} for new games")
+                checker.watch(interval, debounce)
+            return
 
-        openings_tree.check(game, player_name)
+        if watch:
+            raise click.UsageError("--watch needs a folder")
+
+        game = Game.from_pgn(path)
+        openings_tree.check(game, player_name, mistake_store, job_queue)
         openings_tree.save(openings_filename)
 
 
+@cli.command()
+@click.argument("archive", type=str)
+@click.option("--folder", type=str, default=PGN_FOLDER, show_default=True)
+def archive_pgn(archive: str, folder: str) -> None:
+    from othello.archive import ARCHIVE_SUFFIX, import_pgn_folder
+
+    if not archive.endswith(ARCHIVE_SUFFIX):
+        raise click.BadParameter(f"archive name should end with {ARCHIVE_SUFFIX}")
+
+    imported = import_pgn_folder(folder, archive)
+    print(f"Imported {imported} games into {archive}.")
+
+
+@cli.command()
+@click.argument("path", type=str)
+@click.option("--output", type=str, default=None, help="[default: eval_weights.npz]")
+@click.option("--iterations", type=int, default=100, show_default=True)
+@click.option("--regularization", type=float, default=1.0, show_default=True)
+def train_eval(
+    path: str, output: Optional[str], iterations: int, regularization: float
+) -> None:
+    from othello.archive import iter_games
+    from othello.eval import (
+        EVAL_WEIGHTS_FILENAME,
+        PHASE_COUNT,
+        collect_positions,
+        measure_throughput,
+        train,
+    )
+
+    output = output or EVAL_WEIGHTS_FILENAME
+    start = time.perf_counter()
+    me, opp, scores = collect_positions(iter_games(path))
+    print(f"Loaded {len(scores)} positions in {time.perf_counter() - start:.2f}s")
+
+    if len(scores) == 0:
+        return
+
+    evaluator, report = train(me, opp, scores, iterations, regularization)
+    evaluator.save(output)
+
+    print(f"Extracted features in {report.extract_seconds:.2f}s")
+    print(f"Fitted {PHASE_COUNT} phases in {report.fit_seconds:.2f}s")
+    print(f"Positions per phase: {report.phase_positions}")
+    print(f"RMSE: {report.rmse:.2f} discs")
+
+    single, batch = measure_throughput(evaluator, me, opp)
+    print(f"Evaluation: {single:.0f} positions/s single, {batch:.0f} positions/s batch")
+    print(f"Wrote {output}")
+
+
+@cli.command()
+@click.argument("names", type=str, nargs=-1)
+@click.option("--compare", "compare_baseline", is_flag=True)
+@click.option("--save", is_flag=True)
+@click.option("--baseline", type=str, default=None)
+@click.option("--threshold", type=float, default=0.25, show_default=True)
+@click.option("--min-time", type=float, default=0.1, show_default=True)
+def bench(
+    names: List[str],
+    compare_baseline: bool,
+    save: bool,
+    baseline: Optional[str],
+    threshold: float,
+    min_time: float,
+) -> None:
+    from othello.benchmark import (
+        BENCHMARK_BASELINE_FILENAME,
+        BENCHMARKS,
+        compare,
+        load_baseline,
+        run_benchmarks,
+        save_baseline,
+    )
+
+    for name in names:
+        if name not in BENCHMARKS:
+            raise click.BadParameter(f"unknown benchmark {name}", param_hint="NAMES")
+
+    baseline = baseline or BENCHMARK_BASELINE_FILENAME
+    results = run_benchmarks(list(names), min_time=min_time)
+
+    if save:
+        save_baseline(baseline, results)
+        print(f"Wrote {baseline}")
+
+    if not compare_baseline:
+        print("benchmark                    ns/op")
+        for result in results:
+            print(f"{result.name:<24} {result.nanoseconds:>9.0f}")
+        return
+
+    comparisons = compare(results, load_baseline(baseline), threshold, min_time)
+    regressions = 0
+
+    print("benchmark                 baseline    ns/op   change")
+    for comparison in comparisons:
+        ratio = comparison.ratio()
+        baseline_ns = f"{comparison.baseline:.0f}" if comparison.baseline else "-"
+        change = f"{100 * (ratio - 1):+.1f}%" if ratio is not None else "new"
+
+        marker = ""
+        if comparison.is_regression(threshold):
+            marker = "  REGRESSION"
+            regressions += 1
+
+        print(
+            f"{comparison.name:<24} {baseline_ns:>9} {comparison.current:>8.0f} "
+            f"{change:>8}{marker}"
+        )
+
+    if regressions:
+        raise click.ClickException(
+            f"{regressions} benchmarks regressed more than {100 * threshold:.0f}%"
+        )
+
+
+@cli.command()
+@click.option("--positions", type=int, default=1000, show_default=True)
+def bench_features(positions: int) -> None:
+    from othello.features import benchmark_features, random_boards
+
+    boards = random_boards(positions)
+
+    print("feature               single/s      batch/s")
+    for name, (single, batch) in benchmark_features(boards).items():
+        print(f"{name:<18} {single:>11.0f} {batch:>12.0f}")
+
+
+@cli.command()
+@click.argument("board_id", type=str)
+@click.option("--playouts", type=int, default=None)
+@click.option("--seconds", type=float, default=None)
+@click.option("--batch-size", type=int, default=0, show_default=True)
+@click.option("--seed", type=int, default=None)
+def suggest(
+    board_id: str,
+    playouts: Optional[int],
+    seconds: Optional[float],
+    batch_size: int,
+    seed: Optional[int],
+) -> None:
+    from othello.board import Board
+    from othello.mcts import MCTS
+
+    board = Board.from_id(board_id)
+    engine = MCTS(batch_size=batch_size, seed=seed)
+    result = engine.search(board, playouts=playouts, seconds=seconds)
+
+    print("move  visits  win %")
+    for move_stats in result.moves:
+        print(
+            f"{Board.index_to_field(move_stats.move):>4}  {move_stats.visits:>6}  "
+            f"{100 * move_stats.win_rate:>5.1f}"
+        )
+
+    print()
+    print(
+        f"{result.playouts} playouts in {result.seconds:.2f}s "
+        f"({result.playouts_per_second():.0f} playouts/s)"
+    )
+
+
+@cli.command()
+@click.option("--games", type=int, required=True)
+@click.option("--jobs", type=int, default=os.cpu_count() or 1, show_default=True)
+@click.option("--output", type=str, default="selfplay.oga", show_default=True)
+@click.option("--policy", type=click.Choice(["random", "mcts"]), default="random")
+@click.option("--playouts", type=int, default=100, show_default=True)
+@click.option("--xot", is_flag=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--checkpoint", type=int, default=1000, show_default=True)
+def selfplay(
+    games: int,
+    jobs: int,
+    output: str,
+    policy: str,
+    playouts: int,
+    xot: bool,
+    seed: int,
+    checkpoint: int,
+) -> None:
+    from othello.selfplay import SelfPlayConfig, generate_games
+
+    config = SelfPlayConfig(policy=policy, playouts=playouts, xot=xot, seed=seed)
+    report = generate_games(output, games, jobs, config, checkpoint)
+
+    if report.skipped:
+        print(f"Resumed after {report.skipped} games already in {output}")
+
+    print(
+        f"Generated {report.games} games in {report.seconds:.2f}s with {jobs} jobs "
+        f"({report.games_per_second():.1f} games/s, "
+        f"{report.games_per_second_per_core():.1f} games/s per core)"
+    )
+
+
 @cli.group()
 def openings() -> None:
     pass
@@ -158,9 +517,332 @@ def openings() -> None:
 @openings.command()
 @click.argument("board_id", type=str)
 def show(board_id: str) -> None:
+    from othello.board import Board
+
     board = Board.from_id(board_id)
     board.show()
 
 
+@openings.command()
+@click.argument("filename", type=str)
+@click.option("--color", type=click.Choice(["white", "black"]), required=True)
+def import_nested(filename: str, color: str) -> None:
+    from othello.board import BLACK, WHITE
+    from othello.openings_tree import OpeningsTree
+
+    openings_filename = "openings.json"
+    openings_tree = OpeningsTree.from_file(openings_filename)
+    before = len(openings_tree.data["openings"])
+
+    with open(filename, "r") as json_file:
+        nested = json.load(json_file)
+
+    conflicts, invalid = openings_tree.import_nested(
+        nested, {"white": WHITE, "black": BLACK}[color]
+    )
+    openings_tree.save(openings_filename)
+
+    for board_id in conflicts:
+        print(f"Kept existing best child for {board_id}")
+    for board_id in invalid:
+        print(f"Skipped illegal move after {board_id}")
+
+    added = len(openings_tree.data["openings"]) - before
+    print(f"Added {added} boards to {openings_filename}.")
+
+
+@openings.command()
+@click.argument("user", type=str)
+@click.option("--database", type=str, default="openings.sqlite3", show_default=True)
+@click.option(
+    "--input", "input_filename", type=str, default="openings.json", show_default=True
+)
+def import_json(user: str, database: str, input_filename: str) -> None:
+    from othello.openings_db import SQLiteOpeningsTree
+    from othello.openings_tree import OpeningsTree
+
+    openings_tree = OpeningsTree.from_file(input_filename)
+    book = SQLiteOpeningsTree(database, user)
+
+    with book.batch():
+        for board_id, entry in openings_tree.entries():
+            book.set_entry(board_id, entry)
+
+    print(f"{user} has {len(book)} boards in {database}.")
+
+
+@openings.command()
+@click.option("--color", type=click.Choice(["white", "black"]), required=True)
+@click.option("--output", type=str, default=None)
+def export_nested(color: str, output: Optional[str]) -> None:
+    from othello.board import BLACK, WHITE
+    from othello.openings_tree import OpeningsTree
+
+    openings_tree = OpeningsTree.from_file("openings.json")
+    nested = openings_tree.export_nested({"white": WHITE, "black": BLACK}[color])
+
+    if not output:
+        print(json.dumps(nested, indent=4))
+        return
+
+    with open(output, "w") as json_file:
+        json.dump(nested, json_file, indent=4)
+        json_file.write("\n")
+
+
+@openings.command()
+@click.option("--color", type=click.Choice(["white", "black"]), required=True)
+@click.option("--depth", type=int, required=True)
+@click.option("--top", type=int, default=25, show_default=True)
+@click.option("--buffer-size", type=int, default=1_000_000, show_default=True)
+@click.option("--tmp-dir", type=str, default=None)
+@click.option("--enqueue", is_flag=True, help="Queue the gaps for `openings expand`.")
+def coverage(
+    color: str,
+    depth: int,
+    top: int,
+    buffer_size: int,
+    tmp_dir: Optional[str],
+    enqueue: bool,
+) -> None:
+    from othello.board import BLACK, WHITE
+    from othello.coverage import CoverageAnalysis
+    from othello.openings_tree import OpeningsTree
+
+    openings_tree = OpeningsTree.from_file("openings.json")
+    analysis = CoverageAnalysis(
+        openings_tree,
+        {"white": WHITE, "black": BLACK}[color],
+        buffer_size=buffer_size,
+        max_gaps=top,
+        directory=tmp_dir,
+    )
+
+    gaps = analysis.run(depth)
+    stats = analysis.stats
+
+    print("ply  positions  expanded  duplicates  gaps")
+    for level in stats.levels:
+        print(
+            f"{level.ply:>3}  {level.positions:>9}  {level.expanded:>8}  "
+            f"{level.duplicates:>10}  {level.gaps:>4}"
+        )
+
+    print()
+    print(
+        f"{stats.nodes} nodes in {stats.seconds:.2f}s "
+        f"({stats.nodes_per_second():.0f} nodes/s), "
+        f"{stats.spilled_runs} spilled runs"
+    )
+
+    print()
+    print(f"Top {len(gaps)} of {stats.gaps} gaps:")
+    print("rank  ply  reach %   lines  board")
+    for rank, gap in enumerate(gaps, 1):
+        print(
+            f"{rank:>4}  {gap.ply:>3}  {100 * gap.weight:>7.3f}  {gap.lines:>6}  "
+            f"{gap.board.to_id()}"
+        )
+
+    if enqueue:
+        from othello.jobs import JobQueue
+
+        # gaps reached by more lines are expanded first
+        with JobQueue() as job_queue:
+            for gap in gaps:
+                job_queue.add(gap.board, priority=gap.lines)
+        print()
+        print(f"Queued {len(gaps)} gaps.")
+
+
+def describe_entry(board_id: str, entry: Optional[Dict[str, str]]) -> str:
+    from othello.openings_merge import best_move_field
+
+    if not entry:
+        return "-"
+
+    move = best_move_field(board_id, entry["best_child"])
+    if "score" in entry:
+        return f"{move} ({entry['score']})"
+    return move
+
+
+@openings.command()
+@click.argument("lhs", type=str)
+@click.argument("rhs", type=str)
+@click.option("--buffer-size", type=int, default=1_000_000, show_default=True)
+@click.option("--tmp-dir", type=str, default=None)
+def diff(lhs: str, rhs: str, buffer_size: int, tmp_dir: Optional[str]) -> None:
+    # books are JSON files or DATABASE:USER
+    from othello.openings_merge import DiffReport, diff_books, merged_entries, open_book
+
+    def show(kind: str, board_id: str, entries: List[Optional[Dict[str, str]]]) -> None:
+        moves = "  ".join(describe_entry(board_id, entry) for entry in entries)
+        print(f"{kind} {board_id}  {moves}")
+
+    merged = merged_entries([open_book(lhs), open_book(rhs)], buffer_size, tmp_dir)
+    report = diff_books(merged, DiffReport(), show)
+
+    print(
+        f"{report.removed} removed, {report.added} added, {report.changed} changed, "
+        f"{report.rescored} with another score, {report.same} the same"
+    )
+
+
+@openings.command()
+@click.argument("books", type=str, nargs=-1, required=True)
+@click.option("--output", type=str, required=True)
+@click.option(
+    "--policy",
+    type=click.Choice(["first", "last", "strict"]),
+    default="first",
+    show_default=True,
+    help="Which book wins a conflict, strict leaves conflicts out.",
+)
+@click.option("--buffer-size", type=int, default=1_000_000, show_default=True)
+@click.option("--tmp-dir", type=str, default=None)
+def merge(
+    books: List[str],
+    output: str,
+    policy: str,
+    buffer_size: int,
+    tmp_dir: Optional[str],
+) -> None:
+    from othello.openings_merge import (
+        MergeReport,
+        merge_books,
+        merged_entries,
+        open_book,
+        write_book,
+    )
+
+    def show_conflict(
+        board_id: str, entries: List[Optional[Dict[str, str]]], invalid: List[int]
+    ) -> None:
+        moves = "  ".join(describe_entry(board_id, entry) for entry in entries)
+        print(f"! {board_id}  {moves}")
+        for index in invalid:
+            print(f"  {books[index]} has an illegal best child")
+
+    merged = merged_entries([open_book(book) for book in books], buffer_size, tmp_dir)
+    report = MergeReport()
+    write_book(output, merge_books(merged, policy, report, show_conflict))
+
+    print(
+        f"Merged {report.positions} positions into {output}, "
+        f"{report.conflicts} conflicts"
+    )
+    if report.unresolved:
+        raise click.ClickException(f"left out {report.unresolved} conflicts")
+
+
+@openings.command(name="expand")
+@click.option("--jobs", type=int, default=os.cpu_count() or 1, show_default=True)
+@click.option("--batch-size", type=int, default=10, show_default=True)
+@click.option("--limit", type=int, default=None)
+@click.option("--evaluator", type=click.Choice(["endgame", "mcts"]), default="endgame")
+@click.option("--max-empties", type=int, default=12, show_default=True)
+@click.option("--playouts", type=int, default=1000, show_default=True)
+@click.option("--stale-after", type=float, default=3600.0, show_default=True)
+def expand_openings(
+    jobs: int,
+    batch_size: int,
+    limit: Optional[int],
+    evaluator: str,
+    max_empties: int,
+    playouts: int,
+    stale_after: float,
+) -> None:
+    from othello.jobs import ExpansionReport, JobQueue, expand, get_evaluator
+    from othello.openings_tree import OpeningsTree
+
+    openings_filename = "openings.json"
+    openings_tree = OpeningsTree.from_file(openings_filename)
+
+    def print_progress(report: ExpansionReport, counts: Dict[str, int]) -> None:
+        print(
+            f"added {report.added}, unsolved {report.unsolved}, "
+            f"{counts['queued']} queued, {counts['running']} running "
+            f"({report.positions_per_second():.1f} positions/s)"
+        )
+
+    with JobQueue() as job_queue:
+        # other runs may share the queue, only jobs claimed long ago were interrupted
+        recovered = job_queue.recover(stale_after)
+        if recovered:
+            print(f"Resuming {recovered} interrupted jobs")
+
+        report = expand(
+            job_queue,
+            openings_tree,
+            openings_filename,
+            get_evaluator(evaluator, max_empties, playouts),
+            jobs,
+            batch_size,
+            limit,
+            print_progress,
+        )
+
+    print(
+        f"Added {report.added} positions in {report.seconds:.2f}s with {jobs} jobs "
+        f"({report.positions_per_second():.1f} positions/s), "
+        f"{report.unsolved} unsolved, {report.skipped} already in the book"
+    )
+
+
+@openings.command()
+@click.argument("path", type=str)
+@click.option("--player", type=str, required=True)
+@click.option("--book", type=str, default="openings.json", show_default=True)
+@click.option("--jobs", type=int, default=os.cpu_count() or 1, show_default=True)
+@click.option("--chunk-size", type=int, default=64, show_default=True)
+@click.option("--top", type=int, default=25, show_default=True)
+@click.option("--examples", type=int, default=3, show_default=True)
+def novelties(
+    path: str,
+    player: str,
+    book: str,
+    jobs: int,
+    chunk_size: int,
+    top: int,
+    examples: int,
+) -> None:
+    from othello.novelties import find_novelties
+
+    report = find_novelties(path, player, book, jobs, chunk_size, examples)
+
+    print(
+        f"Scanned {report.games + report.skipped} games in {report.seconds:.2f}s "
+        f"with {jobs} jobs ({report.games_per_second():.0f} games/s), "
+        f"{report.in_book} of {report.games} stayed in the book, "
+        f"{report.skipped} skipped"
+    )
+
+    stats = report.top(top)
+    print()
+    print(f"Top {len(stats)} of {len(report.novelties)} novelties:")
+    print("rank  ply  kind     games  win %  board")
+    for rank, novelty in enumerate(stats, 1):
+        print(
+            f"{rank:>4}  {novelty.ply:>3}  {novelty.kind:<7}  {novelty.games:>5}  "
+            f"{100 * novelty.win_rate():>5.1f}  {novelty.position}"
+        )
+        print(f"      line: {novelty.line or '-'}")
+        print(f"      games: {', '.join(novelty.examples)}")
+
+
+@openings.command()
+@click.option("--requeue", is_flag=True, help="Queue the unsolved jobs again.")
+def queue(requeue: bool) -> None:
+    from othello.jobs import JobQueue
+
+    with JobQueue() as job_queue:
+        if requeue:
+            print(f"Queued {job_queue.requeue()} unsolved jobs again")
+
+        for state, count in job_queue.progress().items():
+            print(f"{state:>8}  {count}")
+
+
 if __name__ == "__main__":
     cli()
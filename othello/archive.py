@@ -0,0 +1,298 @@
+import glob
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from othello.board import MOVE_PASS, Board
+from othello.game import Game
+
+ARCHIVE_MAGIC = b"OTHGAME1"
+ARCHIVE_SUFFIX = ".oga"
+
+# magic, index offset (0 while unfinalized), game count, reserved
+HEADER_FORMAT = "<8sQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# metadata length, move count
+RECORD_HEADER_FORMAT = "<HB"
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+
+INDEX_ENTRY_SIZE = 8
+
+PASS_BYTE = 64
+
+
+class GameArchiveError(Exception):
+    pass
+
+
+def encode_moves(moves: List[str]) -> bytes:
+    encoded = bytearray()
+    for move in moves:
+        index = Board.field_to_index(move)
+        encoded.append(PASS_BYTE if index == MOVE_PASS else index)
+    return bytes(encoded)
+
+
+def decode_moves(encoded: bytes) -> List[str]:
+    return [
+        Board.index_to_field(MOVE_PASS if byte == PASS_BYTE else byte)
+        for byte in encoded
+    ]
+
+
+def encode_metadata(metadata: Dict[str, str]) -> bytes:
+    fields: List[str] = []
+    for key, value in metadata.items():
+        fields += [key, value]
+    return "\0".join(fields).encode()
+
+
+def decode_metadata(encoded: bytes) -> Dict[str, str]:
+    if not encoded:
+        return {}
+    fields = encoded.decode().split("\0")
+    return dict(zip(fields[::2], fields[1::2]))
+
+
+def encode_record(moves: List[str], metadata: Dict[str, str]) -> bytes:
+    encoded_metadata = encode_metadata(metadata)
+    encoded_moves = encode_moves(moves)
+
+    if len(encoded_metadata) > 0xFFFF or len(encoded_moves) > 0xFF:
+        raise GameArchiveError("game too large for archive record")
+
+    header = struct.pack(
+        RECORD_HEADER_FORMAT, len(encoded_metadata), len(encoded_moves)
+    )
+    return header + encoded_metadata + encoded_moves
+
+
+def scan_records(
+    buffer: Union[bytes, mmap.mmap], start: int, end: int
+) -> Iterator[Tuple[int, int]]:
+    # yields (offset, size) of every complete record, stops at a truncated one
+    offset = start
+    while offset + RECORD_HEADER_SIZE <= end:
+        metadata_length, move_count = struct.unpack_from(
+            RECORD_HEADER_FORMAT, buffer, offset
+        )
+        size = RECORD_HEADER_SIZE + metadata_length + move_count
+
+        if offset + size > end:
+            return
+
+        yield offset, size
+        offset += size
+
+
+class GameArchive:
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.file = open(filename, "rb")
+
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self.file.close()
+            raise GameArchiveError(f"{filename}: empty archive") from e
+
+        magic, index_offset, game_count, _ = struct.unpack_from(
+            HEADER_FORMAT, self.buffer, 0
+        )
+
+        if magic != ARCHIVE_MAGIC:
+            self.close()
+            raise GameArchiveError(f"{filename}: not a game archive")
+
+        self.index_offset: int = index_offset
+        self.game_count: int = game_count
+        self.rebuilt_offsets: Optional[List[int]] = None
+
+        # unfinalized headers have index offset 0 and a count that may be stale
+        if (
+            index_offset >= HEADER_SIZE
+            and index_offset + game_count * INDEX_ENTRY_SIZE == len(self.buffer)
+        ):
+            self.records_end = index_offset
+        else:
+            # writer was interrupted before finalizing, rebuild index in memory
+            self.records_end = HEADER_SIZE
+            self.rebuilt_offsets = []
+
+            for offset, size in scan_records(
+                self.buffer, HEADER_SIZE, len(self.buffer)
+            ):
+                self.rebuilt_offsets.append(offset)
+                self.records_end = offset + size
+
+            self.game_count = len(self.rebuilt_offsets)
+
+    def __enter__(self) -> "GameArchive":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.buffer.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.game_count
+
+    def offset(self, index: int) -> int:
+        if index < 0:
+            index += self.game_count
+
+        if not 0 <= index < self.game_count:
+            raise IndexError("game index out of range")
+
+        if self.rebuilt_offsets is not None:
+            return self.rebuilt_offsets[index]
+
+        entry_offset = self.index_offset + index * INDEX_ENTRY_SIZE
+        offset: int = struct.unpack_from("<Q", self.buffer, entry_offset)[0]
+        return offset
+
+    def _read_record(self, offset: int) -> Tuple[Dict[str, str], List[str]]:
+        metadata_length, move_count = struct.unpack_from(
+            RECORD_HEADER_FORMAT, self.buffer, offset
+        )
+        metadata_start = offset + RECORD_HEADER_SIZE
+        moves_start = metadata_start + metadata_length
+
+        metadata = decode_metadata(self.buffer[metadata_start:moves_start])
+        moves = decode_moves(self.buffer[moves_start : moves_start + move_count])
+        return metadata, moves
+
+    def metadata(self, index: int) -> Dict[str, str]:
+        return self._read_record(self.offset(index))[0]
+
+    def __getitem__(self, index: int) -> Game:
+        metadata, moves = self._read_record(self.offset(index))
+        return Game.from_moves(moves, metadata)
+
+    def __iter__(self) -> Iterator[Game]:
+        for offset, _ in scan_records(self.buffer, HEADER_SIZE, self.records_end):
+            metadata, moves = self._read_record(offset)
+            yield Game.from_moves(moves, metadata)
+
+
+class GameArchiveWriter:
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.offsets: List[int] = []
+
+        if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+            self.file = open(filename, "w+b")
+            self.file.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, 0, 0, 0))
+            self.end = HEADER_SIZE
+            self.finalized = False
+            return
+
+        with GameArchive(filename) as archive:
+            self.offsets = [archive.offset(i) for i in range(len(archive))]
+            self.end = archive.records_end
+            self.finalized = archive.rebuilt_offsets is None
+
+        self.file = open(filename, "r+b")
+
+    def __enter__(self) -> "GameArchiveWriter":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _write_header(self, index_offset: int) -> None:
+        self.file.seek(0)
+        self.file.write(
+            struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, index_offset, len(self), 0)
+        )
+
+    def add(self, game: Game) -> None:
+        self.add_record(game.moves, game.metadata)
+
+    def add_record(self, moves: List[str], metadata: Dict[str, str]) -> None:
+        # like add(), without replaying the moves into a Game first
+        record = encode_record(moves, metadata)
+
+        if self.finalized:
+            # drop the index and any partially written record before appending
+            self.file.truncate(self.end)
+            self._write_header(0)
+            self.finalized = False
+
+        self.file.seek(self.end)
+        self.file.write(record)
+        self.offsets.append(self.end)
+        self.end += len(record)
+
+    def _finalize(self) -> None:
+        if self.finalized:
+            return
+
+        self.file.seek(self.end)
+        self.file.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+        self.file.truncate()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        self._write_header(self.end)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.finalized = True
+
+    def flush(self) -> None:
+        # checkpoint: afterwards the archive is readable even if the process dies
+        self._finalize()
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+
+        self._finalize()
+        self.file.close()
+
+
+def import_pgn_folder(folder: str, archive_filename: str) -> int:
+    filenames = sorted(glob.glob(os.path.join(folder, "**/*.pgn"), recursive=True))
+    imported = 0
+
+    known_filenames: Set[str] = set()
+    if os.path.exists(archive_filename):
+        with GameArchive(archive_filename) as archive:
+            for i in range(len(archive)):
+                known_filenames.add(archive.metadata(i).get("Filename", ""))
+
+    with GameArchiveWriter(archive_filename) as writer:
+        for filename in filenames:
+            relative_filename = os.path.relpath(filename, folder)
+            if relative_filename in known_filenames:
+                continue
+
+            game = Game.from_pgn(filename)
+            game.metadata["Filename"] = relative_filename
+            writer.add(game)
+            imported += 1
+
+    return imported
+
+
+def iter_games(path: str) -> Iterator[Game]:
+    if path.endswith(ARCHIVE_SUFFIX):
+        with GameArchive(path) as archive:
+            yield from archive
+        return
+
+    if os.path.isdir(path):
+        filenames = sorted(glob.glob(os.path.join(path, "**/*.pgn"), recursive=True))
+    else:
+        filenames = [path]
+
+    for filename in filenames:
+        yield Game.from_pgn(filename)
@@ -0,0 +1,295 @@
+import gc
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from othello.bits import bits_rotate
+from othello.board import BLACK, WHITE, Board
+from othello.features import random_boards
+from othello.game import Game
+from othello.openings_tree import OpeningsTree
+from othello.selfplay import SelfPlayConfig, play_game
+
+BENCHMARK_BASELINE_FILENAME = "benchmarks/baseline.json"
+
+CORPUS_SIZE = 200
+CORPUS_SEED = 0
+
+# a benchmark setup builds its inputs once and returns (run, operations per run)
+BenchmarkRun = Tuple[Callable[[], object], int]
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    nanoseconds: float
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: Optional[float]
+    current: float
+
+    def ratio(self) -> Optional[float]:
+        if not self.baseline:
+            return None
+        return self.current / self.baseline
+
+    def is_regression(self, threshold: float) -> bool:
+        ratio = self.ratio()
+        return ratio is not None and ratio > 1 + threshold
+
+
+def corpus() -> List[Board]:
+    return random_boards(CORPUS_SIZE, CORPUS_SEED)
+
+
+def pgn_string(index: int) -> str:
+    moves, metadata = play_game(index, SelfPlayConfig(seed=CORPUS_SEED))
+    lines = [f'[{key} "{value}"]' for key, value in metadata.items()]
+    lines.append("")
+
+    numbered: List[str] = []
+    for offset in range(0, len(moves), 2):
+        numbered.append(f"{offset // 2 + 1}. " + " ".join(moves[offset : offset + 2]))
+    lines.append(" ".join(numbered))
+    return "\n".join(lines) + "\n"
+
+
+def corpus_tree() -> OpeningsTree:
+    # every corpus board with a move mapped to a (deterministically) random child
+    rng = random.Random(CORPUS_SEED)
+    tree = OpeningsTree()
+    for board in corpus():
+        children = board.get_children()
+        if children:
+            tree.upsert(board, rng.choice(children))
+    return tree
+
+
+def setup_get_moves() -> BenchmarkRun:
+    boards = corpus()
+    return lambda: [board.get_moves() for board in boards], len(boards)
+
+
+def setup_do_move() -> BenchmarkRun:
+    pairs = [
+        (board, move)
+        for board in corpus()
+        for move in range(64)
+        if board.get_moves() & (1 << move)
+    ]
+    return lambda: [board.do_move(move) for board, move in pairs], len(pairs)
+
+
+def setup_normalized() -> BenchmarkRun:
+    boards = corpus()
+    return lambda: [board.normalized() for board in boards], len(boards)
+
+
+def setup_from_id() -> BenchmarkRun:
+    ids = [board.to_id() for board in corpus()]
+    return lambda: [Board.from_id(board_id) for board_id in ids], len(ids)
+
+
+def setup_to_id() -> BenchmarkRun:
+    boards = corpus()
+    return lambda: [board.to_id() for board in boards], len(boards)
+
+
+def setup_from_compact_id() -> BenchmarkRun:
+    ids = [board.to_compact_id() for board in corpus()]
+    return lambda: [Board.from_id(board_id) for board_id in ids], len(ids)
+
+
+def setup_to_compact_id() -> BenchmarkRun:
+    boards = corpus()
+    return lambda: [board.to_compact_id() for board in boards], len(boards)
+
+
+def setup_bits_rotate() -> BenchmarkRun:
+    discs = [board.me for board in corpus()]
+
+    def run() -> None:
+        for x in discs:
+            for rotation in range(8):
+                bits_rotate(x, rotation)
+
+    return run, 8 * len(discs)
+
+
+def setup_tree_lookup() -> BenchmarkRun:
+    tree = corpus_tree()
+    boards = corpus()
+    return lambda: [tree.lookup(board) for board in boards], len(boards)
+
+
+def setup_tree_validate() -> BenchmarkRun:
+    tree = corpus_tree()
+    return tree.validate, len(tree.data["openings"])
+
+
+def setup_tree_save() -> BenchmarkRun:
+    tree = corpus_tree()
+
+    # the directory is removed once the run function is garbage collected
+    directory = tempfile.TemporaryDirectory()
+
+    def run() -> None:
+        tree.save(os.path.join(directory.name, "openings.json"))
+
+    return run, len(tree.data["openings"])
+
+
+def setup_game_from_pgn() -> BenchmarkRun:
+    directory = tempfile.TemporaryDirectory()
+    filenames: List[str] = []
+    for index in range(20):
+        filename = os.path.join(directory.name, f"{index}.pgn")
+        with open(filename, "w") as file:
+            file.write(pgn_string(index))
+        filenames.append(filename)
+
+    def run() -> None:
+        assert directory
+        for filename in filenames:
+            Game.from_pgn(filename)
+
+    return run, len(filenames)
+
+
+def setup_svg_render() -> BenchmarkRun:
+    from training.app import app
+
+    client = app.test_client()
+    urls = [f"/svg/boards/{board.to_id()}" for board in corpus()[:50]]
+    return lambda: [client.get(url) for url in urls], len(urls)
+
+
+def setup_read_openings() -> BenchmarkRun:
+    from training.blueprints.api import views
+
+    def run() -> None:
+        # a cold load every run, a hit in the openings cache costs next to nothing
+        views._openings_cache.clear()
+        views.read_openings(WHITE)
+        views.read_openings(BLACK)
+
+    return run, 2
+
+
+BENCHMARKS: Dict[str, Callable[[], BenchmarkRun]] = {
+    "board.get_moves": setup_get_moves,
+    "board.do_move": setup_do_move,
+    "board.normalized": setup_normalized,
+    "board.from_id": setup_from_id,
+    "board.to_id": setup_to_id,
+    "board.from_compact_id": setup_from_compact_id,
+    "board.to_compact_id": setup_to_compact_id,
+    "bits.bits_rotate": setup_bits_rotate,
+    "openings_tree.lookup": setup_tree_lookup,
+    "openings_tree.validate": setup_tree_validate,
+    "openings_tree.save": setup_tree_save,
+    "game.from_pgn": setup_game_from_pgn,
+    "svg.board_image": setup_svg_render,
+    "api.read_openings": setup_read_openings,
+}
+
+
+def measure(
+    run: Callable[[], object], operations: int, min_time: float, repeats: int
+) -> float:
+    # nanoseconds per operation, best of several repeats to filter out noise
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+            loops *= 2
+
+        best = elapsed
+        for _ in range(repeats - 1):
+            start = time.perf_counter()
+            for _ in range(loops):
+                run()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return 1e9 * best / (loops * operations)
+
+
+def run_benchmarks(
+    names: Optional[List[str]] = None, min_time: float = 0.1, repeats: int = 5
+) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    for name, setup in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+
+        run, operations = setup()
+        results.append(
+            BenchmarkResult(name, measure(run, operations, min_time, repeats))
+        )
+    return results
+
+
+def load_baseline(filename: str) -> Dict[str, float]:
+    with open(filename, "r") as file:
+        baseline: Dict[str, float] = json.load(file)["benchmarks"]
+    return baseline
+
+
+def save_baseline(filename: str, results: List[BenchmarkResult]) -> None:
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": {result.name: round(result.nanoseconds, 1) for result in results},
+    }
+
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(filename, "w") as file:
+        json.dump(data, file, indent=4)
+        file.write("\n")
+
+
+def compare(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, float],
+    threshold: float,
+    min_time: float = 0.1,
+    retries: int = 2,
+) -> List[Comparison]:
+    # apparent regressions are measured again, a single noisy run should not fail
+    comparisons: List[Comparison] = []
+    for result in results:
+        comparison = Comparison(
+            result.name, baseline.get(result.name), result.nanoseconds
+        )
+
+        for _ in range(retries):
+            if not comparison.is_regression(threshold):
+                break
+
+            run, operations = BENCHMARKS[result.name]()
+            comparison.current = min(
+                comparison.current, measure(run, operations, min_time, 5)
+            )
+
+        comparisons.append(comparison)
+    return comparisons
@@ -1,3 +1,6 @@
+from typing import List
+
+
 def flip_horizontally(x: int) -> int:
     k1 = 0x5555555555555555
     k2 = 0x3333333333333333
@@ -41,6 +44,68 @@ def bits_rotate(x: int, rotation: int) -> int:
     return x
 
 
+def bits_rotations(x: int) -> List[int]:
+    # bits_rotate(x, rotation) for all 8 rotations, sharing their common flips
+    horizontal = flip_horizontally(x)
+    flat = [x, horizontal, flip_vertically(x), flip_vertically(horizontal)]
+    return flat + [flip_diagonally(y) for y in flat]
+
+
+def get_moves(me: int, opp: int) -> int:
+    # works on python ints as well as numpy uint64 arrays
+    mask = opp & 0x7E7E7E7E7E7E7E7E
+
+    flipL = mask & (me << 1)
+    flipL |= mask & (flipL << 1)
+    maskL = mask & (mask << 1)
+    flipL |= maskL & (flipL << (2 * 1))
+    flipL |= maskL & (flipL << (2 * 1))
+    flipR = mask & (me >> 1)
+    flipR |= mask & (flipR >> 1)
+    maskR = mask & (mask >> 1)
+    flipR |= maskR & (flipR >> (2 * 1))
+    flipR |= maskR & (flipR >> (2 * 1))
+    movesSet = (flipL << 1) | (flipR >> 1)
+
+    flipL = mask & (me << 7)
+    flipL |= mask & (flipL << 7)
+    maskL = mask & (mask << 7)
+    flipL |= maskL & (flipL << (2 * 7))
+    flipL |= maskL & (flipL << (2 * 7))
+    flipR = mask & (me >> 7)
+    flipR |= mask & (flipR >> 7)
+    maskR = mask & (mask >> 7)
+    flipR |= maskR & (flipR >> (2 * 7))
+    flipR |= maskR & (flipR >> (2 * 7))
+    movesSet |= (flipL << 7) | (flipR >> 7)
+
+    flipL = mask & (me << 9)
+    flipL |= mask & (flipL << 9)
+    maskL = mask & (mask << 9)
+    flipL |= maskL & (flipL << (2 * 9))
+    flipL |= maskL & (flipL << (2 * 9))
+    flipR = mask & (me >> 9)
+    flipR |= mask & (flipR >> 9)
+    maskR = mask & (mask >> 9)
+    flipR |= maskR & (flipR >> (2 * 9))
+    flipR |= maskR & (flipR >> (2 * 9))
+    movesSet |= (flipL << 9) | (flipR >> 9)
+
+    flipL = opp & (me << 8)
+    flipL |= opp & (flipL << 8)
+    maskL = opp & (opp << 8)
+    flipL |= maskL & (flipL << (2 * 8))
+    flipL |= maskL & (flipL << (2 * 8))
+    flipR = opp & (me >> 8)
+    flipR |= opp & (flipR >> 8)
+    maskR = opp & (opp >> 8)
+    flipR |= maskR & (flipR >> (2 * 8))
+    flipR |= maskR & (flipR >> (2 * 8))
+    movesSet |= (flipL << 8) | (flipR >> 8)
+
+    return movesSet & ~(me | opp) & 0xFFFFFFFFFFFFFFFF
+
+
 def show_bits(b: int) -> None:
     print("+-a-b-c-d-e-f-g-h-+")
     for y in range(8):
@@ -1,11 +1,13 @@
+import base64
+import binascii
 import json
 import random
+import re
+import struct
 from dataclasses import dataclass
 from typing import List, Set, Tuple
 
-from PIL import Image, ImageDraw
-
-from othello.bits import bits_rotate
+from othello.bits import bits_rotate, get_moves
 
 BLACK = 0
 WHITE = 1
@@ -14,6 +16,47 @@ VALID_MOVE = 3
 
 MOVE_PASS = -1
 
+ID_LENGTH = 33
+
+# turn, then 22 chars of url-safe base64 for the 16 bytes of discs
+COMPACT_ID_LENGTH = 23
+
+# the last char holds the last 2 bits of the discs, its 4 padding bits are zero
+COMPACT_DISCS = re.compile("[A-Za-z0-9_-]{21}[AQgw]")
+
+# turn byte, then black and white discs as big endian 64 bit integers
+KEY_SIZE = 17
+
+
+def parse_id(board_id: str) -> Tuple[int, int, int]:
+    # black discs, white discs and turn of a board ID in either format
+    if len(board_id) == ID_LENGTH:
+        try:
+            blacks = int(board_id[1:17], 16)
+            whites = int(board_id[17:33], 16)
+        except ValueError as e:
+            raise ValueError("unexpected base 16 char in discs") from e
+
+    elif len(board_id) == COMPACT_ID_LENGTH:
+        # the decoder skips invalid chars and ignores the padding bits, only the
+        # canonical encoding is accepted
+        if not COMPACT_DISCS.fullmatch(board_id, 1):
+            raise ValueError("unexpected base 64 char in discs")
+
+        # urlsafe_b64decode translates to the standard alphabet much slower
+        standard = board_id[1:].replace("-", "+").replace("_", "/")
+        blacks, whites = struct.unpack("!QQ", binascii.a2b_base64(standard + "=="))
+
+    else:
+        raise ValueError("unexpected id length")
+
+    if board_id[0] == "B":
+        return blacks, whites, BLACK
+    if board_id[0] == "W":
+        return blacks, whites, WHITE
+
+    raise ValueError("unexpected turn value")
+
 
 @dataclass
 class Board:
@@ -54,21 +97,21 @@ class Board:
         if id_str == "xot":
             return Board.from_xot()
 
-        if len(id_str) != 33:
-            raise ValueError("unexpected id length")
+        blacks, whites, turn = parse_id(id_str)
+        if turn == BLACK:
+            return Board.from_discs(blacks, whites, BLACK)
+        return Board.from_discs(whites, blacks, WHITE)
 
-        try:
-            blacks = int(id_str[1:17], 16)
-            whites = int(id_str[17:33], 16)
-        except ValueError as e:
-            raise ValueError("unexpected base 16 char in discs") from e
+    @classmethod
+    def from_key(cls, key: bytes) -> "Board":
+        if len(key) != KEY_SIZE or key[0] not in [BLACK, WHITE]:
+            raise ValueError("unexpected board key")
 
-        if id_str[0] == "B":
+        blacks = int.from_bytes(key[1:9], "big")
+        whites = int.from_bytes(key[9:], "big")
+        if key[0] == BLACK:
             return Board.from_discs(blacks, whites, BLACK)
-        if id_str[0] == "W":
-            return Board.from_discs(whites, blacks, WHITE)
-
-        raise ValueError("unexpected turn value")
+        return Board.from_discs(whites, blacks, WHITE)
 
     def black(self) -> int:
         if self.turn == BLACK:
@@ -107,13 +150,28 @@ class Board:
         return fields
 
     def to_id(self) -> str:
+        # called for every step and board sent out, so without black() and white()
+        if self.turn == BLACK:
+            return f"B{self.me:016x}{self.opp:016x}"
+        if self.turn == WHITE:
+            return f"W{self.opp:016x}{self.me:016x}"
+        raise KeyError(self.turn)
+
+    def to_compact_id(self) -> str:
+        discs = self.black().to_bytes(8, "big") + self.white().to_bytes(8, "big")
         turn = {BLACK: "B", WHITE: "W"}[self.turn]
-        return f"{turn}{self.black():016x}{self.white():016x}"
+        return turn + base64.urlsafe_b64encode(discs)[:22].decode()
+
+    def to_key(self) -> bytes:
+        return struct.pack("!BQQ", self.turn, self.black(), self.white())
 
     def get_normalized_id(self) -> str:
         return self.normalized()[0].to_id()
 
     def write_image(self) -> str:
+        # PIL is slow to import and only needed here
+        from PIL import Image, ImageDraw
+
         filename = self.get_image_file_name()
 
         image_size = 100
@@ -245,57 +303,7 @@ class Board:
         return child
 
     def get_moves(self) -> int:
-        mask = self.opp & 0x7E7E7E7E7E7E7E7E
-
-        flipL = mask & (self.me << 1)
-        flipL |= mask & (flipL << 1)
-        maskL = mask & (mask << 1)
-        flipL |= maskL & (flipL << (2 * 1))
-        flipL |= maskL & (flipL << (2 * 1))
-        flipR = mask & (self.me >> 1)
-        flipR |= mask & (flipR >> 1)
-        maskR = mask & (mask >> 1)
-        flipR |= maskR & (flipR >> (2 * 1))
-        flipR |= maskR & (flipR >> (2 * 1))
-        movesSet = (flipL << 1) | (flipR >> 1)
-
-        flipL = mask & (self.me << 7)
-        flipL |= mask & (flipL << 7)
-        maskL = mask & (mask << 7)
-        flipL |= maskL & (flipL << (2 * 7))
-        flipL |= maskL & (flipL << (2 * 7))
-        flipR = mask & (self.me >> 7)
-        flipR |= mask & (flipR >> 7)
-        maskR = mask & (mask >> 7)
-        flipR |= maskR & (flipR >> (2 * 7))
-        flipR |= maskR & (flipR >> (2 * 7))
-        movesSet |= (flipL << 7) | (flipR >> 7)
-
-        flipL = mask & (self.me << 9)
-        flipL |= mask & (flipL << 9)
-        maskL = mask & (mask << 9)
-        flipL |= maskL & (flipL << (2 * 9))
-        flipL |= maskL & (flipL << (2 * 9))
-        flipR = mask & (self.me >> 9)
-        flipR |= mask & (flipR >> 9)
-        maskR = mask & (mask >> 9)
-        flipR |= maskR & (flipR >> (2 * 9))
-        flipR |= maskR & (flipR >> (2 * 9))
-        movesSet |= (flipL << 9) | (flipR >> 9)
-
-        flipL = self.opp & (self.me << 8)
-        flipL |= self.opp & (flipL << 8)
-        maskL = self.opp & (self.opp << 8)
-        flipL |= maskL & (flipL << (2 * 8))
-        flipL |= maskL & (flipL << (2 * 8))
-        flipR = self.opp & (self.me >> 8)
-        flipR |= self.opp & (flipR >> 8)
-        maskR = self.opp & (self.opp >> 8)
-        flipR |= maskR & (flipR >> (2 * 8))
-        flipR |= maskR & (flipR >> (2 * 8))
-        movesSet |= (flipL << 8) | (flipR >> 8)
-
-        return movesSet & ~(self.me | self.opp) & 0xFFFFFFFFFFFFFFFF
+        return get_moves(self.me, self.opp)
 
     def get_move_fields(self) -> Set[str]:
         moves = self.get_moves()
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from othello.bits import bits_rotate
+from othello.board import MOVE_PASS, Board
+from othello.openings_tree import MOVE_ORDER, OpeningsTree
+
+
+def normalized_discs(me: np.ndarray, opp: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Board.normalized for many boards at once, each rotation is one array operation
+    best_me = me.copy()
+    best_opp = opp.copy()
+
+    for rotation in range(1, 8):
+        # the bit operations work on uint64 arrays, but update arrays in place
+        rotated_me = bits_rotate(me.copy(), rotation)  # type: ignore
+        rotated_opp = bits_rotate(opp.copy(), rotation)  # type: ignore
+
+        better = (rotated_me < best_me) | (
+            (rotated_me == best_me) & (rotated_opp < best_opp)
+        )
+        best_me = np.where(better, rotated_me, best_me)
+        best_opp = np.where(better, rotated_opp, best_opp)
+
+    return best_me, best_opp
+
+
+def normalized_ids(boards: List[Board]) -> List[str]:
+    if not boards:
+        return []
+
+    me = np.array([board.me for board in boards], dtype=np.uint64)
+    opp = np.array([board.opp for board in boards], dtype=np.uint64)
+    normalized_me, normalized_opp = normalized_discs(me, opp)
+
+    return [
+        Board.from_discs(board_me, board_opp, board.turn).to_id()
+        for board, board_me, board_opp in zip(
+            boards, normalized_me.tolist(), normalized_opp.tolist()
+        )
+    ]
+
+
+def valid_moves(board: Board) -> List[int]:
+    moves = board.get_moves()
+    return [move for move in MOVE_ORDER if moves & (1 << move)]
+
+
+def book_children(
+    openings_tree: OpeningsTree, board: Board
+) -> Dict[str, Dict[str, Any]]:
+    # For every move: whether it is the book move and the book reply after it.
+    # Children and the replies to children in the book are each normalized in one
+    # batch and looked up with one get_entries call.
+    moves = valid_moves(board)
+    children: List[Board] = []
+    for move in moves:
+        child = board.do_move(move)
+
+        # the same child as the board API, which passes if there are no moves
+        if not child.has_moves():
+            child = child.do_move(MOVE_PASS)
+        children.append(child)
+
+    *child_ids, board_id = normalized_ids(children + [board])
+    entries = openings_tree.get_entries(child_ids + [board_id])
+    board_entry = entries.get(board_id)
+
+    replies: List[Tuple[int, int, Board]] = [
+        (index, reply, child.do_move(reply))
+        for index, child in enumerate(children)
+        if child_ids[index] in entries
+        for reply in valid_moves(child)
+    ]
+
+    best_replies: Dict[int, int] = {}
+    for (index, reply, _), reply_id in zip(
+        replies, normalized_ids([reply_board for _, _, reply_board in replies])
+    ):
+        if index not in best_replies and (
+            reply_id == entries[child_ids[index]]["best_child"]
+        ):
+            best_replies[index] = reply
+
+    return {
+        str(move): {
+            "book": bool(board_entry and board_entry["best_child"] == child_ids[index]),
+            "best_reply": best_replies.get(index),
+        }
+        for index, move in enumerate(moves)
+    }
+
+
+class BookAnnotator:
+    # book_children per board, least recently used first, for one book version
+    def __init__(self, openings_tree: OpeningsTree, max_size: int = 10_000) -> None:
+        self.openings_tree = openings_tree
+        self.max_size = max_size
+        self.cache: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def children(self, board: Board) -> Dict[str, Dict[str, Any]]:
+        board_id = board.to_id()
+
+        with self.lock:
+            if board_id in self.cache:
+                self.cache.move_to_end(board_id)
+                return self.cache[board_id]
+
+        annotations = book_children(self.openings_tree, board)
+
+        with self.lock:
+            self.cache[board_id] = annotations
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+
+        return annotations
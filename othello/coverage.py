@@ -0,0 +1,200 @@
+import heapq
+import os
+import struct
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from othello.board import BLACK, MOVE_PASS, Board
+from othello.external_sort import ExternalSorter, iter_records, write_records
+from othello.openings_tree import OpeningsTree
+
+# turn, black discs, white discs: sorts and compares like the board ID
+POSITION_FORMAT = ">BQQ"
+POSITION_SIZE = struct.calcsize(POSITION_FORMAT)
+
+# position, number of lines reaching it, chance to reach it with random replies
+RECORD_FORMAT = ">BQQId"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+@dataclass
+class CoverageGap:
+    board: Board
+    ply: int
+    lines: int
+    weight: float
+
+
+@dataclass
+class CoverageLevel:
+    ply: int
+    positions: int
+    expanded: int
+    duplicates: int
+    gaps: int
+
+
+@dataclass
+class CoverageStats:
+    levels: List[CoverageLevel] = field(default_factory=list)
+    nodes: int = 0
+    gaps: int = 0
+    spilled_runs: int = 0
+    seconds: float = 0.0
+
+    def nodes_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return self.nodes / self.seconds
+
+
+def encode_record(board: Board, lines: int, weight: float) -> bytes:
+    return struct.pack(
+        RECORD_FORMAT, board.turn, board.black(), board.white(), lines, weight
+    )
+
+
+def decode_record(record: bytes) -> Tuple[Board, int, float]:
+    turn, black, white, lines, weight = struct.unpack(RECORD_FORMAT, record)
+
+    if turn == BLACK:
+        board = Board.from_discs(black, white, turn)
+    else:
+        board = Board.from_discs(white, black, turn)
+
+    return board, lines, weight
+
+
+def combine_records(lhs: bytes, rhs: bytes) -> bytes:
+    lhs_lines, lhs_weight = struct.unpack(">Id", lhs[POSITION_SIZE:])
+    rhs_lines, rhs_weight = struct.unpack(">Id", rhs[POSITION_SIZE:])
+    lines = min(lhs_lines + rhs_lines, 0xFFFFFFFF)
+    return lhs[:POSITION_SIZE] + struct.pack(">Id", lines, lhs_weight + rhs_weight)
+
+
+def skip_passes(board: Board) -> Optional[Board]:
+    # returns None when the game is over
+    if board.has_moves():
+        return board
+
+    passed = board.do_move(MOVE_PASS)
+    if passed.has_moves():
+        return passed
+
+    return None
+
+
+class CoverageAnalysis:
+    # Passes are folded into the preceding move, so the ply of a position always
+    # equals its disc count minus four. Transpositions can therefore only occur
+    # within one BFS level, and deduplicating each level is enough.
+
+    def __init__(
+        self,
+        openings_tree: OpeningsTree,
+        color: int,
+        buffer_size: int = 1_000_000,
+        max_gaps: int = 50,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.openings_tree = openings_tree
+        self.color = color
+        self.buffer_size = buffer_size
+        self.max_gaps = max_gaps
+        self.directory = directory
+        self.stats = CoverageStats()
+        self._gaps: List[Tuple[float, int, bytes]] = []
+
+    def _add_gap(self, board: Board, ply: int, lines: int, weight: float) -> None:
+        self.stats.gaps += 1
+        item = (weight, -ply, encode_record(board, lines, weight))
+
+        if len(self._gaps) < self.max_gaps:
+            heapq.heappush(self._gaps, item)
+        else:
+            heapq.heappushpop(self._gaps, item)
+
+    def gaps(self) -> List[CoverageGap]:
+        gaps: List[CoverageGap] = []
+        for _, negative_ply, record in sorted(self._gaps, reverse=True):
+            board, lines, weight = decode_record(record)
+            gaps.append(CoverageGap(board, -negative_ply, lines, weight))
+        return gaps
+
+    def _children(self, board: Board, expand: bool) -> List[Board]:
+        if board.turn == self.color:
+            best_child = self.openings_tree.lookup(board)
+            return [best_child] if best_child else []
+
+        if not expand:
+            return []
+
+        return list(board.get_normalized_children())
+
+    def run(self, depth: int) -> List[CoverageGap]:
+        start = time.perf_counter()
+
+        with tempfile.TemporaryDirectory(
+            prefix="othello-coverage-", dir=self.directory
+        ) as directory:
+            frontier = os.path.join(directory, "frontier-0.bin")
+            root = Board().normalized()[0]
+            write_records(frontier, [encode_record(root, 1, 1.0)])
+
+            for ply in range(depth + 1):
+                level = CoverageLevel(ply, 0, 0, 0, 0)
+                added = 0
+
+                with ExternalSorter(
+                    RECORD_SIZE,
+                    buffer_size=self.buffer_size,
+                    key_size=POSITION_SIZE,
+                    combine=combine_records,
+                    directory=directory,
+                ) as sorter:
+                    for record in iter_records(frontier, RECORD_SIZE):
+                        board, lines, weight = decode_record(record)
+                        level.positions += 1
+
+                        children = self._children(board, ply < depth)
+
+                        if board.turn == self.color and not children:
+                            self._add_gap(board, ply, lines, weight)
+                            level.gaps += 1
+                            continue
+
+                        if ply == depth:
+                            continue
+
+                        level.expanded += 1
+                        for child in children:
+                            next_child = skip_passes(child)
+                            if not next_child:
+                                continue
+
+                            sorter.add(
+                                encode_record(
+                                    next_child.normalized()[0],
+                                    lines,
+                                    weight / len(children),
+                                )
+                            )
+                            added += 1
+
+                    self.stats.spilled_runs += len(sorter.runs)
+
+                    os.remove(frontier)
+                    frontier = os.path.join(directory, f"frontier-{ply + 1}.bin")
+                    unique = write_records(frontier, sorter)
+
+                level.duplicates = max(added - unique, 0)
+                self.stats.nodes += level.positions
+                self.stats.levels.append(level)
+
+                if unique == 0:
+                    break
+
+        self.stats.seconds = time.perf_counter() - start
+        return self.gaps()
@@ -0,0 +1,326 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from othello.bits import bits_rotate, get_moves
+from othello.board import BLACK, WHITE, Board
+from othello.features import popcount_array
+from othello.game import Game
+
+PHASE_COUNT = 15
+
+EVAL_WEIGHTS_FILENAME = "eval_weights.npz"
+
+# squares of each pattern in one orientation, the other 7 symmetries share weights
+PATTERNS: Dict[str, List[int]] = {
+    "edge_2x": [0, 1, 2, 3, 4, 5, 6, 7, 9, 14],
+    "corner_3x3": [0, 1, 2, 8, 9, 10, 16, 17, 18],
+    "diagonal_8": [0, 9, 18, 27, 36, 45, 54, 63],
+    "diagonal_7": [1, 10, 19, 28, 37, 46, 55],
+    "diagonal_6": [2, 11, 20, 29, 38, 47],
+    "diagonal_5": [3, 12, 21, 30, 39],
+    "diagonal_4": [4, 13, 22, 31],
+}
+
+
+def rotate_square(square: int, rotation: int) -> int:
+    return bits_rotate(1 << square, rotation).bit_length() - 1
+
+
+@dataclass
+class PatternTable:
+    name: str
+    offset: int
+    size: int
+    variants: List[List[int]]
+
+
+def build_pattern_tables() -> List[PatternTable]:
+    tables: List[PatternTable] = []
+    offset = 0
+
+    for name, squares in PATTERNS.items():
+        variants = [
+            [rotate_square(square, rotation) for square in squares]
+            for rotation in range(8)
+        ]
+        size = 3 ** len(squares)
+        tables.append(PatternTable(name, offset, size, variants))
+        offset += size
+
+    return tables
+
+
+PATTERN_TABLES = build_pattern_tables()
+PATTERN_WEIGHTS_SIZE = sum(table.size for table in PATTERN_TABLES)
+
+# every lookup as (table offset, squares), in a fixed order
+PATTERN_LOOKUPS: List[Tuple[int, List[int]]] = [
+    (table.offset, variant) for table in PATTERN_TABLES for variant in table.variants
+]
+
+LOOKUP_SQUARES = np.array(
+    [squares + [0] * (10 - len(squares)) for _, squares in PATTERN_LOOKUPS],
+    dtype=np.intp,
+)
+LOOKUP_POWERS = np.array(
+    [
+        [3**i for i in range(len(squares))] + [0] * (10 - len(squares))
+        for _, squares in PATTERN_LOOKUPS
+    ],
+    dtype=np.int32,
+)
+LOOKUP_OFFSETS = np.array([offset for offset, _ in PATTERN_LOOKUPS], dtype=np.int32)
+
+BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def get_phase(discs: int) -> int:
+    return min((discs - 4) // 4, PHASE_COUNT - 1)
+
+
+def extract_features(
+    me: np.ndarray, opp: np.ndarray, chunk_size: int = 16384
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # returns (pattern weight indexes, mobility, phase) for a batch of positions
+    me = np.asarray(me, dtype=np.uint64)
+    opp = np.asarray(opp, dtype=np.uint64)
+
+    indexes = np.empty((len(me), len(PATTERN_LOOKUPS)), dtype=np.int32)
+
+    for start in range(0, len(me), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        me_bits = (me[chunk, None] >> BIT_SHIFTS) & np.uint64(1)
+        opp_bits = (opp[chunk, None] >> BIT_SHIFTS) & np.uint64(1)
+        states = (me_bits + 2 * opp_bits).astype(np.int32)
+
+        codes = (states[:, LOOKUP_SQUARES] * LOOKUP_POWERS).sum(axis=2)
+        indexes[chunk] = codes + LOOKUP_OFFSETS
+
+    my_moves = popcount_array(get_moves(me, opp))  # type: ignore
+    opp_moves = popcount_array(get_moves(opp, me))  # type: ignore
+    mobility = (my_moves - opp_moves).astype(np.float64)
+
+    discs = popcount_array(me | opp)
+    phase = np.minimum((discs - 4) // 4, PHASE_COUNT - 1)
+
+    return indexes, mobility, phase
+
+
+class PatternEvaluator:
+    def __init__(
+        self,
+        pattern_weights: Optional[np.ndarray] = None,
+        mobility_weights: Optional[np.ndarray] = None,
+        bias: Optional[np.ndarray] = None,
+    ) -> None:
+        if pattern_weights is None:
+            pattern_weights = np.zeros((PHASE_COUNT, PATTERN_WEIGHTS_SIZE))
+        if mobility_weights is None:
+            mobility_weights = np.zeros(PHASE_COUNT)
+        if bias is None:
+            bias = np.zeros(PHASE_COUNT)
+
+        if pattern_weights.shape != (PHASE_COUNT, PATTERN_WEIGHTS_SIZE):
+            raise ValueError("unexpected pattern weights shape")
+
+        self.pattern_weights = pattern_weights
+        self.mobility_weights = mobility_weights
+        self.bias = bias
+
+    @classmethod
+    def load(cls, filename: str) -> "PatternEvaluator":
+        with np.load(filename) as data:
+            return PatternEvaluator(
+                data["pattern_weights"], data["mobility_weights"], data["bias"]
+            )
+
+    def save(self, filename: str) -> None:
+        np.savez_compressed(
+            filename,
+            pattern_weights=self.pattern_weights,
+            mobility_weights=self.mobility_weights,
+            bias=self.bias,
+        )
+
+    def evaluate(self, board: Board) -> float:
+        # disc difference expected at the end of the game, for the player to move
+        me = board.me
+        opp = board.opp
+        phase = get_phase(bin(me | opp).count("1"))
+        weights = self.pattern_weights[phase]
+
+        score = 0.0
+        for offset, squares in PATTERN_LOOKUPS:
+            code = 0
+            for square in reversed(squares):
+                code = 3 * code + ((me >> square) & 1) + 2 * ((opp >> square) & 1)
+            score += weights[offset + code]
+
+        my_moves = bin(get_moves(me, opp)).count("1")
+        opp_moves = bin(get_moves(opp, me)).count("1")
+        score += self.mobility_weights[phase] * (my_moves - opp_moves)
+        score += self.bias[phase]
+        return float(score)
+
+    def evaluate_batch(self, me: np.ndarray, opp: np.ndarray) -> np.ndarray:
+        indexes, mobility, phase = extract_features(me, opp)
+        scores = self.pattern_weights[phase[:, None], indexes].sum(axis=1)
+        scores += self.mobility_weights[phase] * mobility
+        scores += self.bias[phase]
+        return scores  # type: ignore
+
+
+def collect_positions(
+    games: Iterable[Game],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # returns (me, opp, final disc difference for the player to move)
+    me: List[int] = []
+    opp: List[int] = []
+    scores: List[int] = []
+
+    for game in games:
+        final_board = game.boards[-1]
+        black_score = final_board.count(BLACK) - final_board.count(WHITE)
+
+        for board in game.boards[:-1]:
+            me.append(board.me)
+            opp.append(board.opp)
+            scores.append(black_score if board.turn == BLACK else -black_score)
+
+    return (
+        np.array(me, dtype=np.uint64),
+        np.array(opp, dtype=np.uint64),
+        np.array(scores, dtype=np.float64),
+    )
+
+
+def fit_phase(
+    indexes: np.ndarray,
+    mobility: np.ndarray,
+    scores: np.ndarray,
+    iterations: int,
+    regularization: float,
+) -> Tuple[np.ndarray, float, float]:
+    # Ridge regression on sparse one-hot pattern features, solved with conjugate
+    # gradients on the normal equations. Columns: pattern weights, mobility, bias.
+    size = PATTERN_WEIGHTS_SIZE
+    lookups = indexes.shape[1]
+    flat_indexes = indexes.ravel()
+
+    def multiply(weights: np.ndarray) -> np.ndarray:
+        result = weights[:size][indexes].sum(axis=1)
+        result += mobility * weights[size] + weights[size + 1]
+        return result  # type: ignore
+
+    def multiply_transposed(residual: np.ndarray) -> np.ndarray:
+        result = np.empty(size + 2)
+        result[:size] = np.bincount(
+            flat_indexes, weights=np.repeat(residual, lookups), minlength=size
+        )
+        result[size] = mobility @ residual
+        result[size + 1] = residual.sum()
+        return result
+
+    def normal(weights: np.ndarray) -> np.ndarray:
+        result = multiply_transposed(multiply(weights))
+        result += regularization * weights
+        return result
+
+    weights = np.zeros(size + 2)
+    residual = multiply_transposed(scores)
+    direction = residual.copy()
+    residual_norm = residual @ residual
+
+    for _ in range(iterations):
+        if residual_norm < 1e-12:
+            break
+
+        product = normal(direction)
+        step = residual_norm / (direction @ product)
+        weights += step * direction
+        residual -= step * product
+
+        next_residual_norm = residual @ residual
+        direction = residual + (next_residual_norm / residual_norm) * direction
+        residual_norm = next_residual_norm
+
+    return weights[:size], float(weights[size]), float(weights[size + 1])
+
+
+@dataclass
+class TrainingReport:
+    positions: int
+    phase_positions: List[int]
+    extract_seconds: float
+    fit_seconds: float
+    rmse: float
+
+
+def train(
+    me: np.ndarray,
+    opp: np.ndarray,
+    scores: np.ndarray,
+    iterations: int = 100,
+    regularization: float = 1.0,
+) -> Tuple[PatternEvaluator, TrainingReport]:
+    start = time.perf_counter()
+    indexes, mobility, phase = extract_features(me, opp)
+    extract_seconds = time.perf_counter() - start
+
+    evaluator = PatternEvaluator()
+    phase_positions: List[int] = []
+
+    start = time.perf_counter()
+    for p in range(PHASE_COUNT):
+        selection = phase == p
+        phase_positions.append(int(selection.sum()))
+
+        if not selection.any():
+            continue
+
+        pattern_weights, mobility_weight, bias = fit_phase(
+            indexes[selection],
+            mobility[selection],
+            scores[selection],
+            iterations,
+            regularization,
+        )
+        evaluator.pattern_weights[p] = pattern_weights
+        evaluator.mobility_weights[p] = mobility_weight
+        evaluator.bias[p] = bias
+
+    fit_seconds = time.perf_counter() - start
+
+    errors = evaluator.evaluate_batch(me, opp) - scores
+    rmse = float(np.sqrt((errors**2).mean())) if len(errors) else 0.0
+
+    report = TrainingReport(
+        len(scores), phase_positions, extract_seconds, fit_seconds, rmse
+    )
+    return evaluator, report
+
+
+def measure_throughput(
+    evaluator: PatternEvaluator, me: np.ndarray, opp: np.ndarray, limit: int = 1000
+) -> Tuple[float, float]:
+    # returns positions per second for (single board, batch) evaluation
+    boards = [
+        Board.from_discs(int(m), int(o), BLACK) for m, o in zip(me[:limit], opp[:limit])
+    ]
+
+    start = time.perf_counter()
+    for board in boards:
+        evaluator.evaluate(board)
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    evaluator.evaluate_batch(me, opp)
+    batch_seconds = time.perf_counter() - start
+
+    return (
+        len(boards) / single_seconds if single_seconds else 0.0,
+        len(me) / batch_seconds if batch_seconds else 0.0,
+    )
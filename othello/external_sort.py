@@ -0,0 +1,106 @@
+import heapq
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterable, Iterator, List, Optional
+
+READ_CHUNK_RECORDS = 4096
+
+CombineFunction = Callable[[bytes, bytes], bytes]
+
+
+def iter_records(filename: str, record_size: int) -> Iterator[bytes]:
+    with open(filename, "rb") as file:
+        while True:
+            chunk = file.read(record_size * READ_CHUNK_RECORDS)
+            if not chunk:
+                return
+
+            if len(chunk) % record_size:
+                raise ValueError(f"{filename}: truncated record")
+
+            for offset in range(0, len(chunk), record_size):
+                yield chunk[offset : offset + record_size]
+
+
+def write_records(filename: str, records: Iterable[bytes]) -> int:
+    count = 0
+    with open(filename, "wb") as file:
+        for record in records:
+            file.write(record)
+            count += 1
+    return count
+
+
+def combine_sorted(
+    records: Iterable[bytes], key_size: int, combine: Optional[CombineFunction]
+) -> Iterator[bytes]:
+    if not combine:
+        yield from records
+        return
+
+    current: Optional[bytes] = None
+    for record in records:
+        if current is not None and current[:key_size] == record[:key_size]:
+            current = combine(current, record)
+            continue
+
+        if current is not None:
+            yield current
+        current = record
+
+    if current is not None:
+        yield current
+
+
+class ExternalSorter:
+    def __init__(
+        self,
+        record_size: int,
+        buffer_size: int = 1_000_000,
+        key_size: Optional[int] = None,
+        combine: Optional[CombineFunction] = None,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.record_size = record_size
+        self.buffer_size = buffer_size
+        self.key_size = key_size or record_size
+        self.combine = combine
+        self.directory = tempfile.mkdtemp(prefix="othello-sort-", dir=directory)
+        self.buffer: List[bytes] = []
+        self.runs: List[str] = []
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def add(self, record: bytes) -> None:
+        if len(record) != self.record_size:
+            raise ValueError("unexpected record size")
+
+        self.buffer.append(record)
+
+        if len(self.buffer) >= self.buffer_size:
+            self._spill()
+
+    def _sorted_buffer(self) -> Iterator[bytes]:
+        self.buffer.sort()
+        return combine_sorted(self.buffer, self.key_size, self.combine)
+
+    def _spill(self) -> None:
+        filename = os.path.join(self.directory, f"run-{len(self.runs)}.bin")
+        write_records(filename, self._sorted_buffer())
+        self.runs.append(filename)
+        self.buffer = []
+
+    def __iter__(self) -> Iterator[bytes]:
+        runs = [iter_records(run, self.record_size) for run in self.runs]
+        merged = heapq.merge(*runs, self._sorted_buffer())
+        return combine_sorted(merged, self.key_size, self.combine)
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.buffer = []
+        self.runs = []
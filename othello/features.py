@@ -0,0 +1,231 @@
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from othello.board import Board
+
+# All functions below only use shifts, masks and popcounts, so the same code runs
+# on python ints and on numpy uint64 arrays holding many positions.
+
+FULL = 0xFFFFFFFFFFFFFFFF
+COLUMN_A = 0x0101010101010101
+COLUMN_H = 0x8080808080808080
+ROW_1 = 0x00000000000000FF
+ROW_8 = 0xFF00000000000000
+
+CORNERS = 0x8100000000000081
+X_SQUARES = 0x0042000000004200
+C_SQUARES = 0x4281000000008142
+
+QUADRANTS = [
+    0x000000000F0F0F0F,
+    0x00000000F0F0F0F0,
+    0x0F0F0F0F00000000,
+    0xF0F0F0F000000000,
+]
+
+# (shift, mask of squares without a neighbour in that direction), positive shifts
+# move towards higher square indexes
+DIRECTIONS: List[Tuple[int, int]] = [
+    (1, COLUMN_H),
+    (-1, COLUMN_A),
+    (8, ROW_8),
+    (-8, ROW_1),
+    (9, COLUMN_H | ROW_8),
+    (-9, COLUMN_A | ROW_1),
+    (7, COLUMN_A | ROW_8),
+    (-7, COLUMN_H | ROW_1),
+]
+
+# pairs of opposite directions
+LINES: List[Tuple[Tuple[int, int], Tuple[int, int]]] = [
+    (DIRECTIONS[0], DIRECTIONS[1]),
+    (DIRECTIONS[2], DIRECTIONS[3]),
+    (DIRECTIONS[4], DIRECTIONS[5]),
+    (DIRECTIONS[6], DIRECTIONS[7]),
+]
+
+
+def shift(x: Any, direction: Tuple[int, int]) -> Any:
+    # moves every bit one step in direction, dropping bits that leave the board
+    amount, edge = direction
+    x = x & (FULL ^ edge)
+    if amount > 0:
+        return (x << amount) & FULL
+    return x >> -amount
+
+
+def neighbours(x: Any) -> Any:
+    result = x & 0
+    for direction in DIRECTIONS:
+        result |= shift(x, direction)
+    return result
+
+
+def popcount(x: int) -> int:
+    return bin(x).count("1")
+
+
+def popcount_array(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x).astype(np.int64)  # type: ignore
+    bytes_view = x.astype(np.uint64).view(np.uint8).reshape(-1, 8)
+    counts: np.ndarray = np.unpackbits(bytes_view, axis=1).sum(axis=1)
+    return counts.astype(np.int64)
+
+
+def empty_squares(me: Any, opp: Any) -> Any:
+    return (me | opp) ^ FULL
+
+
+def frontier_discs(me: Any, opp: Any) -> Any:
+    return me & neighbours(empty_squares(me, opp))
+
+
+def potential_mobility(me: Any, opp: Any) -> Any:
+    return empty_squares(me, opp) & neighbours(opp)
+
+
+def full_lines(occupied: Any, line: Tuple[Tuple[int, int], Tuple[int, int]]) -> Any:
+    # squares whose complete line in this orientation is occupied
+    empty = occupied ^ FULL
+    spread = empty
+    for _ in range(7):
+        spread = spread | shift(spread, line[0]) | shift(spread, line[1])
+    return occupied & (spread ^ FULL)
+
+
+def stable_discs(me: Any, opp: Any) -> Any:
+    # A disc is stable if on each of the four lines through it the line is full,
+    # or it touches the edge or a stable disc of its own colour on that line.
+    occupied = me | opp
+    full = [full_lines(occupied, line) for line in LINES]
+
+    stable = me & 0
+    for _ in range(64):
+        candidate = me
+        for full_line, (forward, backward) in zip(full, LINES):
+            anchored = (
+                full_line
+                | forward[1]
+                | backward[1]
+                | shift(stable, backward)
+                | shift(stable, forward)
+            )
+            candidate = candidate & anchored
+
+        if not np.any(candidate != stable):
+            break
+        stable = candidate
+
+    return stable
+
+
+def region_parity(me: Any, opp: Any) -> Any:
+    # bit i is set when quadrant i has an odd number of empty squares
+    empty = empty_squares(me, opp)
+    parity = me & 0
+    for i, quadrant in enumerate(QUADRANTS):
+        parity |= (_popcount(empty & quadrant) & 1) << i
+    return parity
+
+
+def _popcount(x: Any) -> Any:
+    if isinstance(x, np.ndarray):
+        return popcount_array(x).astype(np.uint64)
+    return popcount(x)
+
+
+FEATURES: Dict[str, Callable[[Any, Any], Any]] = {
+    "stable": stable_discs,
+    "frontier": frontier_discs,
+    "potential_mobility": potential_mobility,
+    "corners": lambda me, opp: me & CORNERS,
+    "x_squares": lambda me, opp: me & X_SQUARES,
+    "c_squares": lambda me, opp: me & C_SQUARES,
+}
+
+
+def board_features(board: Board) -> Dict[str, Any]:
+    colors = {"black": board.black(), "white": board.white()}
+
+    features: Dict[str, Any] = {}
+    for name, feature in FEATURES.items():
+        features[name] = {
+            color: popcount(feature(discs, colors[opponent_color]))
+            for (color, discs), opponent_color in zip(
+                colors.items(), ["white", "black"]
+            )
+        }
+
+    parity = region_parity(board.me, board.opp)
+    features["region_parity"] = [(parity >> i) & 1 for i in range(len(QUADRANTS))]
+    return features
+
+
+def features_batch(me: np.ndarray, opp: np.ndarray) -> Dict[str, np.ndarray]:
+    # feature counts for the player to move (and the opponent, prefixed with opp_)
+    me = np.asarray(me, dtype=np.uint64)
+    opp = np.asarray(opp, dtype=np.uint64)
+
+    features: Dict[str, np.ndarray] = {}
+    for name, feature in FEATURES.items():
+        features[name] = popcount_array(feature(me, opp))
+        features["opp_" + name] = popcount_array(feature(opp, me))
+
+    features["region_parity"] = region_parity(me, opp).astype(np.int64)
+    return features
+
+
+def benchmark_features(
+    boards: List[Board], min_seconds: float = 0.2
+) -> Dict[str, Tuple[float, float]]:
+    # positions per second for (single board, batch) computation of every feature
+    me = np.array([board.me for board in boards], dtype=np.uint64)
+    opp = np.array([board.opp for board in boards], dtype=np.uint64)
+
+    def throughput(function: Callable[[], Any], positions: int) -> float:
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                return runs * positions / elapsed
+
+    def single(feature: Callable[[Any, Any], Any]) -> Callable[[], None]:
+        def run() -> None:
+            for board in boards:
+                feature(board.me, board.opp)
+
+        return run
+
+    all_features = dict(FEATURES)
+    all_features["region_parity"] = region_parity
+
+    return {
+        name: (
+            throughput(single(feature), len(boards)),
+            throughput(lambda: feature(me, opp), len(boards)),
+        )
+        for name, feature in all_features.items()
+    }
+
+
+def random_boards(count: int, seed: int = 0) -> List[Board]:
+    # positions from random games, deterministic for a given seed
+    rng = np.random.default_rng(seed)
+    boards: List[Board] = []
+    board = Board()
+
+    while len(boards) < count:
+        children = board.get_children()
+        if not children:
+            board = Board()
+            continue
+        board = children[rng.integers(len(children))]
+        boards.append(board)
+
+    return boards
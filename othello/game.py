@@ -1,7 +1,7 @@
-from copy import copy
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from othello.board import BLACK, WHITE, Board
+from othello.replay import replay_fields
 
 
 class Game:
@@ -15,7 +15,11 @@ class Game:
         with open(filename, "r") as file:
             contents = file.read()
 
-        game = Game()
+        return Game.from_string(contents)
+
+    @classmethod
+    def from_string(cls, contents: str) -> "Game":
+        metadata: Dict[str, str] = {}
 
         lines = contents.split("\n")
         for offset, line in enumerate(lines):
@@ -25,10 +29,9 @@ class Game:
             split_line = line.split(" ")
             key = split_line[0][1:]
             value = split_line[1][1:-2]
-            game.metadata[key] = value
+            metadata[key] = value
 
-        board = Board()
-        game.boards.append(copy(board))
+        moves: List[str] = []
 
         for line in lines[offset:]:
 
@@ -39,10 +42,18 @@ class Game:
                 if word[0].isdigit():
                     continue
 
-                game.moves.append(word)
-                board = board.do_move(board.field_to_index(word))
-                game.boards.append(copy(board))
+                moves.append(word)
 
+        return Game.from_moves(moves, metadata)
+
+    @classmethod
+    def from_moves(
+        cls, moves: List[str], metadata: Optional[Dict[str, str]] = None
+    ) -> "Game":
+        game = Game()
+        game.metadata.update(metadata or {})
+        game.moves = list(moves)
+        game.boards = replay_fields(moves)
         return game
 
     def get_color(self, player_name: str) -> int:
@@ -0,0 +1,336 @@
+import multiprocessing
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.pool import AsyncResult
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from othello.bits import get_moves
+from othello.board import MOVE_PASS, Board
+from othello.features import popcount
+from othello.mcts import MCTS, get_flips
+from othello.openings_tree import MOVE_ORDER, OpeningsTree
+
+JOBS_DATABASE_FILENAME = "jobs.sqlite3"
+
+EVALUATORS = ["endgame", "mcts"]
+
+# below this many empty squares sorting moves costs more than it saves
+SORT_MOVES_EMPTIES = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    position TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    created REAL NOT NULL,
+    claimed REAL
+);
+
+CREATE INDEX IF NOT EXISTS jobs_next ON jobs (state, priority DESC, created);
+"""
+
+# A position is queued once, adding it again can only raise its priority. Jobs
+# the evaluator could not handle are queued again, another one may handle them.
+ENQUEUE_JOB = """
+INSERT INTO jobs (position, priority, state, created) VALUES (?, ?, 'queued', ?)
+ON CONFLICT (position) DO UPDATE SET
+    priority = CASE
+        WHEN state = 'queued' THEN MAX(priority, excluded.priority)
+        ELSE excluded.priority
+    END,
+    state = 'queued',
+    claimed = NULL
+WHERE state IN ('queued', 'unsolved')
+"""
+
+CLAIM_JOBS = """
+UPDATE jobs SET state = 'running', claimed = ?
+WHERE position IN (
+    SELECT position FROM jobs WHERE state = 'queued'
+    ORDER BY priority DESC, created LIMIT ?
+)
+RETURNING position
+"""
+
+
+@dataclass
+class Evaluation:
+    move: int
+    score: Optional[str] = None
+
+
+# returns None for positions it can't evaluate
+MoveEvaluator = Callable[[Board], Optional[Evaluation]]
+
+
+def final_score(me: int, opp: int) -> int:
+    # disc difference at the end of the game, empty squares go to the winner
+    difference = popcount(me) - popcount(opp)
+    empties = 64 - popcount(me | opp)
+    if difference > 0:
+        return difference + empties
+    if difference < 0:
+        return difference - empties
+    return 0
+
+
+def solve(me: int, opp: int, alpha: int, beta: int) -> int:
+    # Exact final disc difference for the player to move if it is within
+    # (alpha, beta), otherwise a bound on the side of the window it is on.
+    moves = get_moves(me, opp)
+    if not moves:
+        if not get_moves(opp, me):
+            return final_score(me, opp)
+        return -solve(opp, me, -beta, -alpha)
+
+    children: List[Tuple[int, int]] = []
+    while moves:
+        bit = moves & -moves
+        moves ^= bit
+        flipped = get_flips(me, opp, bit.bit_length() - 1)
+        children.append((opp ^ flipped, me | flipped | bit))
+
+    # trying replies that leave the opponent few moves first gives more cutoffs
+    if 64 - popcount(me | opp) >= SORT_MOVES_EMPTIES:
+        children.sort(key=lambda child: popcount(get_moves(*child)))
+
+    best = -64
+    for child_me, child_opp in children:
+        score = -solve(child_me, child_opp, -beta, -alpha)
+        if score > best:
+            best = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+    return best
+
+
+class EndgameSolver:
+    # exact minimax with alpha-beta pruning, only for positions close to the end
+    def __init__(self, max_empties: int = 12) -> None:
+        self.max_empties = max_empties
+
+    def __call__(self, board: Board) -> Optional[Evaluation]:
+        if 64 - popcount(board.me | board.opp) > self.max_empties:
+            return None
+
+        moves = board.get_moves()
+        best: Optional[Evaluation] = None
+        best_score = -65
+
+        for move in MOVE_ORDER:
+            if not moves & (1 << move):
+                continue
+
+            flipped = get_flips(board.me, board.opp, move)
+            child_me = board.opp ^ flipped
+            child_opp = board.me | flipped | (1 << move)
+
+            score = -solve(child_me, child_opp, -64, -best_score)
+            if score > best_score:
+                best_score = score
+                best = Evaluation(move, f"{score:+d}" if score else "0")
+
+        return best
+
+
+class MCTSEvaluator:
+    # rough but works anywhere, the book gets no score
+    def __init__(self, playouts: int = 1000, seed: Optional[int] = None) -> None:
+        self.playouts = playouts
+        self.seed = seed
+
+    def __call__(self, board: Board) -> Optional[Evaluation]:
+        result = MCTS(seed=self.seed).search(board, playouts=self.playouts)
+
+        # passing is no book move, the job is marked unsolved
+        if result.best_move is None or result.best_move == MOVE_PASS:
+            return None
+        return Evaluation(result.best_move)
+
+
+def get_evaluator(
+    name: str, max_empties: int = 12, playouts: int = 1000
+) -> MoveEvaluator:
+    if name == "endgame":
+        return EndgameSolver(max_empties)
+    if name == "mcts":
+        return MCTSEvaluator(playouts)
+    raise ValueError(f"unknown evaluator {name}")
+
+
+class JobQueue:
+    # Positions waiting to be added to the book, highest priority first. Claimed
+    # jobs stay in the database until they are finished, so jobs of a crashed run
+    # can be put back into the queue.
+    def __init__(self, filename: str = JOBS_DATABASE_FILENAME) -> None:
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def add(self, board: Board, priority: int = 0) -> None:
+        self.add_many([board], priority)
+
+    def add_many(self, boards: Iterable[Board], priority: int = 0) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                ENQUEUE_JOB,
+                [(board.get_normalized_id(), priority, now) for board in boards],
+            )
+
+    def claim(self, count: int) -> List[str]:
+        # one statement, so runs sharing the queue never claim the same job
+        with self.connection:
+            rows = self.connection.execute(CLAIM_JOBS, (time.time(), count)).fetchall()
+        return [position for (position,) in rows]
+
+    def finish(self, positions: Iterable[str], state: str = "done") -> None:
+        # state is "done", or "unsolved" if the evaluator could not handle it
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE jobs SET state = ? WHERE position = ?",
+                [(state, position) for position in positions],
+            )
+
+    def recover(self, stale_after: float = 0.0) -> int:
+        # puts jobs claimed longer than stale_after seconds ago back into the queue
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = 'queued', claimed = NULL "
+                "WHERE state = 'running' AND claimed <= ?",
+                (time.time() - stale_after,),
+            )
+        return cursor.rowcount
+
+    def requeue(self, state: str = "unsolved") -> int:
+        # puts finished jobs back into the queue, e.g. for another evaluator
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = 'queued', claimed = NULL WHERE state = ?",
+                (state,),
+            )
+        return cursor.rowcount
+
+    def progress(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "done": 0, "unsolved": 0}
+        for state, count in self.connection.execute(
+            "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+        ):
+            counts[state] = count
+        return counts
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+@dataclass
+class ExpansionReport:
+    added: int
+    unsolved: int
+    skipped: int
+    jobs: int
+    seconds: float
+
+    def positions_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return (self.added + self.unsolved) / self.seconds
+
+
+def evaluate_positions(
+    args: Tuple[MoveEvaluator, List[str]],
+) -> List[Tuple[str, Optional[Evaluation]]]:
+    evaluator, positions = args
+    return [(position, evaluator(Board.from_id(position))) for position in positions]
+
+
+def expand(
+    queue: JobQueue,
+    openings_tree: OpeningsTree,
+    openings_filename: str,
+    evaluator: MoveEvaluator,
+    jobs: int = 1,
+    batch_size: int = 10,
+    limit: Optional[int] = None,
+    progress: Optional[Callable[[ExpansionReport, Dict[str, int]], None]] = None,
+) -> ExpansionReport:
+    # Worker processes evaluate batches of claimed positions. Only this process
+    # writes the book, one batch of upserts per batch of positions, and marks
+    # the jobs done once the book is saved, so no result is lost in a crash.
+    start = time.perf_counter()
+    report = ExpansionReport(0, 0, 0, jobs, 0.0)
+
+    def batches() -> Iterator[Tuple[MoveEvaluator, List[str]]]:
+        claimed = 0
+        while limit is None or claimed < limit:
+            count = batch_size if limit is None else min(batch_size, limit - claimed)
+            positions = queue.claim(count)
+            if not positions:
+                return
+            claimed += len(positions)
+
+            # positions added to the book after they were queued need no work
+            known = {
+                position for position in positions if openings_tree.get_entry(position)
+            }
+            queue.finish(known)
+            report.skipped += len(known)
+
+            unknown = [position for position in positions if position not in known]
+            if unknown:
+                yield evaluator, unknown
+
+    def store(batch: List[Tuple[str, Optional[Evaluation]]]) -> None:
+        solved = [
+            (position, evaluation) for position, evaluation in batch if evaluation
+        ]
+
+        with openings_tree.batch():
+            for position, evaluation in solved:
+                board = Board.from_id(position)
+                best_child = board.do_move(evaluation.move)
+                openings_tree.upsert(board, best_child, evaluation.score)
+        openings_tree.save(openings_filename)
+
+        queue.finish([position for position, _ in solved])
+        queue.finish(
+            [position for position, evaluation in batch if not evaluation], "unsolved"
+        )
+
+        report.added += len(solved)
+        report.unsolved += len(batch) - len(solved)
+        report.seconds = time.perf_counter() - start
+        if progress:
+            progress(report, queue.progress())
+
+    if jobs == 1:
+        for args in batches():
+            store(evaluate_positions(args))
+    else:
+        # batches are only claimed once a worker is about to become free, so
+        # few jobs are running at any time
+        with multiprocessing.Pool(jobs) as pool:
+            running: Deque["AsyncResult[List[Tuple[str, Optional[Evaluation]]]]"] = (
+                deque()
+            )
+            for args in batches():
+                running.append(pool.apply_async(evaluate_positions, (args,)))
+                if len(running) >= 2 * jobs:
+                    store(running.popleft().get())
+
+            while running:
+                store(running.popleft().get())
+
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,309 @@
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from othello.bits import get_moves
+from othello.board import MOVE_PASS, Board
+from othello.features import DIRECTIONS, popcount, popcount_array, shift
+
+RAY_DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def build_rays() -> List[List[List[int]]]:
+    # RAYS[square] holds, per direction, the bits walking away from square
+    rays: List[List[List[int]]] = []
+    for square in range(64):
+        x, y = square % 8, square // 8
+        square_rays: List[List[int]] = []
+
+        for dx, dy in RAY_DIRECTIONS:
+            ray: List[int] = []
+            cur_x, cur_y = x + dx, y + dy
+            while 0 <= cur_x < 8 and 0 <= cur_y < 8:
+                ray.append(1 << (8 * cur_y + cur_x))
+                cur_x += dx
+                cur_y += dy
+
+            if len(ray) >= 2:
+                square_rays.append(ray)
+
+        rays.append(square_rays)
+    return rays
+
+
+RAYS = build_rays()
+
+
+def get_flips(me: int, opp: int, move: int) -> int:
+    flipped = 0
+    for ray in RAYS[move]:
+        line = 0
+        for bit in ray:
+            if opp & bit:
+                line |= bit
+            elif me & bit:
+                flipped |= line
+                break
+            else:
+                break
+    return flipped
+
+
+def playout(me: int, opp: int, rng: random.Random) -> int:
+    # plays random moves until the game ends, returns the final disc difference
+    # for the player to move at the start
+    sign = 1
+
+    while True:
+        moves = get_moves(me, opp)
+
+        if not moves:
+            if not get_moves(opp, me):
+                break
+            me, opp = opp, me
+            sign = -sign
+            continue
+
+        for _ in range(rng.randrange(popcount(moves))):
+            moves &= moves - 1
+
+        bit = moves & -moves
+        flipped = get_flips(me, opp, bit.bit_length() - 1)
+        me, opp = opp ^ flipped, me | flipped | bit
+        sign = -sign
+
+    return sign * (popcount(me) - popcount(opp))
+
+
+BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def get_flips_batch(me: np.ndarray, opp: np.ndarray, bits: np.ndarray) -> np.ndarray:
+    flipped = np.zeros_like(me)
+    for direction in DIRECTIONS:
+        line = shift(bits, direction) & opp
+        for _ in range(5):
+            line |= shift(line, direction) & opp
+        bracketed = (shift(line, direction) & me) != 0
+        flipped |= np.where(bracketed, line, np.uint64(0))
+    return flipped
+
+
+def playouts_batch(
+    me: np.ndarray, opp: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    # simulates one random game per row at once, returns disc differences for the
+    # player to move at the start of each row
+    me = np.array(me, dtype=np.uint64)
+    opp = np.array(opp, dtype=np.uint64)
+    sign = np.ones(len(me), dtype=np.int64)
+    active = np.ones(len(me), dtype=bool)
+
+    while active.any():
+        moves: np.ndarray = get_moves(me, opp)  # type: ignore
+        has_moves = active & (moves != 0)
+        opp_moves: np.ndarray = get_moves(opp, me)  # type: ignore
+        passing = active & ~has_moves & (opp_moves != 0)
+        active &= has_moves | passing
+
+        # pick a uniformly random set bit per row
+        move_bits = ((moves[:, None] >> BIT_SHIFTS) & np.uint64(1)).astype(bool)
+        keys = rng.random(move_bits.shape) * move_bits
+        bits = np.uint64(1) << keys.argmax(axis=1).astype(np.uint64)
+        bits = np.where(has_moves, bits, np.uint64(0))
+
+        flipped = get_flips_batch(me, opp, bits)
+        next_me = np.where(has_moves, opp ^ flipped, opp)
+        next_opp = np.where(has_moves, me | flipped | bits, me)
+
+        switch = has_moves | passing
+        me = np.where(switch, next_me, me)
+        opp = np.where(switch, next_opp, opp)
+        sign = np.where(switch, -sign, sign)
+
+    result: np.ndarray = sign * (popcount_array(me) - popcount_array(opp))
+    return result
+
+
+def reward(disc_difference: int) -> float:
+    if disc_difference > 0:
+        return 1.0
+    if disc_difference < 0:
+        return 0.0
+    return 0.5
+
+
+class MCTSNode:
+    __slots__ = ("me", "opp", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, me: int, opp: int, parent: Optional["MCTSNode"]) -> None:
+        self.me = me
+        self.opp = opp
+        self.parent = parent
+        self.children: Dict[int, MCTSNode] = {}
+        self.visits = 0
+
+        # rewards summed from the perspective of the player who moved into this node
+        self.wins = 0.0
+
+        moves = get_moves(me, opp)
+        self.untried = [i for i in range(64) if moves & (1 << i)]
+        if not self.untried and get_moves(opp, me):
+            self.untried = [MOVE_PASS]
+
+    def is_terminal(self) -> bool:
+        return not self.untried and not self.children
+
+    def child_for_move(self, move: int) -> "MCTSNode":
+        if move == MOVE_PASS:
+            child = MCTSNode(self.opp, self.me, self)
+        else:
+            flipped = get_flips(self.me, self.opp, move)
+            bit = 1 << move
+            child = MCTSNode(self.opp ^ flipped, self.me | flipped | bit, self)
+
+        self.children[move] = child
+        return child
+
+    def select_child(self, exploration: float) -> Tuple[int, "MCTSNode"]:
+        log_visits = math.log(self.visits)
+
+        def uct(item: Tuple[int, MCTSNode]) -> float:
+            child = item[1]
+            return child.wins / child.visits + exploration * math.sqrt(
+                log_visits / child.visits
+            )
+
+        return max(self.children.items(), key=uct)
+
+
+@dataclass
+class MoveStats:
+    move: int
+    visits: int
+    win_rate: float
+
+
+@dataclass
+class SearchResult:
+    best_move: Optional[int]
+    moves: List[MoveStats]
+    playouts: int
+    seconds: float
+
+    def playouts_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return self.playouts / self.seconds
+
+
+class MCTS:
+    def __init__(
+        self,
+        exploration: float = 1.4,
+        batch_size: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.exploration = exploration
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.numpy_rng = np.random.default_rng(seed)
+        self.root: Optional[MCTSNode] = None
+        self.lock = threading.Lock()
+
+    def set_board(self, board: Board) -> None:
+        # keep the subtree if the board is the root or is reachable within two plies
+        if self.root:
+            candidates = [self.root] + list(self.root.children.values())
+            for child in list(self.root.children.values()):
+                candidates += child.children.values()
+
+            for node in candidates:
+                if node.me == board.me and node.opp == board.opp:
+                    node.parent = None
+                    self.root = node
+                    return
+
+        self.root = MCTSNode(board.me, board.opp, None)
+
+    def advance(self, move: int) -> None:
+        assert self.root
+        child = self.root.children.get(move) or self.root.child_for_move(move)
+        child.parent = None
+        self.root = child
+
+    def _simulate(self, node: MCTSNode) -> Tuple[int, float]:
+        # returns (playouts, summed reward for the player to move at node)
+        if self.batch_size:
+            me = np.full(self.batch_size, node.me, dtype=np.uint64)
+            opp = np.full(self.batch_size, node.opp, dtype=np.uint64)
+            differences = playouts_batch(me, opp, self.numpy_rng)
+            wins = (differences > 0).sum() + 0.5 * (differences == 0).sum()
+            return self.batch_size, float(wins)
+
+        return 1, reward(playout(node.me, node.opp, self.rng))
+
+    def _iterate(self) -> int:
+        assert self.root
+        node = self.root
+
+        while not node.untried and node.children:
+            _, node = node.select_child(self.exploration)
+
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            node = node.child_for_move(move)
+
+        playouts, wins = self._simulate(node)
+
+        # wins is seen from the player to move at node, which is the opponent of
+        # the player that moved into node
+        wins = playouts - wins
+        current: Optional[MCTSNode] = node
+        while current:
+            current.visits += playouts
+            current.wins += wins
+            wins = playouts - wins
+            current = current.parent
+
+        return playouts
+
+    def search(
+        self,
+        board: Board,
+        playouts: Optional[int] = None,
+        seconds: Optional[float] = None,
+    ) -> SearchResult:
+        if playouts is None and seconds is None:
+            playouts = 1000
+
+        with self.lock:
+            self.set_board(board)
+            assert self.root
+
+            start = time.perf_counter()
+            done = 0
+
+            while not self.root.is_terminal():
+                if playouts is not None and done >= playouts:
+                    break
+                if seconds is not None and time.perf_counter() - start >= seconds:
+                    break
+                done += self._iterate()
+
+            elapsed = time.perf_counter() - start
+
+            moves = [
+                MoveStats(move, child.visits, child.wins / child.visits)
+                for move, child in self.root.children.items()
+                if child.visits
+            ]
+            moves.sort(key=lambda move_stats: move_stats.visits, reverse=True)
+            best_move = moves[0].move if moves else None
+
+        return SearchResult(best_move, moves, done, elapsed)
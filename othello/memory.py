@@ -0,0 +1,127 @@
+import gc
+import inspect
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Blocks are attributed by the frames that allocated them. Only the innermost
+# frames are kept, so a few are enough to get past json, struct and friends.
+TRACE_FRAMES = 8
+
+# structure name, then the module, class or function allocating it
+MemorySite = Tuple[str, Any]
+
+# filename -> (first line, last line, structure name), smallest range first
+SiteLines = Dict[str, List[Tuple[int, int, str]]]
+
+
+@dataclass
+class MemoryUsage:
+    name: str
+    size: int
+    entries: int
+
+    def bytes_per_entry(self) -> Optional[float]:
+        if not self.entries:
+            return None
+        return self.size / self.entries
+
+
+def start_tracing(frames: int = TRACE_FRAMES) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    # garbage is collected first, so only blocks that are still reachable count
+    gc.collect()
+    return tracemalloc.take_snapshot()
+
+
+def site_lines(sites: List[MemorySite]) -> SiteLines:
+    lines: SiteLines = defaultdict(list)
+
+    for name, target in sites:
+        target = inspect.unwrap(target)
+        filename = os.path.abspath(inspect.getsourcefile(target) or "")
+
+        if inspect.ismodule(target):
+            lines[filename].append((0, sys.maxsize, name))
+        else:
+            source, first = inspect.getsourcelines(target)
+            lines[filename].append((first, first + len(source) - 1, name))
+
+    for ranges in lines.values():
+        ranges.sort(key=lambda item: item[1] - item[0])
+    return lines
+
+
+def site_sizes(
+    snapshot: tracemalloc.Snapshot, sites: List[MemorySite]
+) -> Dict[str, int]:
+    # Live bytes per structure. A block belongs to the innermost frame of its
+    # traceback that is inside a site, so a board ID created by Board.to_id for
+    # the step cache counts for the step cache.
+    lines = site_lines(sites)
+    frame_sites: Dict[Tuple[str, int], Optional[str]] = {}
+    sizes = {name: 0 for name, _ in sites}
+
+    # blocks with the same traceback are grouped, there are far fewer of those
+    for statistic in snapshot.statistics("traceback"):
+        for frame in reversed(statistic.traceback):
+            key = (frame.filename, frame.lineno)
+            if key not in frame_sites:
+                frame_sites[key] = next(
+                    (
+                        name
+                        for first, last, name in lines.get(
+                            os.path.abspath(frame.filename), []
+                        )
+                        if first <= frame.lineno <= last
+                    ),
+                    None,
+                )
+
+            name = frame_sites[key]
+            if name:
+                sizes[name] += statistic.size
+                break
+
+    return sizes
+
+
+def memory_usage(sites: List[MemorySite], entries: Dict[str, int]) -> List[MemoryUsage]:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing, see start_tracing")
+
+    sizes = site_sizes(take_snapshot(), sites)
+    return [
+        MemoryUsage(name, size, entries.get(name, 0)) for name, size in sizes.items()
+    ]
+
+
+def allocated_size(build: Callable[[], T]) -> Tuple[T, int]:
+    # the result of build and the bytes it allocated that are still alive
+    tracing = tracemalloc.is_tracing()
+    start_tracing()
+
+    try:
+        before = take_snapshot()
+        result = build()
+        after = take_snapshot()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    # the snapshot taken before is allocated by tracemalloc itself
+    size = sum(
+        statistic.size_diff
+        for statistic in after.compare_to(before, "filename")
+        if statistic.traceback[0].filename != tracemalloc.__file__
+    )
+    return result, size
@@ -0,0 +1,175 @@
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from othello.bits import bits_rotate
+from othello.board import MOVE_PASS, Board
+
+MISTAKES_DATABASE_FILENAME = "mistakes.sqlite3"
+
+MISTAKE_SOURCES = ["training", "pgn"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mistakes (
+    id INTEGER PRIMARY KEY,
+    position TEXT NOT NULL,
+    move INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    created REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS position_mistakes (
+    position TEXT PRIMARY KEY,
+    mistakes INTEGER NOT NULL,
+    training_mistakes INTEGER NOT NULL,
+    pgn_mistakes INTEGER NOT NULL,
+    first_mistake REAL NOT NULL,
+    last_mistake REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS mistakes_position ON mistakes (position);
+
+CREATE INDEX IF NOT EXISTS position_mistakes_weakest
+ON position_mistakes (mistakes DESC, last_mistake DESC);
+"""
+
+UPSERT_COUNTERS = """
+INSERT INTO position_mistakes VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (position) DO UPDATE SET
+    mistakes = mistakes + excluded.mistakes,
+    training_mistakes = training_mistakes + excluded.training_mistakes,
+    pgn_mistakes = pgn_mistakes + excluded.pgn_mistakes,
+    first_mistake = MIN(first_mistake, excluded.first_mistake),
+    last_mistake = MAX(last_mistake, excluded.last_mistake)
+"""
+
+# position, normalized move, source, timestamp
+MistakeEvent = Tuple[str, int, str, float]
+
+
+def normalize_mistake(board: Board, move: int) -> Tuple[str, int]:
+    # the move is rotated along with the board, so transpositions share counters
+    normalized, rotation = board.normalized()
+    if move != MOVE_PASS:
+        move = bits_rotate(1 << move, rotation).bit_length() - 1
+    return normalized.to_id(), move
+
+
+class MistakeStore:
+    # Mistakes are buffered in memory and written in one transaction once the
+    # buffer is full, or by a timer flush_interval after the first buffered one.
+    # Frequent clicks stay cheap and the end of a burst is still written.
+    def __init__(
+        self,
+        filename: str = MISTAKES_DATABASE_FILENAME,
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.filename = filename
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer: List[MistakeEvent] = []
+        self.timer: Optional[threading.Timer] = None
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "MistakeStore":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def record(
+        self,
+        board: Board,
+        move: int,
+        source: str,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        if source not in MISTAKE_SOURCES:
+            raise ValueError(f"unknown mistake source {source}")
+
+        position, normalized_move = normalize_mistake(board, move)
+        event = (position, normalized_move, source, timestamp or time.time())
+
+        with self.lock:
+            self.buffer.append(event)
+
+            if len(self.buffer) >= self.flush_size:
+                self._flush()
+            elif not self.timer:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.timer:
+            # a timer that already fired waits for the lock and finds no buffer
+            self.timer.cancel()
+            self.timer = None
+
+        if not self.buffer:
+            return
+
+        # position -> [mistakes, training, pgn, first, last]
+        counters: Dict[str, List[Any]] = defaultdict(
+            lambda: [0, 0, 0, float("inf"), float("-inf")]
+        )
+        for position, _, source, created in self.buffer:
+            counter = counters[position]
+            counter[0] += 1
+            counter[1 if source == "training" else 2] += 1
+            counter[3] = min(counter[3], created)
+            counter[4] = max(counter[4], created)
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO mistakes (position, move, source, created) "
+                "VALUES (?, ?, ?, ?)",
+                self.buffer,
+            )
+            self.connection.executemany(
+                UPSERT_COUNTERS,
+                [(position, *counter) for position, counter in counters.items()],
+            )
+
+        self.buffer = []
+
+    def weakest(self, count: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            self._flush()
+            cursor = self.connection.execute(
+                "SELECT * FROM position_mistakes "
+                "ORDER BY mistakes DESC, last_mistake DESC LIMIT ?",
+                (count,),
+            )
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def position_mistakes(self, board: Board) -> List[Tuple[int, str, float]]:
+        # (normalized move, source, timestamp) of every mistake in this position
+        position = board.get_normalized_id()
+
+        with self.lock:
+            self._flush()
+            rows = self.connection.execute(
+                "SELECT move, source, created FROM mistakes "
+                "WHERE position = ? ORDER BY created",
+                (position,),
+            ).fetchall()
+
+        return [(move, source, created) for move, source, created in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            self._flush()
+            self.connection.close()
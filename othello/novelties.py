@@ -0,0 +1,266 @@
+import glob
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass, field
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from othello.archive import ARCHIVE_SUFFIX, GameArchive
+from othello.board import BLACK, Board, opponent
+from othello.game import Game
+from othello.openings_merge import open_book
+from othello.openings_tree import OpeningsTree
+
+
+@dataclass
+class GameChunk:
+    # PGN files, or the games from start to stop of an archive
+    filenames: List[str] = field(default_factory=list)
+    archive: Optional[str] = None
+    start: int = 0
+    stop: int = 0
+
+    def games(self) -> Iterator[Tuple[str, Game]]:
+        if not self.archive:
+            for filename in self.filenames:
+                yield filename, Game.from_pgn(filename)
+            return
+
+        with GameArchive(self.archive) as archive:
+            for index in range(self.start, self.stop):
+                game = archive[index]
+                name = game.metadata.get("Filename") or f"{self.archive}#{index}"
+                yield name, game
+
+
+def game_chunks(path: str, chunk_size: int) -> List[GameChunk]:
+    if path.endswith(ARCHIVE_SUFFIX):
+        with GameArchive(path) as archive:
+            count = len(archive)
+        return [
+            GameChunk(archive=path, start=start, stop=min(start + chunk_size, count))
+            for start in range(0, count, chunk_size)
+        ]
+
+    filenames = [path]
+    if os.path.isdir(path):
+        filenames = sorted(glob.glob(os.path.join(path, "**/*.pgn"), recursive=True))
+
+    return [
+        GameChunk(filenames[start : start + chunk_size])
+        for start in range(0, len(filenames), chunk_size)
+    ]
+
+
+@dataclass
+class GameNovelty:
+    name: str
+    # points of the player, 1 for a win and 1/2 for a draw
+    score: float
+    # None for games that didn't leave the book, kind is "missing" when the
+    # book has no move for the position and "wrong" for another move played
+    position: Optional[str] = None
+    kind: str = ""
+    ply: int = 0
+    line: str = ""
+
+
+@lru_cache(maxsize=1 << 16)
+def normalized_id(board: Board) -> str:
+    # games share their openings, so the replay cache hands out the same boards
+    return board.get_normalized_id()
+
+
+def result_points(result: str) -> Optional[Tuple[float, float]]:
+    # Result tags give black first, as "1-0", "1/2-1/2" or disc counts like
+    # "40-24". Anything else, like "*" for unfinished games, gives None.
+    parts = result.split("-")
+    if len(parts) != 2:
+        return None
+
+    try:
+        black, white = (float(Fraction(part)) for part in parts)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return black, white
+
+
+def game_score(game: Game, color: int) -> float:
+    # From the Result tag, so resigned and timed out games count as they ended.
+    # Without one the discs on the final board decide.
+    points = result_points(game.metadata.get("Result", ""))
+
+    if points:
+        black, white = points
+        ours, theirs = (black, white) if color == BLACK else (white, black)
+    else:
+        final = game.boards[-1]
+        ours = final.count(color)
+        theirs = final.count(opponent(color))
+
+    if ours > theirs:
+        return 1.0
+    if ours < theirs:
+        return 0.0
+    return 0.5
+
+
+def first_novelty(
+    openings_tree: OpeningsTree, game: Game, name: str, color: int
+) -> GameNovelty:
+    # the first position where color leaves the book, as in OpeningsTree.check
+    result = GameNovelty(name, game_score(game, color))
+
+    for move_offset in range(len(game.boards) - 1):
+        board = game.boards[move_offset]
+        child = game.boards[move_offset + 1]
+
+        if board.turn != color:
+            continue
+
+        # the book doesn't go beyond passed turns
+        if child.turn != opponent(color):
+            break
+
+        entry = openings_tree.get_entry(normalized_id(board))
+        kind = ""
+        if not entry:
+            kind = "missing"
+        elif entry["best_child"] != normalized_id(child):
+            kind = "wrong"
+
+        if kind:
+            result.position = normalized_id(board)
+            result.kind = kind
+            result.ply = move_offset + 1
+            result.line = " ".join(game.moves[:move_offset])
+            break
+
+    return result
+
+
+# book spec -> book, loaded once per worker process
+_books: Dict[str, OpeningsTree] = {}
+
+
+def scan_chunk(
+    args: Tuple[str, str, GameChunk],
+) -> Tuple[List[GameNovelty], int]:
+    # novelties of the games of player_name in the chunk and the skipped games
+    book_spec, player_name, chunk = args
+
+    if book_spec not in _books:
+        _books[book_spec] = open_book(book_spec)
+    openings_tree = _books[book_spec]
+
+    novelties: List[GameNovelty] = []
+    skipped = 0
+
+    for name, game in chunk.games():
+        if game.is_xot() or player_name not in (
+            game.metadata.get("Black"),
+            game.metadata.get("White"),
+        ):
+            skipped += 1
+            continue
+
+        color = game.get_color(player_name)
+        novelties.append(first_novelty(openings_tree, game, name, color))
+
+    return novelties, skipped
+
+
+@dataclass
+class NoveltyStats:
+    position: str
+    kind: str
+    # the earliest ply and its line, positions can be reached in several ways
+    ply: int
+    line: str
+    games: int = 0
+    score: float = 0.0
+    examples: List[str] = field(default_factory=list)
+
+    def win_rate(self) -> float:
+        if self.games == 0:
+            return 0.0
+        return self.score / self.games
+
+
+@dataclass
+class NoveltyReport:
+    games: int = 0
+    in_book: int = 0
+    skipped: int = 0
+    jobs: int = 1
+    seconds: float = 0.0
+    novelties: Dict[Tuple[str, str], NoveltyStats] = field(default_factory=dict)
+
+    def games_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return (self.games + self.skipped) / self.seconds
+
+    def add(self, novelty: GameNovelty, max_examples: int) -> None:
+        self.games += 1
+        if novelty.position is None:
+            self.in_book += 1
+            return
+
+        key = (novelty.position, novelty.kind)
+        stats = self.novelties.get(key)
+        if not stats:
+            stats = NoveltyStats(
+                novelty.position, novelty.kind, novelty.ply, novelty.line
+            )
+            self.novelties[key] = stats
+
+        if novelty.ply < stats.ply:
+            stats.ply = novelty.ply
+            stats.line = novelty.line
+
+        stats.games += 1
+        stats.score += novelty.score
+        if len(stats.examples) < max_examples:
+            stats.examples.append(novelty.name)
+
+    def top(self, count: int) -> List[NoveltyStats]:
+        # most common first, then earliest
+        return sorted(
+            self.novelties.values(),
+            key=lambda stats: (-stats.games, stats.ply, stats.position, stats.kind),
+        )[:count]
+
+
+def find_novelties(
+    path: str,
+    player_name: str,
+    book_spec: str,
+    jobs: int = 1,
+    chunk_size: int = 64,
+    max_examples: int = 3,
+) -> NoveltyReport:
+    # Games are replayed and probed in worker processes, a chunk of games at a
+    # time. Every worker keeps its own replay cache and normalized IDs, so
+    # positions shared by many games are only computed once per worker.
+    start = time.perf_counter()
+    report = NoveltyReport(jobs=jobs)
+    work = [(book_spec, player_name, chunk) for chunk in game_chunks(path, chunk_size)]
+
+    def store(results: Iterator[Tuple[List[GameNovelty], int]]) -> None:
+        for novelties, skipped in results:
+            report.skipped += skipped
+            for novelty in novelties:
+                report.add(novelty, max_examples)
+
+    if jobs == 1:
+        store(scan_chunk(args) for args in work)
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            # in order, so examples are the same for every number of jobs
+            store(pool.imap(scan_chunk, work))
+
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,397 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from othello.board import MOVE_PASS, Board
+from othello.openings_tree import NestedTree, OpeningsTree
+
+OPENINGS_DATABASE_FILENAME = "openings.sqlite3"
+
+# SQLite allows 32766 variables per statement since 3.32
+MAX_QUERY_VARIABLES = 32766
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY,
+    board TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS book (
+    user INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    best_child INTEGER NOT NULL,
+    score TEXT,
+    PRIMARY KEY (user, position)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS edges (
+    user INTEGER NOT NULL,
+    parent INTEGER NOT NULL,
+    child INTEGER NOT NULL,
+    PRIMARY KEY (user, parent, child)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS book_position ON book (position);
+
+CREATE INDEX IF NOT EXISTS edges_child ON edges (user, child);
+"""
+
+SELECT_ENTRIES = """
+SELECT position.board, best_child.board, book.score
+FROM book
+JOIN positions AS position ON position.id = book.position
+JOIN positions AS best_child ON best_child.id = book.best_child
+WHERE book.user = ?
+"""
+
+UPSERT_ENTRY = """
+INSERT INTO book VALUES (?, ?, ?, ?)
+ON CONFLICT (user, position) DO UPDATE SET
+    best_child = excluded.best_child,
+    score = excluded.score
+"""
+
+# book entries reachable from the seed positions through the edges
+SELECT_SUBTREE = """
+WITH RECURSIVE under(position) AS (
+    SELECT id FROM positions WHERE board IN ({seeds})
+    UNION
+    SELECT edges.child FROM edges JOIN under ON edges.parent = under.position
+    WHERE edges.user = ?
+)
+SELECT position.board, best_child.board, book.score
+FROM under
+JOIN book ON book.user = ? AND book.position = under.position
+JOIN positions AS position ON position.id = book.position
+JOIN positions AS best_child ON best_child.id = book.best_child
+"""
+
+
+def entry_dict(best_child_id: str, score: Optional[str]) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"best_child": best_child_id}
+    if score is not None:
+        entry["score"] = score
+    return entry
+
+
+def reply_ids(board_id: str) -> Set[str]:
+    # normalized positions after every reply to the board, passing if needed
+    board = Board.from_id(board_id)
+    if board.has_moves():
+        return board.get_normalized_children_ids()
+
+    passed = board.do_move(MOVE_PASS)
+    if passed.has_moves():
+        return {passed.get_normalized_id()}
+    return set()
+
+
+class ConnectionPool:
+    # One connection per thread, readers don't wait for each other or for writers.
+    # Threads that don't live as long as the pool, like the request threads of a
+    # threaded server, close theirs with release.
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.local = threading.local()
+        self.connections: List[sqlite3.Connection] = []
+        self.lock = threading.Lock()
+
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(
+            self.local, "connection", None
+        )
+        if connection is None:
+            connection = sqlite3.connect(
+                self.filename, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def release(self) -> None:
+        # closes the connection of the calling thread, the next use opens a new one
+        connection: Optional[sqlite3.Connection] = getattr(
+            self.local, "connection", None
+        )
+        if connection is None:
+            return
+
+        with self.lock:
+            self.connections.remove(connection)
+        connection.close()
+        self.local.connection = None
+
+    def close(self) -> None:
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+            self.local = threading.local()
+
+
+_connection_pools: Dict[str, ConnectionPool] = {}
+
+_connection_pools_lock = threading.Lock()
+
+
+def connection_pool(filename: str) -> ConnectionPool:
+    # shared by all books in the same database
+    with _connection_pools_lock:
+        if filename not in _connection_pools:
+            _connection_pools[filename] = ConnectionPool(filename)
+        return _connection_pools[filename]
+
+
+def release_connections() -> None:
+    # closes the connections of the calling thread in all pools
+    with _connection_pools_lock:
+        pools = list(_connection_pools.values())
+
+    for pool in pools:
+        pool.release()
+
+
+class SQLiteOpeningsTree(OpeningsTree):
+    # One user's book in a database holding the books of all users. Positions are
+    # stored once as integer keys. Every entry has edges to the positions after
+    # the replies to its best child, so whole subtrees come from one query and
+    # concurrent writers only lock for their own small transaction.
+    def __init__(self, filename: str, user: str) -> None:
+        super().__init__()
+        self.filename = filename
+        self.user = user
+        self.pool = connection_pool(filename)
+        self.user_id: Optional[int] = None
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.batching = False
+
+    def _get_user_id(self, create: bool) -> Optional[int]:
+        # users are only added once they write, reading does not lock the database
+        if self.user_id is None:
+            connection = self.pool.connection()
+            if create:
+                with connection:
+                    connection.execute(
+                        "INSERT OR IGNORE INTO users (name) VALUES (?)", (self.user,)
+                    )
+
+            row = connection.execute(
+                "SELECT id FROM users WHERE name = ?", (self.user,)
+            ).fetchone()
+            if row:
+                self.user_id = int(row[0])
+
+        return self.user_id
+
+    def save(self, filename: str) -> None:
+        # entries are committed as they are written, there is no file to save
+        self._flush()
+
+    def version(self) -> str:
+        user_id = self._get_user_id(create=False)
+        if user_id is None:
+            return f"{self.user}:0"
+
+        (revision,) = (
+            self.pool.connection()
+            .execute("SELECT revision FROM users WHERE id = ?", (user_id,))
+            .fetchone()
+        )
+        return f"{self.user}:{revision}"
+
+    def get_entry(self, board_id: str) -> Optional[Dict[str, Any]]:
+        if board_id in self.pending:
+            return self.pending[board_id]
+
+        user_id = self._get_user_id(create=False)
+        if user_id is None:
+            return None
+
+        row = (
+            self.pool.connection()
+            .execute(SELECT_ENTRIES + "AND position.board = ?", (user_id, board_id))
+            .fetchone()
+        )
+        if not row:
+            return None
+        return entry_dict(row[1], row[2])
+
+    def get_entries(self, board_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        board_ids = set(board_ids)
+        entries = {
+            board_id: self.pending[board_id]
+            for board_id in board_ids & self.pending.keys()
+        }
+
+        user_id = self._get_user_id(create=False)
+        missing = list(board_ids - entries.keys())
+        if user_id is None or not missing:
+            return entries
+
+        query = SELECT_ENTRIES + "AND position.board IN ({})".format(
+            ", ".join("?" * len(missing))
+        )
+        for board_id, best_child_id, score in self.pool.connection().execute(
+            query, (user_id, *missing)
+        ):
+            entries[board_id] = entry_dict(best_child_id, score)
+        return entries
+
+    def set_entry(self, board_id: str, entry: Dict[str, Any]) -> None:
+        self.pending[board_id] = entry
+        if not self.batching:
+            self._flush()
+
+    def entries(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        self._flush()
+        user_id = self._get_user_id(create=False)
+        if user_id is None:
+            return
+
+        cursor = self.pool.connection().execute(SELECT_ENTRIES, (user_id,))
+        for board_id, best_child_id, score in cursor:
+            yield board_id, entry_dict(best_child_id, score)
+
+    def __len__(self) -> int:
+        self._flush()
+        user_id = self._get_user_id(create=False)
+        if user_id is None:
+            return 0
+
+        (count,) = (
+            self.pool.connection()
+            .execute("SELECT COUNT(*) FROM book WHERE user = ?", (user_id,))
+            .fetchone()
+        )
+        return int(count)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # all writes inside are committed in one transaction at the end
+        if self.batching:
+            yield
+            return
+
+        self.batching = True
+        try:
+            yield
+        finally:
+            self.batching = False
+            self._flush()
+
+    def upsert_many(self, entries: Iterable[Tuple[Board, Board]]) -> None:
+        with self.batch():
+            for board, best_child in entries:
+                self.upsert(board, best_child)
+
+    def _position_ids(
+        self, connection: sqlite3.Connection, board_ids: Set[str]
+    ) -> Dict[str, int]:
+        connection.executemany(
+            "INSERT OR IGNORE INTO positions (board) VALUES (?)",
+            [(board_id,) for board_id in board_ids],
+        )
+        ids: Dict[str, int] = {}
+        ordered_ids = list(board_ids)
+        for start in range(0, len(ordered_ids), MAX_QUERY_VARIABLES):
+            chunk = ordered_ids[start : start + MAX_QUERY_VARIABLES]
+            query = "SELECT board, id FROM positions WHERE board IN ({})".format(
+                ", ".join("?" * len(chunk))
+            )
+            ids.update(connection.execute(query, chunk).fetchall())
+        return ids
+
+    def _flush(self) -> None:
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+        replies = {
+            board_id: reply_ids(entry["best_child"])
+            for board_id, entry in pending.items()
+        }
+
+        board_ids: Set[str] = set()
+        for board_id, entry in pending.items():
+            board_ids |= {board_id, entry["best_child"]} | replies[board_id]
+
+        user_id = self._get_user_id(create=True)
+        connection = self.pool.connection()
+
+        with connection:
+            ids = self._position_ids(connection, board_ids)
+
+            connection.executemany(
+                UPSERT_ENTRY,
+                [
+                    (
+                        user_id,
+                        ids[board_id],
+                        ids[entry["best_child"]],
+                        entry.get("score"),
+                    )
+                    for board_id, entry in pending.items()
+                ],
+            )
+            connection.executemany(
+                "DELETE FROM edges WHERE user = ? AND parent = ?",
+                [(user_id, ids[board_id]) for board_id in pending],
+            )
+            connection.executemany(
+                "INSERT INTO edges VALUES (?, ?, ?)",
+                [
+                    (user_id, ids[board_id], ids[reply_id])
+                    for board_id in pending
+                    for reply_id in replies[board_id]
+                ],
+            )
+            connection.execute(
+                "UPDATE users SET revision = revision + 1 WHERE id = ?", (user_id,)
+            )
+
+    def subtree(self, board: Board) -> OpeningsTree:
+        # the entries of the board and of every position reachable from it
+        self._flush()
+        openings_tree = OpeningsTree()
+        user_id = self._get_user_id(create=False)
+        if user_id is None:
+            return openings_tree
+
+        # below a board without an entry are the entries after the replies to it
+        seeds = {board.get_normalized_id()}
+        if not self.get_entry(board.get_normalized_id()):
+            seeds = reply_ids(board.to_id())
+        if not seeds:
+            return openings_tree
+
+        query = SELECT_SUBTREE.format(seeds=", ".join("?" * len(seeds)))
+        cursor = self.pool.connection().execute(query, (*seeds, user_id, user_id))
+
+        for board_id, best_child_id, score in cursor:
+            openings_tree.set_entry(board_id, entry_dict(best_child_id, score))
+        return openings_tree
+
+    def snapshot(self) -> OpeningsTree:
+        openings_tree = OpeningsTree()
+        openings_tree.data["openings"] = dict(self.entries())
+        return openings_tree
+
+    # walking the book looks up many positions, one query for all of them is faster
+
+    def lines(self, color: int) -> List[List[int]]:
+        return self.snapshot().lines(color)
+
+    def export_nested(self, color: int) -> NestedTree:
+        return self.snapshot().export_nested(color)
@@ -0,0 +1,255 @@
+import heapq
+import itertools
+import json
+import os
+import textwrap
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from othello.board import KEY_SIZE, Board
+from othello.external_sort import ExternalSorter
+from othello.openings_tree import MOVE_ORDER, OpeningsTree
+
+MERGE_POLICIES = ["first", "last", "strict"]
+
+# scores are short strings like "+4", padded with zero bytes
+SCORE_SIZE = 8
+
+ENTRY_RECORD_SIZE = 2 * KEY_SIZE + SCORE_SIZE
+
+# position, then the entry of every book or None if the book doesn't have it
+MergedEntry = Tuple[str, List[Optional[Dict[str, Any]]]]
+
+
+def encode_entry(board_id: str, entry: Dict[str, Any]) -> bytes:
+    score = str(entry.get("score", "")).encode()
+    if len(score) > SCORE_SIZE or b"\0" in score:
+        raise ValueError(f"unexpected score {entry['score']!r}")
+
+    return (
+        Board.from_id(board_id).to_key()
+        + Board.from_id(entry["best_child"]).to_key()
+        + score.ljust(SCORE_SIZE, b"\0")
+    )
+
+
+def decode_entry(record: bytes) -> Tuple[str, Dict[str, Any]]:
+    board_id = Board.from_key(record[:KEY_SIZE]).to_id()
+    entry: Dict[str, Any] = {
+        "best_child": Board.from_key(record[KEY_SIZE : 2 * KEY_SIZE]).to_id()
+    }
+
+    score = record[2 * KEY_SIZE :].rstrip(b"\0")
+    if score:
+        entry["score"] = score.decode()
+    return board_id, entry
+
+
+def is_database_spec(spec: str) -> bool:
+    # books are a JSON file, or DATABASE:USER for the book of a user in a database
+    return not spec.endswith(".json") and ":" in spec
+
+
+def open_book(spec: str) -> OpeningsTree:
+    if is_database_spec(spec):
+        from othello.openings_db import SQLiteOpeningsTree
+
+        filename, user = spec.rsplit(":", 1)
+        return SQLiteOpeningsTree(filename, user)
+
+    return OpeningsTree.from_file(spec)
+
+
+def sorted_entries(
+    openings_tree: OpeningsTree,
+    stack: ExitStack,
+    buffer_size: int = 1_000_000,
+    directory: Optional[str] = None,
+) -> Iterator[bytes]:
+    # entry records in key order, the sorter spills to disk once its buffer is full
+    sorter = stack.enter_context(
+        ExternalSorter(ENTRY_RECORD_SIZE, buffer_size, KEY_SIZE, directory=directory)
+    )
+    for board_id, entry in openings_tree.entries():
+        sorter.add(encode_entry(board_id, entry))
+    return iter(sorter)
+
+
+def tag_records(
+    records: Iterator[bytes], index: int
+) -> Iterator[Tuple[bytes, int, bytes]]:
+    for record in records:
+        yield record[:KEY_SIZE], index, record
+
+
+def merge_sorted(books: List[Iterator[bytes]]) -> Iterator[MergedEntry]:
+    # books are merged by key, the book index orders entries of the same position
+    merged = heapq.merge(
+        *[tag_records(book, index) for index, book in enumerate(books)]
+    )
+
+    for _, group in itertools.groupby(merged, key=lambda item: item[0]):
+        entries: List[Optional[Dict[str, Any]]] = [None] * len(books)
+        board_id = ""
+        for _, index, record in group:
+            board_id, entries[index] = decode_entry(record)
+        yield board_id, entries
+
+
+def merged_entries(
+    openings_trees: List[OpeningsTree],
+    buffer_size: int = 1_000_000,
+    directory: Optional[str] = None,
+) -> Iterator[MergedEntry]:
+    with ExitStack() as stack:
+        books = [
+            sorted_entries(openings_tree, stack, buffer_size, directory)
+            for openings_tree in openings_trees
+        ]
+        yield from merge_sorted(books)
+
+
+def best_move_field(board_id: str, best_child_id: str) -> str:
+    board = Board.from_id(board_id)
+    moves = board.get_moves()
+    for move in MOVE_ORDER:
+        if moves & (1 << move) and (
+            board.do_move(move).get_normalized_id() == best_child_id
+        ):
+            return Board.index_to_field(move)
+    return "??"
+
+
+def is_conflict(entries: List[Optional[Dict[str, Any]]]) -> bool:
+    best_children = {entry["best_child"] for entry in entries if entry}
+    return len(best_children) > 1
+
+
+def valid_entries(
+    board_id: str, entries: List[Optional[Dict[str, Any]]]
+) -> List[Optional[Dict[str, Any]]]:
+    # entries whose best child is a child of the board, the others become None
+    children = Board.from_id(board_id).get_normalized_children_ids()
+    return [
+        entry if entry and entry["best_child"] in children else None
+        for entry in entries
+    ]
+
+
+@dataclass
+class DiffReport:
+    removed: int = 0
+    added: int = 0
+    changed: int = 0
+    rescored: int = 0
+    same: int = 0
+
+
+def diff_books(
+    merged: Iterable[MergedEntry],
+    report: DiffReport,
+    show: Callable[[str, str, List[Optional[Dict[str, Any]]]], None],
+) -> DiffReport:
+    # show is called for every difference with "-", "+", "!" or "~"
+    for board_id, (lhs, rhs) in merged:
+        if lhs and not rhs:
+            report.removed += 1
+            show("-", board_id, [lhs, rhs])
+        elif rhs and not lhs:
+            report.added += 1
+            show("+", board_id, [lhs, rhs])
+        elif lhs and rhs and lhs["best_child"] != rhs["best_child"]:
+            report.changed += 1
+            show("!", board_id, [lhs, rhs])
+        elif lhs != rhs:
+            report.rescored += 1
+            show("~", board_id, [lhs, rhs])
+        else:
+            report.same += 1
+    return report
+
+
+@dataclass
+class MergeReport:
+    positions: int = 0
+    conflicts: int = 0
+    unresolved: int = 0
+
+
+def merge_books(
+    merged: Iterable[MergedEntry],
+    policy: str,
+    report: MergeReport,
+    on_conflict: Callable[[str, List[Optional[Dict[str, Any]]], List[int]], None],
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # Entries of the merged book in key order. Only positions where the books
+    # disagree are validated, entries with an illegal best child never win. With
+    # the strict policy positions with valid but different entries are left out.
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"unknown merge policy {policy}")
+
+    for board_id, entries in merged:
+        candidates = entries
+
+        if is_conflict(entries):
+            candidates = valid_entries(board_id, entries)
+            invalid = [
+                index
+                for index, (entry, valid) in enumerate(zip(entries, candidates))
+                if entry and not valid
+            ]
+
+            report.conflicts += 1
+            on_conflict(board_id, entries, invalid)
+
+            if policy == "strict" and is_conflict(candidates):
+                report.unresolved += 1
+                continue
+
+        present = [entry for entry in candidates if entry]
+        if not present:
+            continue
+
+        report.positions += 1
+        yield board_id, present[-1] if policy == "last" else present[0]
+
+
+def write_json_book(
+    filename: str, entries: Iterable[Tuple[str, Dict[str, Any]]]
+) -> int:
+    # the layout of OpeningsTree.save, written one entry at a time. The training
+    # lines need the whole book, they are left out and computed on the first load.
+    count = 0
+    with open(filename, "w") as file:
+        file.write('{\n    "openings": {')
+        for board_id, entry in entries:
+            item = json.dumps({board_id: entry}, indent=4)[2:-2]
+            file.write(("," if count else "") + "\n" + textwrap.indent(item, "    "))
+            count += 1
+        file.write("\n    }\n}\n" if count else "}\n}\n")
+    return count
+
+
+def write_book(
+    spec: str, entries: Iterable[Tuple[str, Dict[str, Any]]], batch_size: int = 10_000
+) -> int:
+    # JSON books are replaced only once they are completely written
+    if not is_database_spec(spec):
+        count = write_json_book(f"{spec}.tmp", entries)
+        os.replace(f"{spec}.tmp", spec)
+        return count
+
+    # one transaction per batch, so pending entries don't pile up in memory
+    openings_tree = open_book(spec)
+    iterator = iter(entries)
+    count = 0
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return count
+
+        with openings_tree.batch():
+            for board_id, entry in batch:
+                openings_tree.set_entry(board_id, entry)
+        count += len(batch)
@@ -1,18 +1,63 @@
+import hashlib
 import json
-from typing import Any, Dict, Optional, Set
-
-from othello.board import Board, opponent
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from othello.bits import bits_rotations
+from othello.board import BLACK, MOVE_PASS, WHITE, Board, opponent
 from othello.game import Game
+from othello.mistakes import MistakeStore
+
+if TYPE_CHECKING:
+    from othello.jobs import JobQueue
 
 
 class OpeningsTreeValidationError(Exception):
     pass
 
 
+@dataclass
+class CheckResult:
+    # status is one of "correct", "wrong", "xot", "passed" or "queued"
+    status: str
+    move: Optional[int] = None
+
+
+# nested move tree as in the former white.json and black.json: keys are moves, leaves
+# are a score, a final move or "transposition" for lines continued elsewhere
+NestedTree = Union[str, Dict[str, Any]]
+
+TRANSPOSITION = "transposition"
+
+# keys of the training lines saved with the book, see OpeningsTree.lines
+LINES_KEYS = {BLACK: "black", WHITE: "white"}
+
+FIELD_INDEXES = {
+    Board.index_to_field(index): index for index in [MOVE_PASS, *range(64)]
+}
+
+# Symmetric moves lead to the same normalized child, the first one in this order is
+# used. Highest index first, so lines start with e6 like the nested files did.
+MOVE_ORDER = range(63, -1, -1)
+
+
 class OpeningsTree:
     def __init__(self) -> None:
         self.data: Dict[str, Dict[str, Any]] = {"openings": {}}
         self.filename: Optional[str] = None
+        self._version: Optional[str] = None
 
     @classmethod
     def from_file(cls, filename: str) -> "OpeningsTree":
@@ -23,10 +68,54 @@ class OpeningsTree:
 
     def save(self, filename: str) -> None:
         self.validate()
-        json.dump(self.data, open(filename, "w"), indent=4)
+
+        # Walking the book for the training lines is slow, so they are saved too.
+        # They are only used while the version matches, hand edits are safe.
+        saved_lines = {
+            key: [
+                " ".join(Board.index_to_field(move) for move in line)
+                for line in self.lines(color)
+            ]
+            for color, key in LINES_KEYS.items()
+        }
+        self.data["lines"] = {"version": self.version(), **saved_lines}
+
+        with open(filename, "w") as file:
+            json.dump(self.data, file, indent=4)
+            file.write("\n")
+
+    # Storage is accessed only through the entry methods below, so other backends
+    # can subclass this. Entries are {"best_child": ID} with an optional "score".
+    def get_entry(self, board_id: str) -> Optional[Dict[str, Any]]:
+        entry: Optional[Dict[str, Any]] = self.data["openings"].get(board_id)
+        return entry
+
+    def set_entry(self, board_id: str, entry: Dict[str, Any]) -> None:
+        self.data["openings"][board_id] = entry
+        self._version = None
+
+    def get_entries(self, board_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        # the entries of the boards in the book, backends can fetch them at once
+        entries: Dict[str, Dict[str, Any]] = {}
+        for board_id in board_ids:
+            entry = self.get_entry(board_id)
+            if entry:
+                entries[board_id] = entry
+        return entries
+
+    def entries(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        yield from self.data["openings"].items()
+
+    def __len__(self) -> int:
+        return len(self.data["openings"])
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # groups the writes made inside, which only matters for stored backends
+        yield
 
     def validate(self) -> None:
-        for board_id, board_data in self.data["openings"].items():
+        for board_id, board_data in self.entries():
             try:
                 board = Board.from_id(board_id)
             except ValueError as e:
@@ -48,33 +137,268 @@ class OpeningsTree:
                     f"board {board_id}: best_child is not a valid child"
                 )
 
+    def version(self) -> str:
+        # changes whenever the book contents change, computed again after a write
+        if self._version is None:
+            encoded = json.dumps(
+                {"openings": self.data["openings"]}, sort_keys=True
+            ).encode()
+            self._version = hashlib.sha256(encoded).hexdigest()[:16]
+        return self._version
+
     def lookup(self, board: Board) -> Optional[Board]:
-        board_id = board.get_normalized_id()
-        openings = self.data["openings"]
+        entry = self.get_entry(board.get_normalized_id())
 
-        if board_id not in openings:
+        if not entry:
             return None
 
-        return Board.from_id(openings[board_id]["best_child"])
+        return Board.from_id(entry["best_child"])
+
+    def upsert(
+        self, board: Board, best_child: Board, score: Optional[str] = None
+    ) -> None:
+        entry = {"best_child": best_child.get_normalized_id()}
+        if score is not None:
+            entry["score"] = score
+        self.set_entry(board.get_normalized_id(), entry)
+
+    def best_move(self, board: Board) -> Optional[int]:
+        best_child = self.lookup(board)
+        if not best_child:
+            return None
 
-    def upsert(self, board: Board, best_child: Board) -> None:
-        board_id = board.get_normalized_id()
-        best_child_id = best_child.get_normalized_id()
-        self.data["openings"][board_id] = {"best_child": best_child_id}
+        moves = board.get_moves()
+        for move in MOVE_ORDER:
+            if (
+                moves & (1 << move)
+                and board.do_move(move).normalized()[0] == best_child
+            ):
+                return move
+        return None
+
+    def import_nested(
+        self, tree: NestedTree, color: int
+    ) -> Tuple[List[str], List[str]]:
+        # Adds every decision of color in tree. Existing entries win, the IDs of
+        # boards where tree disagrees with them and boards with an illegal move in
+        # tree are returned. Subtrees after an illegal move are skipped.
+        conflicts: List[str] = []
+        invalid: List[str] = []
+
+        def walk(node: NestedTree, board: Board, previous: Optional[Board]) -> None:
+            if isinstance(node, str):
+                if node == TRANSPOSITION:
+                    return
+
+                try:
+                    Board.field_to_index(node)
+                except ValueError:
+                    # a score for the decision that was just played
+                    if node and previous and board.turn != color:
+                        board_id = previous.get_normalized_id()
+                        entry = self.get_entry(board_id)
+                        if entry and "score" not in entry:
+                            self.set_entry(board_id, dict(entry, score=node))
+                    return
+
+                # the line ends with a final move
+                node = {node: {}}
+
+            for field, subtree in node.items():
+                move = Board.field_to_index(field)
+                if not board.get_moves() & (1 << move):
+                    invalid.append(board.get_normalized_id())
+                    continue
+
+                child = board.do_move(move)
+
+                if board.turn != color:
+                    walk(subtree, child, previous)
+                    continue
+
+                best_child = self.lookup(board)
+                if not best_child:
+                    self.upsert(board, child)
+                elif best_child != child.normalized()[0]:
+                    # The rest of the subtree is still imported, its positions can
+                    # be reached by transposition. Its score is not for the kept move.
+                    conflicts.append(board.get_normalized_id())
+                    walk(subtree, child, None)
+                    continue
+
+                walk(subtree, child, board)
+
+        with self.batch():
+            walk(tree, Board(), None)
+        return conflicts, invalid
+
+    def _children(self, board: Board) -> List[Tuple[int, Board]]:
+        moves = board.get_moves()
+        if not moves:
+            if not board.do_move(MOVE_PASS).has_moves():
+                return []
+            return [(MOVE_PASS, board.do_move(MOVE_PASS))]
+
+        return [
+            (move, board.do_move(move)) for move in MOVE_ORDER if moves & (1 << move)
+        ]
+
+    def _rotated_ids(self, color: int) -> Dict[Tuple[int, int, int], str]:
+        # The normalized ID of every rotation of the boards in color's repertoire and
+        # their best children, by discs and turn. Walks through the book look boards
+        # up here instead of normalizing every child, which is most of their cost.
+        boards: Dict[str, Board] = {}
+        best_child_ids: Set[str] = set()
+        for board_id, entry in self.entries():
+            board = Board.from_id(board_id)
+            if board.turn == color:
+                boards[board_id] = board
+                best_child_ids.add(entry["best_child"])
+
+        for board_id in best_child_ids - boards.keys():
+            boards[board_id] = Board.from_id(board_id)
+
+        rotated_ids: Dict[Tuple[int, int, int], str] = {}
+        for board_id, board in boards.items():
+            rotations = zip(bits_rotations(board.me), bits_rotations(board.opp))
+            for me, opp in rotations:
+                rotated_ids[(me, opp, board.turn)] = board_id
+        return rotated_ids
+
+    def lines(self, color: int) -> List[List[int]]:
+        # Every line of color's repertoire as moves from the initial board. A line
+        # reaching a position already visited through another move order is a
+        # transposition and ends with the move reaching it.
+        saved = self.data.get("lines")
+        if saved and saved["version"] == self.version():
+            return [
+                [FIELD_INDEXES[field] for field in line.split()]
+                for line in saved[LINES_KEYS[color]]
+            ]
+
+        lines: List[List[int]] = []
+        visited: Set[str] = set()
+        rotated_ids = self._rotated_ids(color)
+        rotated_discs = {me | opp for me, opp, _ in rotated_ids}
+
+        def known_children(board: Board) -> List[Tuple[int, Board, str]]:
+            # Children in MOVE_ORDER that are in the book or a best child, with their
+            # normalized ID. Moves that fill no disc pattern of those are not played.
+            moves = board.get_moves()
+            discs = board.me | board.opp
+            children: List[Tuple[int, Board]] = []
+            if not moves:
+                children = self._children(board)
+
+            # highest move first, as in MOVE_ORDER
+            while moves:
+                move = moves.bit_length() - 1
+                moves ^= 1 << move
+                if discs | (1 << move) in rotated_discs:
+                    children.append((move, board.do_move(move)))
+
+            known: List[Tuple[int, Board, str]] = []
+            for move, child in children:
+                child_id = rotated_ids.get((child.me, child.opp, child.turn))
+                if child_id:
+                    known.append((move, child, child_id))
+            return known
+
+        def walk(board: Board, board_id: str, moves: List[int]) -> bool:
+            # False when board was visited already, the caller then ends the line
+            # itself so the decisions before the transposition are still trained
+            if board_id in visited:
+                return False
+            visited.add(board_id)
+
+            if board.turn == color:
+                entry = self.get_entry(board_id)
+                if entry:
+                    # the first move reaching the best child, as in best_move
+                    for move, child, child_id in known_children(board):
+                        if move != MOVE_PASS and child_id == entry["best_child"]:
+                            if not walk(child, child_id, moves + [move]):
+                                lines.append(moves + [move])
+                            return True
+
+                lines.append(moves)
+                return True
+
+            replies = [
+                (move, child, child_id)
+                for move, child, child_id in known_children(board)
+                if self.get_entry(child_id)
+            ]
+
+            walked = [
+                walk(child, child_id, moves + [move])
+                for move, child, child_id in replies
+            ]
+            if not any(walked):
+                lines.append(moves)
+            return True
+
+        walk(Board(), Board().get_normalized_id(), [])
+        return [line for line in lines if line]
+
+    def export_nested(self, color: int) -> NestedTree:
+        visited: Set[str] = set()
+
+        def walk(board: Board, score: str) -> NestedTree:
+            board_id = board.get_normalized_id()
+            if board_id in visited:
+                return TRANSPOSITION
+            visited.add(board_id)
+
+            if board.turn == color:
+                best_move = self.best_move(board)
+                if best_move is None:
+                    return score
+
+                entry = self.get_entry(board_id)
+                assert entry
+                child_score = entry.get("score", "")
+                field = Board.index_to_field(best_move)
+                return {field: walk(board.do_move(best_move), child_score)}
+
+            subtree: Dict[str, NestedTree] = {}
+            replies: Set[str] = set()
+            for move, child in self._children(board):
+                child_id = child.get_normalized_id()
+
+                # symmetric replies are the same move, not a transposition
+                if child_id not in replies and self.get_entry(child_id):
+                    replies.add(child_id)
+                    subtree[Board.index_to_field(move)] = walk(child, score)
+
+            return subtree or score
+
+        return walk(Board(), "")
 
     def root(self) -> dict:
-        board_id = Board().get_normalized_id()
-        return self.data["openings"][board_id]  # type: ignore
+        entry = self.get_entry(Board().get_normalized_id())
+        assert entry
+        return entry
 
     def children(self, board_id: str) -> Set[str]:
         board = Board.from_id(board_id)
-        return set(self.data["openings"].keys()) & board.get_normalized_children_ids()
-
-    def check(self, game: Game, player_name: str) -> None:
+        return {
+            child_id
+            for child_id in board.get_normalized_children_ids()
+            if self.get_entry(child_id)
+        }
+
+    def check(
+        self,
+        game: Game,
+        player_name: str,
+        mistake_store: Optional[MistakeStore] = None,
+        job_queue: Optional["JobQueue"] = None,
+    ) -> CheckResult:
 
         if game.is_xot():
             print("we don't check xot games")
-            return
+            return CheckResult("xot")
 
         player_color = game.get_color(player_name)
 
@@ -87,18 +411,29 @@ class OpeningsTree:
 
             if child.turn != opponent(player_color):
                 print(f"move {move_offset+1}: we don't check beyond passed turns")
-                return
+                return CheckResult("passed", move_offset + 1)
 
             best_child = self.lookup(board)
 
             if not best_child:
                 print(f"move {move_offset+1}: not found")
+
+                # the position is added by `openings expand`, without blocking here
+                if job_queue:
+                    job_queue.add(board)
+                    print(f"move {move_offset+1}: queued")
+                    return CheckResult("queued", move_offset + 1)
+
                 best_child = self.add_board_interactive(board, game, move_offset)
 
             child_normalized = child.normalized()[0]
 
             if child_normalized != best_child:
                 print(f"move {move_offset+1}: wrong")
+
+                if mistake_store:
+                    played_move = Board.field_to_index(game.moves[move_offset])
+                    mistake_store.record(board, played_move, "pgn")
                 print()
 
                 print("Board:")
@@ -111,10 +446,12 @@ class OpeningsTree:
 
                 print("Correct move:")
                 board.denormalize_child(best_child).show()
-                return
+                return CheckResult("wrong", move_offset + 1)
 
             print(f"move {move_offset+1}: correct")
 
+        return CheckResult("correct")
+
     def add_board_interactive(
         self, board: Board, game: Game, move_offset: int
     ) -> Board:
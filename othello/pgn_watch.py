@@ -0,0 +1,267 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from othello.game import Game
+from othello.mistakes import MistakeStore
+from othello.openings_tree import CheckResult, OpeningsTree
+
+if TYPE_CHECKING:
+    from othello.jobs import JobQueue
+
+CHECK_STATE_FILENAME = ".check_pgn.json"
+
+
+def content_hash(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+
+def game_hash(game: Game) -> str:
+    # only what the check looks at, so re-exported files with new headers still match
+    key = [
+        game.metadata.get("Black", ""),
+        game.metadata.get("White", ""),
+        game.metadata.get("Variant", ""),
+    ] + game.moves
+    return content_hash(" ".join(key).encode())
+
+
+class CheckState:
+    # manifest of processed files plus check results per (player, game, book version)
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+        if os.path.exists(filename):
+            with open(filename, "r") as file:
+                data = json.load(file)
+            self.files = data.get("files", {})
+            self.results = data.get("results", {})
+
+    def save(self) -> None:
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            json.dump({"files": self.files, "results": self.results}, file)
+        os.replace(temp_filename, self.filename)
+
+    @classmethod
+    def result_key(cls, player_name: str, game_hash: str, book_version: str) -> str:
+        return f"{player_name}:{game_hash}:{book_version}"
+
+    def get_result(self, key: str) -> Optional[CheckResult]:
+        if key not in self.results:
+            return None
+        return CheckResult(**self.results[key])
+
+    def set_result(self, key: str, result: CheckResult) -> None:
+        self.results[key] = asdict(result)
+
+    def prune_results(self, book_version: str) -> None:
+        # results of other book versions are never looked up again
+        self.results = {
+            key: result
+            for key, result in self.results.items()
+            if key.endswith(f":{book_version}")
+        }
+
+
+def file_stat(filename: str) -> Tuple[float, int]:
+    stat = os.stat(filename)
+    return stat.st_mtime, stat.st_size
+
+
+class FolderWatcher:
+    # Polls a folder for PGN files. A file is reported once its modification time
+    # and size stayed the same for the debounce period, so files that are still
+    # being written are not picked up halfway.
+    def __init__(
+        self,
+        folder: str,
+        debounce: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.folder = folder
+        self.debounce = debounce
+        self.clock = clock
+        self.seen: Dict[str, Tuple[float, int]] = {}
+        self.pending: Dict[str, Tuple[Tuple[float, int], float]] = {}
+
+    def poll(self) -> List[str]:
+        now = self.clock()
+        ready: List[str] = []
+
+        pattern = os.path.join(self.folder, "**/*.pgn")
+        for filename in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                stat = file_stat(filename)
+            except FileNotFoundError:
+                continue
+
+            if self.seen.get(filename) == stat:
+                continue
+
+            previous = self.pending.get(filename)
+            if not previous or previous[0] != stat:
+                self.pending[filename] = (stat, now)
+                if self.debounce > 0:
+                    continue
+                previous = self.pending[filename]
+
+            if now - previous[1] >= self.debounce:
+                del self.pending[filename]
+                self.seen[filename] = stat
+                ready.append(filename)
+
+        return ready
+
+
+class PGNChecker:
+    def __init__(
+        self,
+        folder: str,
+        openings_tree: OpeningsTree,
+        openings_filename: str,
+        player_name: str,
+        mistake_store: Optional[MistakeStore] = None,
+        job_queue: Optional["JobQueue"] = None,
+    ) -> None:
+        self.folder = folder
+        self.openings_tree = openings_tree
+        self.openings_filename = openings_filename
+        self.player_name = player_name
+        self.mistake_store = mistake_store
+        self.job_queue = job_queue
+        self.state = CheckState(os.path.join(folder, CHECK_STATE_FILENAME))
+
+    def is_checked(self, manifest_entry: Dict[str, Any], book_version: str) -> bool:
+        # files are checked again by the next player or once the book changed
+        return bool(
+            manifest_entry.get("player") == self.player_name
+            and manifest_entry.get("book_version") == book_version
+        )
+
+    def is_unchanged(self, filename: str, book_version: str) -> bool:
+        relative_filename = os.path.relpath(filename, self.folder)
+        manifest_entry = self.state.files.get(relative_filename)
+        if not manifest_entry or not self.is_checked(manifest_entry, book_version):
+            return False
+
+        mtime, size = file_stat(filename)
+        return bool(manifest_entry["mtime"] == mtime and manifest_entry["size"] == size)
+
+    def check_file(
+        self, filename: str, book_version: str
+    ) -> Tuple[Optional[CheckResult], str]:
+        # Returns None if the file did not change since it was last checked, and the
+        # book version after the check. The state is saved by check_files.
+        relative_filename = os.path.relpath(filename, self.folder)
+        mtime, size = file_stat(filename)
+
+        with open(filename, "rb") as file:
+            contents = file.read()
+
+        file_hash = content_hash(contents)
+        manifest_entry = self.state.files.get(relative_filename)
+        if (
+            manifest_entry
+            and manifest_entry["hash"] == file_hash
+            and self.is_checked(manifest_entry, book_version)
+        ):
+            manifest_entry.update({"mtime": mtime, "size": size})
+            return None, book_version
+
+        game = Game.from_string(contents.decode())
+        key = CheckState.result_key(self.player_name, game_hash(game), book_version)
+
+        result = self.state.get_result(key)
+        if result:
+            print(f"cached: {result.status}")
+        else:
+            result = self.openings_tree.check(
+                game, self.player_name, self.mistake_store, self.job_queue
+            )
+
+            # adding boards interactively changes the book, store the new version.
+            # The version is memoized until the book changes, so this is cheap.
+            new_book_version = self.openings_tree.version()
+            if new_book_version != book_version:
+                self.openings_tree.save(self.openings_filename)
+                book_version = new_book_version
+                key = CheckState.result_key(
+                    self.player_name, game_hash(game), book_version
+                )
+
+            self.state.set_result(key, result)
+
+        self.state.files[relative_filename] = {
+            "hash": file_hash,
+            "mtime": mtime,
+            "size": size,
+            "player": self.player_name,
+            "book_version": book_version,
+        }
+        return result, book_version
+
+    def check_folder(self) -> Dict[str, CheckResult]:
+        filenames = sorted(
+            glob.glob(os.path.join(self.folder, "**/*.pgn"), recursive=True),
+            reverse=True,
+        )
+        book_version = self.openings_tree.version()
+        return self.check_files(
+            [
+                filename
+                for filename in filenames
+                if not self.is_unchanged(filename, book_version)
+            ],
+            book_version,
+        )
+
+    def check_files(
+        self, filenames: List[str], book_version: Optional[str] = None
+    ) -> Dict[str, CheckResult]:
+        results: Dict[str, CheckResult] = {}
+        if not filenames:
+            return results
+
+        if book_version is None:
+            book_version = self.openings_tree.version()
+
+        # the state is saved once per batch, also when a check fails halfway
+        try:
+            for i, filename in enumerate(filenames):
+                print(f"checking file {i+1}/{len(filenames)}: {filename}")
+                result, book_version = self.check_file(filename, book_version)
+                if result:
+                    results[filename] = result
+        finally:
+            self.state.prune_results(book_version)
+            self.state.save()
+        return results
+
+    def watch(
+        self,
+        interval: float,
+        debounce: float,
+        iterations: Optional[int] = None,
+    ) -> None:
+        watcher = FolderWatcher(self.folder, debounce)
+
+        # files known from the manifest are not reported again
+        book_version = self.openings_tree.version()
+        for filename in glob.glob(
+            os.path.join(self.folder, "**/*.pgn"), recursive=True
+        ):
+            if self.is_unchanged(filename, book_version):
+                watcher.seen[filename] = file_stat(filename)
+
+        polls = 0
+        while iterations is None or polls < iterations:
+            self.check_files(watcher.poll())
+            polls += 1
+            time.sleep(interval)
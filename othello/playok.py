@@ -0,0 +1,232 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import requests
+from bs4 import BeautifulSoup, Tag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from othello.game import Game
+
+PLAYOK_URL = "https://www.playok.com"
+MANIFEST_FILENAME = "manifest.json"
+
+# scanning the stats page stops after this many known games in a row
+KNOWN_GAMES_RUN = 10
+
+
+@dataclass
+class GameLink:
+    game_id: str
+    date: str
+    link: str
+
+
+@dataclass
+class DownloadResult:
+    downloaded: Dict[str, Game] = field(default_factory=dict)
+    failed: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Manifest:
+    def __init__(self, pgn_folder: str) -> None:
+        self.filename = os.path.join(pgn_folder, MANIFEST_FILENAME)
+        self.pgn_folder = pgn_folder
+        self.games: Dict[str, str] = {}
+        # game ID -> error of games that failed to download, retried next run
+        self.failed: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, pgn_folder: str) -> "Manifest":
+        manifest = Manifest(pgn_folder)
+
+        if os.path.exists(manifest.filename):
+            with open(manifest.filename, "r") as manifest_file:
+                data = json.load(manifest_file)
+            manifest.games = data["games"]
+            manifest.failed = data.get("failed", {})
+            return manifest
+
+        # first run: pick up files downloaded before the manifest existed
+        for filename in glob.glob(os.path.join(pgn_folder, "**/*.pgn")):
+            game_id = os.path.splitext(os.path.basename(filename))[0]
+            manifest.games[game_id] = os.path.relpath(filename, pgn_folder)
+
+        return manifest
+
+    def save(self) -> None:
+        os.makedirs(self.pgn_folder, exist_ok=True)
+        temp_filename = self.filename + ".tmp"
+
+        with open(temp_filename, "w") as manifest_file:
+            json.dump(
+                {"games": self.games, "failed": self.failed},
+                manifest_file,
+                indent=4,
+                sort_keys=True,
+            )
+
+        os.replace(temp_filename, self.filename)
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self.games
+
+    def add(self, game_id: str, filename: str) -> None:
+        self.games[game_id] = os.path.relpath(filename, self.pgn_folder)
+        self.failed.pop(game_id, None)
+
+    def add_failed(self, game_id: str, error: str) -> None:
+        self.failed[game_id] = error
+
+
+def create_session(pool_size: int, retries: int, backoff: float) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def parse_stats_page(html: str) -> List[GameLink]:
+    soup = BeautifulSoup(html, "html.parser")
+
+    game_links: List[GameLink] = []
+
+    for trs in soup.find_all("tr")[1:]:
+        tds = trs.find_all("td")
+        anchor = tds[-1].find("a", recursive=True) if tds else None
+        link = anchor.get("href") if isinstance(anchor, Tag) else None
+
+        # rows without a game link are no finished games
+        if not isinstance(link, str):
+            continue
+
+        date = tds[0].text.strip().split(" ")[0]
+        match = re.search("[0-9]+", link)
+
+        if not match:
+            raise ValueError("regex didn't match")
+
+        game_links.append(GameLink(match.group(0), date, link))
+
+    return game_links
+
+
+class PlayOKDownloader:
+    def __init__(
+        self,
+        pgn_folder: str,
+        base_url: str = PLAYOK_URL,
+        workers: int = 4,
+        requests_per_second: float = 4.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30.0,
+    ) -> None:
+        self.pgn_folder = pgn_folder
+        self.base_url = base_url
+        self.workers = workers
+        self.timeout = timeout
+        self.session = create_session(workers, retries, backoff)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.manifest = Manifest.load(pgn_folder)
+
+    def get(self, url: str) -> str:
+        self.rate_limiter.wait()
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def new_games(self, username: str) -> List[GameLink]:
+        html = self.get(f"{self.base_url}/en/stat.phtml?u={username}&g=rv&sk=2")
+
+        # The stats page lists newest games first, so a run of known games means
+        # the rest is known too. Games that failed before can be anywhere on the
+        # page, while there are any the whole page is scanned.
+        new_games: List[GameLink] = []
+        known_run = 0
+        for game_link in parse_stats_page(html):
+            if game_link.game_id in self.manifest:
+                known_run += 1
+                if known_run >= KNOWN_GAMES_RUN and not self.manifest.failed:
+                    break
+                continue
+
+            known_run = 0
+            new_games.append(game_link)
+
+        return new_games
+
+    def fetch_game(self, game_link: GameLink) -> Tuple[str, Game]:
+        contents = self.get(f"{self.base_url}{game_link.link}")
+        game = Game.from_string(contents)
+
+        folder = os.path.join(self.pgn_folder, game_link.date)
+        os.makedirs(folder, exist_ok=True)
+
+        filename = os.path.join(folder, game_link.game_id + ".pgn")
+        with open(filename, "w") as game_file:
+            game_file.write(contents)
+
+        return filename, game
+
+    def download(self, username: str) -> DownloadResult:
+        start = time.perf_counter()
+        result = DownloadResult()
+
+        game_links = self.new_games(username)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.fetch_game, game_link): game_link
+                for game_link in game_links
+            }
+
+            for future in as_completed(futures):
+                game_link = futures[future]
+
+                try:
+                    filename, game = future.result()
+                except (requests.RequestException, ValueError, IndexError) as e:
+                    result.failed[game_link.game_id] = str(e)
+                    self.manifest.add_failed(game_link.game_id, str(e))
+                    self.manifest.save()
+                    continue
+
+                # saved as games complete, an interrupted run keeps its downloads
+                self.manifest.add(game_link.game_id, filename)
+                self.manifest.save()
+                result.downloaded[game_link.game_id] = game
+
+        result.seconds = time.perf_counter() - start
+        return result
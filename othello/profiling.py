@@ -0,0 +1,203 @@
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import IO, Dict, List, Optional, Set, Tuple, Union
+
+PROFILE_MODES = ["cprofile", "sampling"]
+
+# same layout as the keys of pstats.Stats.stats
+FunctionKey = Tuple[str, int, str]
+
+# pstats.Stats.stats value: (primitive calls, calls, tottime, cumtime, callers)
+StatsDict = Dict[FunctionKey, Tuple[int, int, float, float, Dict[FunctionKey, tuple]]]
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enable(self) -> None:
+        self.thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack: List[FunctionKey] = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+
+    def create_stats(self) -> StatsDict:
+        return stats_from_samples(self.stacks, self.interval)
+
+
+def stats_from_samples(stacks: Counter, interval: float) -> StatsDict:
+    calls: Counter = Counter()
+    self_samples: Counter = Counter()
+    cumulative_samples: Counter = Counter()
+    callers: Dict[FunctionKey, Counter] = defaultdict(Counter)
+
+    for stack, count in stacks.items():
+        self_samples[stack[-1]] += count
+
+        for function in set(stack):
+            calls[function] += count
+            cumulative_samples[function] += count
+
+        for caller, callee in set(zip(stack, stack[1:])):
+            callers[callee][caller] += count
+
+    stats: StatsDict = {}
+    for function, count in calls.items():
+        function_callers = {
+            caller: (n, n, 0.0, n * interval) for caller, n in callers[function].items()
+        }
+        stats[function] = (
+            count,
+            count,
+            self_samples[function] * interval,
+            cumulative_samples[function] * interval,
+            function_callers,
+        )
+
+    return stats
+
+
+def frame_label(function: FunctionKey) -> str:
+    filename, lineno, name = function
+    if filename == "~":
+        # builtins as reported by cProfile, e.g. <built-in method marshal.dump>
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ",")
+
+
+def collapse_stats(stats: StatsDict, max_depth: int = 64) -> Dict[str, int]:
+    # cProfile only records caller/callee pairs, so the time of a function is split
+    # over its callers proportionally to the cumulative time of each call edge.
+    callees: Dict[FunctionKey, Dict[FunctionKey, float]] = defaultdict(dict)
+    for function, (_, _, _, _, function_callers) in stats.items():
+        for caller, caller_stats in function_callers.items():
+            callees[caller][function] = caller_stats[3]
+
+    collapsed: Counter = Counter()
+
+    def walk(
+        function: FunctionKey, path: List[str], seen: Set[FunctionKey], time: float
+    ) -> None:
+        _, _, tottime, cumtime, _ = stats[function]
+        path = path + [frame_label(function)]
+
+        if cumtime <= 0:
+            return
+
+        self_time = time * min(tottime / cumtime, 1.0)
+        if self_time >= 1e-6:
+            collapsed[";".join(path)] += int(self_time * 1e6)
+
+        if len(path) >= max_depth:
+            return
+
+        for callee, edge_time in callees[function].items():
+            if callee in seen or callee not in stats:
+                continue
+
+            child_time = time * edge_time / cumtime
+            if child_time >= 1e-6:
+                walk(callee, path, seen | {callee}, child_time)
+
+    for function, (_, _, _, cumtime, function_callers) in stats.items():
+        if not function_callers:
+            walk(function, [], {function}, cumtime)
+
+    return dict(collapsed)
+
+
+def collapse_samples(stacks: Counter, interval: float) -> Dict[str, int]:
+    collapsed: Counter = Counter()
+    for stack, count in stacks.items():
+        path = ";".join(frame_label(function) for function in stack)
+        collapsed[path] += int(count * interval * 1e6)
+    return dict(collapsed)
+
+
+class Profiler:
+    def __init__(self, mode: str, interval: float = 0.005) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {mode}")
+
+        self.mode = mode
+        self.profiler: Union[cProfile.Profile, SamplingProfiler]
+
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = SamplingProfiler(interval)
+
+    def start(self) -> None:
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+
+    def stats(self) -> StatsDict:
+        if isinstance(self.profiler, SamplingProfiler):
+            return self.profiler.create_stats()
+
+        self.profiler.create_stats()
+        return self.profiler.stats  # type: ignore
+
+    def collapsed(self) -> Dict[str, int]:
+        if isinstance(self.profiler, SamplingProfiler):
+            return collapse_samples(self.profiler.stacks, self.profiler.interval)
+        return collapse_stats(self.stats())
+
+    def write(self, prefix: str) -> Tuple[str, str]:
+        pstats_filename = prefix + ".pstats"
+        collapsed_filename = prefix + ".collapsed"
+
+        with open(pstats_filename, "wb") as pstats_file:
+            marshal.dump(self.stats(), pstats_file)
+
+        with open(collapsed_filename, "w") as collapsed_file:
+            for path, weight in sorted(self.collapsed().items()):
+                if weight > 0:
+                    collapsed_file.write(f"{path} {weight}\n")
+
+        return pstats_filename, collapsed_filename
+
+
+def print_hot_functions(
+    pstats_filename: str, top: int = 20, stream: Optional[IO[str]] = None
+) -> None:
+    stream = stream or sys.stdout
+
+    with open(pstats_filename, "rb") as pstats_file:
+        if not marshal.load(pstats_file):
+            print("No profile samples were collected.", file=stream)
+            return
+
+    stats = pstats.Stats(pstats_filename, stream=stream)
+    stats.strip_dirs().sort_stats("tottime").print_stats(top)
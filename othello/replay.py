@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from othello.board import Board
+
+
+class ReplayNode:
+    __slots__ = ("board", "parent", "move", "children")
+
+    def __init__(
+        self, board: Board, parent: Optional["ReplayNode"], move: Optional[int]
+    ) -> None:
+        self.board = board
+        self.parent = parent
+        self.move = move
+        self.children: Dict[int, ReplayNode] = {}
+
+
+class ReplayCache:
+    def __init__(self, max_size: int = 200_000) -> None:
+        self.max_size = max_size
+        self.root = ReplayNode(Board(), None, None)
+        self.size = 1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        # nodes without children, least recently used first
+        self.leaves: "OrderedDict[ReplayNode, None]" = OrderedDict()
+
+    def replay(self, moves: Sequence[int]) -> List[Board]:
+        # returns the board before the first move and after every move
+        with self.lock:
+            node = self.root
+            boards = [node.board]
+
+            for move in moves:
+                child = node.children.get(move)
+
+                if child:
+                    self.hits += 1
+                else:
+                    child = self._add_child(node, move)
+                    self.misses += 1
+
+                node = child
+                boards.append(node.board)
+
+            if node in self.leaves:
+                self.leaves.move_to_end(node)
+
+            self._evict()
+            return boards
+
+    def board(self, moves: Sequence[int]) -> Board:
+        return self.replay(moves)[-1]
+
+    def _add_child(self, node: ReplayNode, move: int) -> ReplayNode:
+        child = ReplayNode(node.board.do_move(move), node, move)
+
+        node.children[move] = child
+        self.leaves.pop(node, None)
+        self.leaves[child] = None
+        self.size += 1
+        return child
+
+    def _evict(self) -> None:
+        while self.size > self.max_size and self.leaves:
+            leaf, _ = self.leaves.popitem(last=False)
+            parent = leaf.parent
+            assert parent and leaf.move is not None
+
+            del parent.children[leaf.move]
+            self.size -= 1
+            self.evictions += 1
+
+            if not parent.children and parent is not self.root:
+                # the parent is now the deepest node of its line, evict it next
+                self.leaves[parent] = None
+                self.leaves.move_to_end(parent, last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.root.children = {}
+            self.leaves.clear()
+            self.size = 1
+
+
+replay_cache = ReplayCache()
+
+
+def replay_fields(fields: Sequence[str]) -> List[Board]:
+    return replay_cache.replay([Board.field_to_index(field) for field in fields])
@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from othello.archive import GameArchiveWriter
+from othello.bits import get_moves
+from othello.board import MOVE_PASS, Board
+from othello.features import popcount
+from othello.mcts import MCTS, get_flips
+
+XOT_FILENAME = "training/xot.json"
+
+SELFPLAY_POLICIES = ["random", "mcts"]
+
+SELFPLAY_PLAYER = "selfplay"
+
+
+@dataclass
+class SelfPlayConfig:
+    policy: str = "random"
+    playouts: int = 100
+    xot: bool = False
+    seed: int = 0
+
+
+@dataclass
+class SelfPlayReport:
+    games: int
+    skipped: int
+    jobs: int
+    seconds: float
+
+    def games_per_second(self) -> float:
+        if self.seconds == 0:
+            return 0.0
+        return self.games / self.seconds
+
+    def games_per_second_per_core(self) -> float:
+        return self.games_per_second() / self.jobs
+
+
+def opening_moves(me: int, opp: int) -> List[int]:
+    # finds moves from the initial position leading to a position with black to move,
+    # only descending into children whose discs are all present in the target
+    target = me | opp
+    initial = Board()
+
+    def search(current_me: int, current_opp: int) -> Optional[List[int]]:
+        if current_me | current_opp == target:
+            if (current_me, current_opp) == (me, opp):
+                return []
+            return None
+
+        moves = get_moves(current_me, current_opp) & target
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+
+            flipped = get_flips(current_me, current_opp, bit.bit_length() - 1)
+            child_me = current_opp ^ flipped
+            child_opp = current_me | flipped | bit
+
+            if (child_me | child_opp) & ~target:
+                continue
+
+            found = search(child_me, child_opp)
+            if found is not None:
+                return [bit.bit_length() - 1] + found
+
+        return None
+
+    found = search(initial.me, initial.opp)
+    if found is None:
+        raise ValueError("position is not reachable without passing")
+    return found
+
+
+_xot_positions: List[Tuple[int, int]] = []
+
+
+def xot_positions() -> List[Tuple[int, int]]:
+    # loaded once per worker process
+    if not _xot_positions:
+        with open(XOT_FILENAME, "r") as file:
+            for xot in json.load(file):
+                _xot_positions.append((int(xot["me"], 16), int(xot["opp"], 16)))
+    return _xot_positions
+
+
+def play_game(index: int, config: SelfPlayConfig) -> Tuple[List[str], Dict[str, str]]:
+    # the same index and config always produce the same game, so resumed runs match
+    rng = random.Random(config.seed * 1_000_003 + index)
+    metadata = {
+        "Black": SELFPLAY_PLAYER,
+        "White": SELFPLAY_PLAYER,
+        "Game": str(index),
+        "Policy": config.policy,
+    }
+
+    board = Board()
+    me, opp = board.me, board.opp
+    moves: List[int] = []
+
+    if config.xot:
+        xot_me, xot_opp = rng.choice(xot_positions())
+        moves = opening_moves(xot_me, xot_opp)
+        me, opp = xot_me, xot_opp
+        metadata["Variant"] = "xot"
+
+    engine: Optional[MCTS] = None
+    if config.policy == "mcts":
+        engine = MCTS(seed=rng.randrange(1 << 32))
+
+    # black is to move at the start and after an even number of plies
+    while True:
+        valid_moves = get_moves(me, opp)
+
+        if not valid_moves:
+            if not get_moves(opp, me):
+                break
+            moves.append(MOVE_PASS)
+            me, opp = opp, me
+            continue
+
+        if engine:
+            turn = len(moves) % 2
+            result = engine.search(
+                Board.from_discs(me, opp, turn), playouts=config.playouts
+            )
+            assert result.best_move is not None
+            move = result.best_move
+        else:
+            move = rng.choice([i for i in range(64) if valid_moves & (1 << i)])
+
+        bit = 1 << move
+        flipped = get_flips(me, opp, move)
+        me, opp = opp ^ flipped, me | flipped | bit
+        moves.append(move)
+
+    if len(moves) % 2 == 0:
+        black, white = popcount(me), popcount(opp)
+    else:
+        black, white = popcount(opp), popcount(me)
+
+    metadata["Result"] = f"{black}-{white}"
+    return [Board.index_to_field(move) for move in moves], metadata
+
+
+def _play_game_worker(
+    args: Tuple[int, SelfPlayConfig],
+) -> Tuple[List[str], Dict[str, str]]:
+    return play_game(*args)
+
+
+def generate_games(
+    archive_filename: str,
+    games: int,
+    jobs: int,
+    config: SelfPlayConfig,
+    checkpoint_interval: int = 1000,
+) -> SelfPlayReport:
+    # Games are stored in index order, so the number of games already in the
+    # archive is where an interrupted run continues.
+    start = time.perf_counter()
+
+    with GameArchiveWriter(archive_filename) as writer:
+        skipped = len(writer)
+        work = [(index, config) for index in range(skipped, games)]
+
+        def store(results: Iterator[Tuple[List[str], Dict[str, str]]]) -> None:
+            for moves, metadata in results:
+                writer.add_record(moves, metadata)
+                if len(writer) % checkpoint_interval == 0:
+                    writer.flush()
+
+        if jobs == 1:
+            store(map(_play_game_worker, work))
+        else:
+            chunk_size = max(1, min(100, len(work) // (jobs * 4)))
+            with multiprocessing.Pool(jobs) as pool:
+                store(pool.imap(_play_game_worker, work, chunk_size))
+
+    return SelfPlayReport(len(work), skipped, jobs, time.perf_counter() - start)
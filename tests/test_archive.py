@@ -0,0 +1,132 @@
+import os
+import struct
+
+import pytest
+
+from othello.archive import (
+    ARCHIVE_MAGIC,
+    HEADER_FORMAT,
+    INDEX_ENTRY_SIZE,
+    GameArchive,
+    GameArchiveWriter,
+    decode_moves,
+    encode_moves,
+    import_pgn_folder,
+)
+from othello.game import Game
+
+PGN = """[Event "Reversi"]
+[Black "alice"]
+[White "bob"]
+[Variant "xot"]
+
+1. f5 d6 2. c3 d3
+"""
+
+
+def make_game(moves: str, black: str = "alice") -> Game:
+    return Game.from_moves(moves.split(), {"Black": black, "White": "bob"})
+
+
+def test_encode_moves() -> None:
+    moves = ["f5", "d6", "--", "a1", "h8"]
+    assert 5 == len(encode_moves(moves))
+    assert moves == decode_moves(encode_moves(moves))
+
+
+def test_archive_roundtrip(tmp_path: str) -> None:
+    filename = f"{tmp_path}/games.oga"
+
+    with GameArchiveWriter(filename) as writer:
+        writer.add(make_game("f5 d6 c3"))
+        writer.add(make_game("e6 f4", black="carol"))
+
+    with GameArchive(filename) as archive:
+        assert 2 == len(archive)
+        assert ["e6", "f4"] == archive[1].moves
+        assert "carol" == archive.metadata(-1)["Black"]
+        assert make_game("f5 d6 c3").boards == archive[0].boards
+        assert [["f5", "d6", "c3"], ["e6", "f4"]] == [game.moves for game in archive]
+
+        with pytest.raises(IndexError):
+            archive[2]
+
+
+def test_archive_append(tmp_path: str) -> None:
+    filename = f"{tmp_path}/games.oga"
+
+    with GameArchiveWriter(filename) as writer:
+        writer.add(make_game("f5"))
+
+    with GameArchiveWriter(filename) as writer:
+        writer.add(make_game("e6"))
+
+    with GameArchive(filename) as archive:
+        assert [["f5"], ["e6"]] == [game.moves for game in archive]
+        assert archive.rebuilt_offsets is None
+
+
+def test_archive_recovers_after_interrupted_write(tmp_path: str) -> None:
+    filename = f"{tmp_path}/games.oga"
+
+    writer = GameArchiveWriter(filename)
+    writer.add(make_game("f5"))
+    writer.flush()
+    writer.add(make_game("e6 f4"))
+    writer.file.flush()
+
+    # simulate a crash halfway through writing the next record
+    writer.file.write(b"\x05\x00")
+    writer.file.flush()
+
+    with GameArchive(filename) as archive:
+        assert [["f5"], ["e6", "f4"]] == [game.moves for game in archive]
+        assert archive.rebuilt_offsets is not None
+
+    with GameArchiveWriter(filename) as resumed:
+        resumed.add(make_game("c4"))
+
+    with GameArchive(filename) as archive:
+        assert [["f5"], ["e6", "f4"], ["c4"]] == [game.moves for game in archive]
+
+
+def test_archive_unfinalized_header_matching_size(tmp_path: str) -> None:
+    filename = f"{tmp_path}/games.oga"
+
+    writer = GameArchiveWriter(filename)
+    writer.add(make_game("f5 d6"))
+    writer.file.flush()
+
+    # a truncated record, padded so the file size is a multiple of the index entry
+    size = os.path.getsize(filename) + 2
+    writer.file.write(b"\x7f\x00" + bytes(-size % INDEX_ENTRY_SIZE))
+    writer.file.flush()
+
+    # the stale count happens to match the file size
+    game_count = os.path.getsize(filename) // INDEX_ENTRY_SIZE
+    writer.file.seek(0)
+    writer.file.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, 0, game_count, 0))
+    writer.file.flush()
+
+    with GameArchive(filename) as archive:
+        assert archive.rebuilt_offsets is not None
+        assert [["f5", "d6"]] == [game.moves for game in archive]
+
+
+def test_import_pgn_folder(tmp_path: str) -> None:
+    folder = os.path.join(tmp_path, "pgn")
+    os.makedirs(os.path.join(folder, "2021-01-01"))
+
+    with open(os.path.join(folder, "2021-01-01", "1.pgn"), "w") as pgn_file:
+        pgn_file.write(PGN)
+
+    filename = f"{tmp_path}/games.oga"
+    assert 1 == import_pgn_folder(folder, filename)
+    assert 0 == import_pgn_folder(folder, filename)
+
+    with GameArchive(filename) as archive:
+        game = archive[0]
+
+    assert game.is_xot()
+    assert "alice" == game.metadata["Black"]
+    assert os.path.join("2021-01-01", "1.pgn") == game.metadata["Filename"]
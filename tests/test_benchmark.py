@@ -0,0 +1,49 @@
+from othello.benchmark import (
+    BENCHMARK_BASELINE_FILENAME,
+    BENCHMARKS,
+    BenchmarkResult,
+    Comparison,
+    compare,
+    load_baseline,
+    pgn_string,
+    run_benchmarks,
+    save_baseline,
+)
+from othello.game import Game
+
+
+def test_benchmarks_run() -> None:
+    results = run_benchmarks(min_time=0.0, repeats=1)
+    assert list(BENCHMARKS) == [result.name for result in results]
+    assert all(result.nanoseconds > 0 for result in results)
+
+
+def test_baseline_covers_all_benchmarks() -> None:
+    assert set(BENCHMARKS) == set(load_baseline(BENCHMARK_BASELINE_FILENAME))
+
+
+def test_baseline_roundtrip(tmp_path: str) -> None:
+    filename = f"{tmp_path}/nested/baseline.json"
+    save_baseline(filename, [BenchmarkResult("board.to_id", 123.45)])
+    assert {"board.to_id": 123.5} == load_baseline(filename)
+
+
+def test_comparison() -> None:
+    assert not Comparison("a", 100.0, 120.0).is_regression(0.25)
+    assert Comparison("a", 100.0, 130.0).is_regression(0.25)
+    assert not Comparison("a", None, 130.0).is_regression(0.25)
+    assert Comparison("a", None, 130.0).ratio() is None
+
+
+def test_compare_retries_regressions() -> None:
+    # an impossibly fast baseline stays a regression after measuring again
+    results = [BenchmarkResult("board.to_id", 1e9)]
+    comparisons = compare(results, {"board.to_id": 1e-3}, 0.25, min_time=0.0)
+    assert comparisons[0].is_regression(0.25)
+    assert comparisons[0].current < 1e9
+
+
+def test_pgn_string() -> None:
+    game = Game.from_string(pgn_string(3))
+    assert "selfplay" == game.metadata["Black"]
+    assert 60 <= len(game.moves)
@@ -0,0 +1,125 @@
+from typing import Any, Dict
+
+import pytest
+
+from othello.board import BLACK, MOVE_PASS, WHITE, Board
+from othello.book import BookAnnotator, book_children, normalized_ids
+from othello.features import random_boards
+from othello.openings_db import SQLiteOpeningsTree
+from othello.openings_tree import NestedTree, OpeningsTree
+from training.app import app
+
+WHITE_TREE: NestedTree = {"e6": {"f4": {"e3": {"f6": "+2"}, "c3": {"c4": "0"}}}}
+
+BLACK_TREE: NestedTree = {"e6": {"f4": {"c3": "+1"}, "d6": {"c5": "0"}}}
+
+
+def play(moves: str) -> Board:
+    board = Board()
+    for field in moves.split():
+        board = board.do_move(Board.field_to_index(field))
+    return board
+
+
+def expected_children(
+    openings_tree: OpeningsTree, board: Board
+) -> Dict[str, Dict[str, Any]]:
+    expected: Dict[str, Dict[str, Any]] = {}
+    best_child = openings_tree.lookup(board)
+
+    for move in range(64):
+        if not board.get_moves() & (1 << move):
+            continue
+
+        child = board.do_move(move)
+        if not child.has_moves():
+            child = child.do_move(MOVE_PASS)
+
+        expected[str(move)] = {
+            "book": best_child is not None and child.normalized()[0] == best_child,
+            "best_reply": openings_tree.best_move(child),
+        }
+    return expected
+
+
+def test_normalized_ids() -> None:
+    boards = [child for board in random_boards(50) for child in board.get_children()]
+
+    assert [] == normalized_ids([])
+    assert [board.get_normalized_id() for board in boards] == normalized_ids(boards)
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_book_children(tmp_path: str, backend: str) -> None:
+    openings_tree = OpeningsTree()
+    if backend == "sqlite":
+        openings_tree = SQLiteOpeningsTree(f"{tmp_path}/openings.sqlite3", "alice")
+
+    openings_tree.import_nested(WHITE_TREE, WHITE)
+    openings_tree.import_nested(BLACK_TREE, BLACK)
+
+    for moves in ["", "e6", "e6 f4", "e6 f4 e3", "d3", "c4 c3", "e6 d6 c5"]:
+        board = play(moves)
+        assert expected_children(openings_tree, board) == book_children(
+            openings_tree, board
+        )
+
+    annotations = book_children(openings_tree, play("e6"))
+    assert {"book": True, "best_reply": Board.field_to_index("c3")} == annotations[
+        str(Board.field_to_index("f4"))
+    ]
+
+
+def test_get_entries(tmp_path: str) -> None:
+    book = SQLiteOpeningsTree(f"{tmp_path}/openings.sqlite3", "alice")
+    tree = OpeningsTree()
+
+    for openings_tree in [book, tree]:
+        openings_tree.import_nested(BLACK_TREE, BLACK)
+
+    board_ids = [board_id for board_id, _ in tree.entries()] + [Board().to_id()]
+    assert dict(tree.entries()) == tree.get_entries(board_ids)
+    assert dict(tree.entries()) == book.get_entries(board_ids)
+    assert {} == SQLiteOpeningsTree(f"{tmp_path}/openings.sqlite3", "bob").get_entries(
+        board_ids
+    )
+
+
+def test_book_annotator_cache() -> None:
+    openings_tree = OpeningsTree()
+    openings_tree.import_nested(BLACK_TREE, BLACK)
+    annotator = BookAnnotator(openings_tree, max_size=2)
+
+    boards = [play("e6"), play("e6 f4"), play("e6 d6")]
+    for board in boards:
+        annotator.children(board)
+
+    assert [board.to_id() for board in boards[1:]] == list(annotator.cache)
+    assert annotator.children(boards[2]) is annotator.cache[boards[2].to_id()]
+
+
+def test_board_details_book(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    book = SQLiteOpeningsTree(database, "alice")
+    book.import_nested(WHITE_TREE, WHITE)
+    book.import_nested(BLACK_TREE, BLACK)
+
+    app.config["OPENINGS_DATABASE"] = database
+    client = app.test_client()
+    board_id = play("e6").to_id()
+    f4 = str(Board.field_to_index("f4"))
+
+    try:
+        plain = client.get(f"/api/boards/{board_id}").get_json()
+        assert "book" not in plain["children"][f4]
+
+        data = client.get(f"/api/boards/{board_id}?book=1&user=alice").get_json()
+        assert data["children"][f4]["book"]
+        assert Board.field_to_index("c3") == data["children"][f4]["best_reply"]
+        assert plain["children"][f4]["id"] == data["children"][f4]["id"]
+
+        data = client.get(f"/api/boards/{board_id}?book=1&user=bob").get_json()
+        assert not data["children"][f4]["book"]
+        assert data["children"][f4]["best_reply"] is None
+    finally:
+        del app.config["OPENINGS_DATABASE"]
@@ -0,0 +1,68 @@
+import random
+from typing import List
+
+from othello.board import BLACK, WHITE, Board
+from othello.coverage import CoverageAnalysis
+from othello.external_sort import ExternalSorter
+from othello.openings_tree import OpeningsTree
+
+
+def test_external_sorter_combines_across_runs() -> None:
+    def combine(lhs: bytes, rhs: bytes) -> bytes:
+        return lhs[:1] + bytes([lhs[1] + rhs[1]])
+
+    values = [random.randrange(10) for _ in range(100)]
+
+    with ExternalSorter(2, buffer_size=7, key_size=1, combine=combine) as sorter:
+        for value in values:
+            sorter.add(bytes([value, 1]))
+
+        assert len(sorter.runs) > 1
+        records = list(sorter)
+
+    assert [bytes([value, values.count(value)]) for value in sorted(set(values))] == (
+        records
+    )
+
+
+def make_openings_tree() -> OpeningsTree:
+    openings_tree = OpeningsTree()
+    board = Board()
+    best_child = board.do_move(Board.field_to_index("f5"))
+    openings_tree.upsert(board, best_child)
+
+    # cover only one of the three replies to f5
+    reply = best_child.do_move(Board.field_to_index("d6"))
+    openings_tree.upsert(reply, reply.do_move(Board.field_to_index("c3")))
+    return openings_tree
+
+
+def gap_ids(analysis: CoverageAnalysis, depth: int) -> List[str]:
+    return [gap.board.to_id() for gap in analysis.run(depth)]
+
+
+def test_coverage_gaps() -> None:
+    analysis = CoverageAnalysis(make_openings_tree(), BLACK)
+    gaps = analysis.run(2)
+
+    assert 2 == len(gaps)
+    assert all(2 == gap.ply for gap in gaps)
+    assert 1.0 / 3 == gaps[0].weight
+    assert [1, 1, 3] == [level.positions for level in analysis.stats.levels]
+
+
+def test_coverage_other_color_is_not_covered() -> None:
+    analysis = CoverageAnalysis(make_openings_tree(), WHITE)
+    gaps = analysis.run(3)
+
+    # the four first moves are symmetric, so white has a single position to cover
+    assert 1 == len(gaps)
+    assert 1 == gaps[0].ply
+
+
+def test_coverage_small_buffer() -> None:
+    unbounded = CoverageAnalysis(make_openings_tree(), BLACK)
+    bounded = CoverageAnalysis(make_openings_tree(), BLACK, buffer_size=1)
+
+    assert gap_ids(unbounded, 4) == gap_ids(bounded, 4)
+    assert 0 < bounded.stats.spilled_runs
@@ -0,0 +1,95 @@
+import random
+from typing import List, Tuple
+
+import numpy as np
+
+from othello.board import BLACK, Board
+from othello.eval import (
+    PATTERN_LOOKUPS,
+    PATTERN_TABLES,
+    PATTERN_WEIGHTS_SIZE,
+    PHASE_COUNT,
+    PatternEvaluator,
+    train,
+)
+
+
+def random_positions(count: int, seed: int = 0) -> List[Board]:
+    rng = random.Random(seed)
+    boards: List[Board] = []
+    board = Board()
+
+    while len(boards) < count:
+        children = board.get_children()
+        if not children:
+            board = Board()
+            continue
+        board = rng.choice(children)
+        boards.append(board)
+
+    return boards
+
+
+def as_arrays(boards: List[Board]) -> Tuple[np.ndarray, np.ndarray]:
+    me = np.array([board.me for board in boards], dtype=np.uint64)
+    opp = np.array([board.opp for board in boards], dtype=np.uint64)
+    return me, opp
+
+
+def random_evaluator() -> PatternEvaluator:
+    rng = np.random.default_rng(0)
+    return PatternEvaluator(
+        rng.normal(size=(PHASE_COUNT, PATTERN_WEIGHTS_SIZE)),
+        rng.normal(size=PHASE_COUNT),
+        rng.normal(size=PHASE_COUNT),
+    )
+
+
+def test_pattern_tables() -> None:
+    assert 8 * len(PATTERN_TABLES) == len(PATTERN_LOOKUPS)
+
+    corner = next(table for table in PATTERN_TABLES if table.name == "corner_3x3")
+    assert {0, 7, 56, 63} == {variant[0] for variant in corner.variants}
+
+
+def test_evaluate_matches_batch() -> None:
+    evaluator = random_evaluator()
+    boards = random_positions(200)
+
+    expected = [evaluator.evaluate(board) for board in boards]
+    assert np.allclose(expected, evaluator.evaluate_batch(*as_arrays(boards)))
+
+
+def test_evaluate_is_symmetric() -> None:
+    evaluator = random_evaluator()
+
+    for board in random_positions(20, seed=1):
+        expected = evaluator.evaluate(board)
+        for rotation in range(8):
+            assert np.isclose(expected, evaluator.evaluate(board.rotated(rotation)))
+
+
+def test_train() -> None:
+    boards = random_positions(2000, seed=2)
+    me, opp = as_arrays(boards)
+    scores = random_evaluator().evaluate_batch(me, opp)
+
+    evaluator, report = train(me, opp, scores, iterations=50, regularization=0.1)
+
+    assert 2000 == report.positions
+    assert 2000 == sum(report.phase_positions)
+    assert report.rmse < 0.1 * np.sqrt((scores**2).mean())
+    assert np.isclose(
+        evaluator.evaluate(Board.from_discs(boards[0].me, boards[0].opp, BLACK)),
+        evaluator.evaluate_batch(me[:1], opp[:1])[0],
+    )
+
+
+def test_save_load(tmp_path: str) -> None:
+    evaluator = random_evaluator()
+    filename = f"{tmp_path}/weights.npz"
+    evaluator.save(filename)
+
+    loaded = PatternEvaluator.load(filename)
+    assert np.array_equal(evaluator.pattern_weights, loaded.pattern_weights)
+    assert np.array_equal(evaluator.bias, loaded.bias)
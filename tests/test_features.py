@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from othello.board import BLACK, Board
+from othello.features import (
+    FEATURES,
+    board_features,
+    features_batch,
+    frontier_discs,
+    popcount,
+    popcount_array,
+    potential_mobility,
+    random_boards,
+    region_parity,
+    stable_discs,
+)
+
+
+def neighbour_squares(index: int) -> list:
+    x, y = index % 8, index // 8
+    return [
+        8 * (y + dy) + x + dx
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        if (dx or dy) and 0 <= x + dx < 8 and 0 <= y + dy < 8
+    ]
+
+
+def test_popcount_array() -> None:
+    values = np.array([0, 1, 0xFF, 0xFFFFFFFFFFFFFFFF], dtype=np.uint64)
+    assert [0, 1, 8, 64] == popcount_array(values).tolist()
+
+
+def test_frontier_and_potential_mobility() -> None:
+    for board in random_boards(100):
+        empty = ~(board.me | board.opp)
+        frontier = 0
+        potential = 0
+
+        for index in range(64):
+            around = neighbour_squares(index)
+            if board.me & (1 << index) and any(empty & (1 << i) for i in around):
+                frontier |= 1 << index
+            if empty & (1 << index) and any(board.opp & (1 << i) for i in around):
+                potential |= 1 << index
+
+        assert frontier == frontier_discs(board.me, board.opp)
+        assert potential == potential_mobility(board.me, board.opp)
+
+
+@pytest.mark.parametrize(
+    ["me", "opp", "expected"],
+    (
+        [0x0000000000000001, 0, 0x0000000000000001],
+        [0x0000000000000003, 0, 0x0000000000000003],
+        [0x0000000000000002, 0, 0],
+        [0x00000000000000FE, 0x0000000000000001, 0x00000000000000FE],
+        [0x0000000000000200, 0x0000000000000001, 0],
+        [0x0000000000000000, 0x0000000000000001, 0],
+    ),
+)
+def test_stable_discs(me: int, opp: int, expected: int) -> None:
+    assert expected == stable_discs(me, opp)
+
+
+def test_stable_discs_full_board() -> None:
+    me = 0x5555555555555555
+    opp = 0xAAAAAAAAAAAAAAAA
+    assert me == stable_discs(me, opp)
+    assert opp == stable_discs(opp, me)
+
+
+def test_region_parity() -> None:
+    assert 0b1111 == region_parity(Board().me, Board().opp)
+    assert 0 == region_parity(0xFFFFFFFFFFFFFFFF, 0)
+
+
+def test_features_batch_matches_single() -> None:
+    boards = random_boards(300, seed=3)
+    me = np.array([board.me for board in boards], dtype=np.uint64)
+    opp = np.array([board.opp for board in boards], dtype=np.uint64)
+
+    batch = features_batch(me, opp)
+
+    for i, board in enumerate(boards):
+        for name, feature in FEATURES.items():
+            assert popcount(feature(board.me, board.opp)) == batch[name][i]
+            assert popcount(feature(board.opp, board.me)) == batch["opp_" + name][i]
+        assert region_parity(board.me, board.opp) == batch["region_parity"][i]
+
+
+def test_board_features() -> None:
+    board = Board.from_discs(0x8000000000000081, 0x0000000000000200, BLACK)
+    features = board_features(board)
+
+    assert {"black": 3, "white": 0} == features["stable"]
+    assert {"black": 3, "white": 0} == features["corners"]
+    assert {"black": 0, "white": 1} == features["x_squares"]
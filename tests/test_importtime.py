@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+import pytest
+
+import manage
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = {"PIL", "bs4", "flask", "graphviz", "numpy", "requests", "sqlite3"}
+
+# total import time of everything except interpreter startup, very generous to
+# avoid flaky failures, the module checks below catch most regressions
+IMPORT_BUDGET_MS = 250
+
+# (arguments, heavy modules the command is allowed to import)
+COMMAND_RUNS: List[Tuple[List[str], Set[str]]] = [
+    (["openings", "show", "initial"], set()),
+    (["suggest", "initial", "--playouts", "10"], {"numpy"}),
+]
+
+
+def import_times(arguments: List[str]) -> Dict[str, float]:
+    # cumulative import time in ms per top level module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "manage.py"] + arguments,
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert 0 == result.returncode, result.stderr
+
+    times: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        if name.startswith("  "):
+            continue
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def command_paths() -> List[List[str]]:
+    paths: List[List[str]] = []
+    for name, command in manage.cli.commands.items():
+        paths.append([name])
+        for subcommand_name in getattr(command, "commands", {}):
+            paths.append([name, subcommand_name])
+    return paths
+
+
+def check_imports(arguments: List[str], allowed: Set[str]) -> None:
+    times = import_times(arguments)
+    heavy = {name.split(".")[0] for name in times} & (HEAVY_MODULES - allowed)
+    assert not heavy, f"{' '.join(arguments)} imports {heavy}"
+
+    total = sum(time for name, time in times.items() if name != "site")
+    assert total < IMPORT_BUDGET_MS, f"{' '.join(arguments)} imports took {total}ms"
+
+
+@pytest.mark.parametrize("path", command_paths(), ids=" ".join)
+def test_command_help_imports(path: List[str]) -> None:
+    check_imports(path + ["--help"], set())
+
+
+@pytest.mark.parametrize("arguments,allowed", COMMAND_RUNS)
+def test_command_run_imports(arguments: List[str], allowed: Set[str]) -> None:
+    check_imports(arguments, allowed)
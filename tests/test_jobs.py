@@ -0,0 +1,184 @@
+import random
+
+import pytest
+
+from othello.bits import get_moves
+from othello.board import MOVE_PASS, Board
+from othello.features import popcount
+from othello.game import Game
+from othello.jobs import (
+    EndgameSolver,
+    JobQueue,
+    MCTSEvaluator,
+    expand,
+    final_score,
+    get_evaluator,
+    solve,
+)
+from othello.mcts import get_flips
+from othello.openings_tree import OpeningsTree
+
+
+def random_endgame(empties: int, seed: int) -> Board:
+    rng = random.Random(seed)
+
+    while True:
+        board = Board()
+        while 64 - popcount(board.me | board.opp) > empties:
+            if not board.has_moves():
+                board = board.do_move(MOVE_PASS)
+                if not board.has_moves():
+                    break
+
+            moves = board.get_moves()
+            board = board.do_move(
+                rng.choice([move for move in range(64) if moves & (1 << move)])
+            )
+
+        if board.has_moves() and 64 - popcount(board.me | board.opp) == empties:
+            return board
+
+
+def minimax(me: int, opp: int) -> int:
+    moves = get_moves(me, opp)
+    if not moves:
+        if not get_moves(opp, me):
+            return final_score(me, opp)
+        return -minimax(opp, me)
+
+    scores = []
+    for move in range(64):
+        if moves & (1 << move):
+            flipped = get_flips(me, opp, move)
+            scores.append(-minimax(opp ^ flipped, me | flipped | (1 << move)))
+    return max(scores)
+
+
+def test_solve_matches_minimax() -> None:
+    for seed in range(10):
+        board = random_endgame(6, seed)
+        assert minimax(board.me, board.opp) == solve(board.me, board.opp, -64, 64)
+
+
+def test_endgame_solver() -> None:
+    solver = EndgameSolver(max_empties=8)
+    assert solver(Board()) is None
+
+    board = random_endgame(8, 0)
+    evaluation = solver(board)
+    assert evaluation
+    assert board.get_moves() & (1 << evaluation.move)
+
+    child = board.do_move(evaluation.move)
+    score = -solve(child.me, child.opp, -64, 64)
+    assert score == minimax(board.me, board.opp)
+    assert (f"{score:+d}" if score else "0") == evaluation.score
+
+
+def test_mcts_evaluator_pass() -> None:
+    # black has to pass, there is no move for the book
+    board = Board.from_id("B7e7c2012263230200103dfedd9cdcfdf")
+    assert 0 == board.get_moves()
+    assert MCTSEvaluator(50, seed=0)(board) is None
+
+    evaluation = MCTSEvaluator(50, seed=0)(Board())
+    assert evaluation
+    assert Board().get_moves() & (1 << evaluation.move)
+
+
+def test_job_queue(tmp_path: str) -> None:
+    filename = f"{tmp_path}/jobs.sqlite3"
+    e6 = Board().do_move(Board.field_to_index("e6"))
+    d3 = Board().do_move(Board.field_to_index("d3"))
+    e6_f4 = e6.do_move(Board.field_to_index("f4"))
+
+    with JobQueue(filename) as job_queue:
+        # d3 is e6 rotated, so it's the same job with the higher priority
+        job_queue.add(e6_f4)
+        job_queue.add(e6, priority=1)
+        job_queue.add(d3, priority=5)
+        assert {"queued": 2, "running": 0, "done": 0, "unsolved": 0} == (
+            job_queue.progress()
+        )
+
+        assert [e6.get_normalized_id()] == job_queue.claim(1)
+
+    # the claimed job is back after a crash, but not while it may still be running
+    with JobQueue(filename) as job_queue:
+        assert 0 == job_queue.recover(stale_after=3600)
+        assert 1 == job_queue.recover()
+        assert [e6.get_normalized_id()] == job_queue.claim(1)
+
+        job_queue.finish([e6.get_normalized_id()])
+        job_queue.add(e6, priority=10)
+        assert [e6_f4.get_normalized_id()] == job_queue.claim(5)
+        assert [] == job_queue.claim(5)
+        assert {"queued": 0, "running": 1, "done": 1, "unsolved": 0} == (
+            job_queue.progress()
+        )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_expand(tmp_path: str, jobs: int) -> None:
+    openings_filename = f"{tmp_path}/openings.json"
+    openings_tree = OpeningsTree()
+
+    endgames = [random_endgame(8, seed) for seed in range(5)]
+    known = random_endgame(8, 5)
+    openings_tree.upsert(known, known.get_children()[0])
+
+    with JobQueue(f"{tmp_path}/jobs.sqlite3") as job_queue:
+        job_queue.add_many(endgames + [known, Board()])
+        report = expand(
+            job_queue,
+            openings_tree,
+            openings_filename,
+            get_evaluator("endgame", max_empties=8),
+            jobs=jobs,
+            batch_size=2,
+        )
+
+        assert (5, 1, 1) == (report.added, report.unsolved, report.skipped)
+        assert {"queued": 0, "running": 0, "done": 6, "unsolved": 1} == (
+            job_queue.progress()
+        )
+
+    saved = OpeningsTree.from_file(openings_filename)
+    for board in endgames:
+        evaluation = EndgameSolver(8)(board)
+        assert evaluation
+        assert board.do_move(evaluation.move).normalized()[0] == saved.lookup(board)
+        assert {"best_child", "score"} == set(
+            saved.get_entry(board.get_normalized_id()) or {}
+        )
+
+
+def test_requeue_unsolved(tmp_path: str) -> None:
+    e6 = Board().do_move(Board.field_to_index("e6"))
+    f4 = e6.do_move(Board.field_to_index("f4"))
+
+    with JobQueue(f"{tmp_path}/jobs.sqlite3") as job_queue:
+        job_queue.add_many([e6, f4])
+        assert 2 == len(job_queue.claim(2))
+        job_queue.finish([e6.get_normalized_id()], "unsolved")
+        job_queue.finish([f4.get_normalized_id()])
+
+        # adding it again gives another evaluator a chance, done jobs stay done
+        job_queue.add_many([e6, f4], priority=3)
+        assert {"queued": 1, "running": 0, "done": 1, "unsolved": 0} == (
+            job_queue.progress()
+        )
+
+        job_queue.finish(job_queue.claim(1), "unsolved")
+        assert 1 == job_queue.requeue()
+        assert [e6.get_normalized_id()] == job_queue.claim(5)
+
+
+def test_check_queues_unknown_positions(tmp_path: str) -> None:
+    game = Game.from_moves(["f5", "d6", "c3"], {"Black": "bob", "White": "alice"})
+
+    with JobQueue(f"{tmp_path}/jobs.sqlite3") as job_queue:
+        result = OpeningsTree().check(game, "bob", job_queue=job_queue)
+
+        assert ("queued", 1) == (result.status, result.move)
+        assert [Board().get_normalized_id()] == job_queue.claim(5)
@@ -0,0 +1,213 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from othello.board import BLACK, Board
+from othello.openings_tree import OpeningsTree
+from training.app import app
+from training.live import (
+    LiveServer,
+    LiveSession,
+    accept_key,
+    encode_frame,
+    read_frame,
+    read_message,
+)
+
+
+class LiveClient:
+    # stand-in for the browser: masked frames and JSON messages
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port: int) -> "LiveClient":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(
+            (
+                "GET / HTTP/1.1\r\n"
+                f"Host: 127.0.0.1:{port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        response = await reader.readuntil(b"\r\n\r\n")
+        assert response.startswith(b"HTTP/1.1 101")
+        assert f"Sec-WebSocket-Accept: {accept_key(key)}".encode() in response
+        return cls(reader, writer)
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        self.writer.write(encode_frame(json.dumps(message).encode(), mask=True))
+        await self.writer.drain()
+
+    async def receive(self) -> Dict[str, Any]:
+        text = await read_message(self.reader, self.writer, mask=True)
+        assert text is not None
+        message: Dict[str, Any] = json.loads(text)
+        return message
+
+    async def request(self, message: Dict[str, Any], replies: int) -> List[Any]:
+        await self.send(message)
+        return [await self.receive() for _ in range(replies)]
+
+    async def close(self) -> None:
+        self.writer.write(encode_frame(b"\x03\xe8", 0x8, mask=True))
+        await self.writer.drain()
+        _, opcode, _ = await read_frame(self.reader)
+        assert 0x8 == opcode
+        self.writer.close()
+
+
+def run_with_server(server: LiveServer, test: Any) -> None:
+    async def main() -> None:
+        running = await server.start("127.0.0.1", 0)
+        port = running.sockets[0].getsockname()[1]
+        async with running:
+            await test(port)
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("length", [0, 125, 126, 65535, 65536])
+def test_frame_roundtrip(length: int) -> None:
+    payload = bytes(random.randrange(256) for _ in range(length))
+
+    async def decode() -> None:
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(payload, mask=True))
+        assert (True, 0x1, payload) == await read_frame(reader)
+
+    asyncio.run(decode())
+
+
+def test_live_game_moves() -> None:
+    async def test(port: int) -> None:
+        client = await LiveClient.connect(port)
+
+        initial = await client.receive()
+        # only what changed, the page gets the image from /api/training
+        assert {"type": "board", "id": Board().to_id(), "mistakes": []} == initial
+
+        assert [{"type": "move", "move": 0, "valid": False}] == await client.request(
+            {"type": "move", "move": 0}, 1
+        )
+
+        f5 = Board.field_to_index("f5")
+        result, board = await client.request({"type": "move", "move": f5}, 2)
+        assert {"type": "move", "move": f5, "valid": True} == result
+        assert Board().do_move(f5).to_id() == board["id"]
+
+        error = await client.request({"type": "unknown"}, 1)
+        assert "error" == error[0]["type"]
+        await client.close()
+
+    run_with_server(LiveServer(), test)
+
+
+def test_live_training(tmp_path: str) -> None:
+    filename = f"{tmp_path}/openings.json"
+    tree = OpeningsTree()
+    tree.import_nested({"e6": {"f4": {"c3": "+1"}}}, BLACK)
+    tree.save(filename)
+
+    board = Board()
+    for field in ["e6", "f4"]:
+        board = board.do_move(Board.field_to_index(field))
+
+    async def test(port: int) -> None:
+        client = await LiveClient.connect(port)
+        await client.receive()
+
+        progress, step = await client.request({"type": "training"}, 2)
+        assert {"type": "progress", "done": 0, "total": 1} == progress
+        assert board.to_id() == step["id"]
+
+        d3 = Board.field_to_index("d3")
+        result, step = await client.request({"type": "move", "move": d3}, 2)
+        assert result["correct"] is False
+        assert [d3] == step["mistakes"]
+
+        # mistakes are kept until the opening is repeated without them
+        c3 = Board.field_to_index("c3")
+        result, step = await client.request({"type": "move", "move": c3}, 2)
+        assert result["correct"] is True
+        assert [] == step["mistakes"]
+
+        result, progress = await client.request({"type": "move", "move": c3}, 2)
+        assert result["correct"] is True
+        assert {"type": "progress", "done": 1, "total": 1} == progress
+        await client.close()
+
+    run_with_server(LiveServer(filename), test)
+
+
+def test_live_slow_message(monkeypatch: pytest.MonkeyPatch) -> None:
+    def slow_training(session: LiveSession, user: Any) -> List[Any]:
+        time.sleep(0.5)
+        return [{"type": "progress", "done": 0, "total": 0}]
+
+    monkeypatch.setattr(LiveSession, "start_training", slow_training)
+    f5 = Board.field_to_index("f5")
+    done: List[str] = []
+
+    async def training(port: int) -> None:
+        client = await LiveClient.connect(port)
+        await client.receive()
+        await client.request({"type": "training"}, 1)
+        done.append("training")
+        await client.close()
+
+    async def game(port: int) -> None:
+        client = await LiveClient.connect(port)
+        await client.receive()
+        await asyncio.sleep(0.1)
+        await client.request({"type": "move", "move": f5}, 2)
+        done.append("game")
+        await client.close()
+
+    async def test(port: int) -> None:
+        await asyncio.gather(training(port), game(port))
+
+    # the other connection is served while the training is loading
+    run_with_server(LiveServer(), test)
+    assert ["game", "training"] == done
+
+
+def test_live_many_connections() -> None:
+    f5 = Board.field_to_index("f5")
+
+    async def session(port: int) -> str:
+        client = await LiveClient.connect(port)
+        await client.receive()
+        _, board = await client.request({"type": "move", "move": f5}, 2)
+        await client.close()
+        return str(board["id"])
+
+    async def test(port: int) -> None:
+        board_ids = await asyncio.gather(*[session(port) for _ in range(100)])
+        assert {Board().do_move(f5).to_id()} == set(board_ids)
+
+    run_with_server(LiveServer(), test)
+
+
+def test_live_url_in_page() -> None:
+    client = app.test_client()
+    assert b'data-live-url=""' in client.get("/").data
+
+    app.config["LIVE_URL"] = "ws://localhost:5001/"
+    try:
+        assert b'data-live-url="ws://localhost:5001/"' in client.get("/").data
+    finally:
+        del app.config["LIVE_URL"]
@@ -0,0 +1,19 @@
+from training.loadtest import EndpointStats, Server, run_load_test
+
+
+def test_percentile() -> None:
+    stats = EndpointStats([float(i) for i in range(100, 0, -1)])
+    assert 50.0 == stats.percentile(50)
+    assert 95.0 == stats.percentile(95)
+    assert 100.0 == stats.percentile(100)
+    assert 0.0 == EndpointStats().percentile(99)
+
+
+def test_run_load_test() -> None:
+    with Server("thread") as server:
+        report = run_load_test(server.url, clients=2, seconds=0.5, mistake_rate=0.5)
+
+    assert {"/api/mistakes", "/api/openings", "/api/training"} == set(report.endpoints)
+    assert all(stats.errors == 0 for stats in report.endpoints.values())
+    assert 2 <= report.sessions
+    assert report.throughput() > 0
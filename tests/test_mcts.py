@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+
+from othello.board import Board
+from othello.features import random_boards
+from othello.mcts import MCTS, get_flips, get_flips_batch, playout, playouts_batch
+
+
+def test_get_flips() -> None:
+    for board in random_boards(200):
+        moves = board.get_moves()
+        for move in range(64):
+            if not moves & (1 << move):
+                continue
+
+            child = board.do_move(move)
+            expected = child.opp & ~(board.me | (1 << move))
+            assert expected == get_flips(board.me, board.opp, move)
+
+
+def test_get_flips_batch() -> None:
+    me, opp, bits, expected = [], [], [], []
+    for board in random_boards(200):
+        moves = board.get_moves()
+        if not moves:
+            continue
+
+        bit = moves & -moves
+        me.append(board.me)
+        opp.append(board.opp)
+        bits.append(bit)
+        expected.append(get_flips(board.me, board.opp, bit.bit_length() - 1))
+
+    flipped = get_flips_batch(
+        np.array(me, dtype=np.uint64),
+        np.array(opp, dtype=np.uint64),
+        np.array(bits, dtype=np.uint64),
+    )
+    assert expected == flipped.tolist()
+
+
+def test_playout_game_over() -> None:
+    # black has 63 discs, nobody can move
+    board = Board.from_discs(0xFFFFFFFFFFFFFFFE, 0, 0)
+    assert 63 == playout(board.me, board.opp, random.Random(0))
+    assert -63 == playout(board.opp, board.me, random.Random(0))
+
+
+def test_playouts_end_with_full_or_blocked_board() -> None:
+    board = Board()
+    for seed in range(20):
+        difference = playout(board.me, board.opp, random.Random(seed))
+        assert -64 <= difference <= 64
+
+    me = np.full(50, board.me, dtype=np.uint64)
+    opp = np.full(50, board.opp, dtype=np.uint64)
+    differences = playouts_batch(me, opp, np.random.default_rng(0))
+    assert 50 == len(differences)
+    assert all(-64 <= difference <= 64 for difference in differences)
+    assert len(set(differences.tolist())) > 1
+
+
+def test_search_finds_winning_move() -> None:
+    # a4 captures the only white disc
+    board = Board.from_discs(0x0000000000000101, 0x0000000000010000, 0)
+    for batch_size in [0, 8]:
+        result = MCTS(batch_size=batch_size, seed=0).search(board, playouts=200)
+        assert Board.field_to_index("a4") == result.best_move
+        assert 1.0 == result.moves[0].win_rate
+        assert 200 <= result.playouts
+
+
+def test_search_reuses_tree() -> None:
+    engine = MCTS(seed=0)
+    board = Board()
+    result = engine.search(board, playouts=500)
+    assert result.best_move is not None
+
+    engine.advance(result.best_move)
+    assert engine.root
+    reused_visits = engine.root.visits
+    assert reused_visits > 0
+
+    child = board.do_move(result.best_move)
+    engine.search(child, playouts=100)
+    assert reused_visits + 100 == engine.root.visits
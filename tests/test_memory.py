@@ -0,0 +1,123 @@
+import random
+import tracemalloc
+from typing import List
+
+import pytest
+
+from othello.board import Board
+from othello.book import BookAnnotator
+from othello.features import random_boards
+from othello.memory import allocated_size, site_sizes, start_tracing, take_snapshot
+from othello.openings_tree import OpeningsTree
+from othello.replay import ReplayCache
+from training.app import app
+from training.blueprints.api.views import training_step
+from training.steps import TrainingStepCache
+
+# Upper bounds in bytes for long-lived data, measured sizes are well below these.
+# Raise them only for a good reason, the server keeps this data around forever.
+BOOK_ENTRY_BUDGET = 640
+REPLAY_NODE_BUDGET = 640
+ANNOTATED_BOARD_BUDGET = 4096
+CACHED_STEP_BUDGET = 20_000
+
+
+def random_lines(count: int, length: int, seed: int) -> List[List[int]]:
+    rng = random.Random(seed)
+    lines: List[List[int]] = []
+
+    for _ in range(count):
+        board = Board()
+        line: List[int] = []
+        while len(line) < length and board.has_moves():
+            moves = board.get_moves()
+            move = rng.choice([move for move in range(64) if moves & (1 << move)])
+            line.append(move)
+            board = board.do_move(move)
+        lines.append(line)
+    return lines
+
+
+def random_book(boards: List[Board]) -> OpeningsTree:
+    openings_tree = OpeningsTree()
+    for board in boards:
+        children = board.get_children()
+        if children:
+            openings_tree.upsert(board, children[0], "+4")
+    return openings_tree
+
+
+def replayed(lines: List[List[int]]) -> ReplayCache:
+    cache = ReplayCache()
+    for line in lines:
+        cache.replay(line)
+    return cache
+
+
+def test_site_sizes() -> None:
+    lines = random_lines(20, 10, 0)
+
+    start_tracing()
+    try:
+        cache, size = allocated_size(lambda: replayed(lines))
+        sizes = site_sizes(
+            take_snapshot(), [("replay_cache", ReplayCache), ("book", OpeningsTree)]
+        )
+    finally:
+        tracemalloc.stop()
+
+    assert cache.size > 100
+    assert sizes["replay_cache"] == pytest.approx(size, rel=0.1)
+    assert 0 == sizes["book"]
+
+
+def test_book_entry_budget(tmp_path: str) -> None:
+    random_book(random_boards(500, 0)).save(f"{tmp_path}/openings.json")
+
+    openings_tree, size = allocated_size(
+        lambda: OpeningsTree.from_file(f"{tmp_path}/openings.json")
+    )
+
+    assert size / len(openings_tree) < BOOK_ENTRY_BUDGET
+
+
+def test_replay_node_budget() -> None:
+    lines = random_lines(100, 20, 1)
+
+    cache, size = allocated_size(lambda: replayed(lines))
+
+    assert size / cache.size < REPLAY_NODE_BUDGET
+
+
+def test_annotated_board_budget() -> None:
+    boards = random_boards(100, 2)
+    annotator = BookAnnotator(random_book(boards))
+
+    _, size = allocated_size(lambda: [annotator.children(board) for board in boards])
+
+    assert size / len(annotator.cache) < ANNOTATED_BOARD_BUDGET
+
+
+def test_cached_step_budget() -> None:
+    board_ids = [board.to_id() for board in random_boards(20, 3)]
+    step_cache = TrainingStepCache(training_step)
+
+    _, size = allocated_size(
+        lambda: [step_cache.get(board_id) for board_id in board_ids]
+    )
+
+    assert size / len(step_cache.entries) < CACHED_STEP_BUDGET
+
+
+def test_debug_memory() -> None:
+    client = app.test_client()
+    assert 404 == client.get("/api/debug/memory").status_code
+
+    start_tracing()
+    try:
+        usages = client.get("/api/debug/memory").get_json()
+    finally:
+        tracemalloc.stop()
+
+    assert {"book", "step_cache", "replay_cache"} <= {usage["name"] for usage in usages}
+    assert all(usage["bytes"] >= 0 for usage in usages)
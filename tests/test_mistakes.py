@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+from othello.board import Board
+from othello.game import Game
+from othello.mistakes import MistakeStore, normalize_mistake
+from othello.openings_tree import OpeningsTree
+from training.app import app
+
+
+def after(moves: str) -> Board:
+    board = Board()
+    for move in moves.split():
+        board = board.do_move(Board.field_to_index(move))
+    return board
+
+
+def test_normalize_mistake() -> None:
+    # f5 and d3 are the same opening, f6 and c3 the same wrong reply
+    assert normalize_mistake(
+        after("f5"), Board.field_to_index("f6")
+    ) == normalize_mistake(after("d3"), Board.field_to_index("c3"))
+
+
+def test_store_buffers_and_aggregates(tmp_path: str) -> None:
+    filename = f"{tmp_path}/mistakes.sqlite3"
+
+    with MistakeStore(filename, flush_size=3, flush_interval=60) as store:
+        store.record(after("f5"), Board.field_to_index("f6"), "training", 10.0)
+        store.record(after("d3"), Board.field_to_index("c3"), "pgn", 20.0)
+        assert 2 == len(store.buffer)
+
+        store.record(after("f5 d6"), Board.field_to_index("e3"), "training", 15.0)
+        assert [] == store.buffer
+
+        store.record(after("f5"), Board.field_to_index("f6"), "training", 30.0)
+
+    with MistakeStore(filename) as store:
+        weakest = store.weakest(10)
+        assert 2 == len(weakest)
+        assert {
+            "position": after("f5").get_normalized_id(),
+            "mistakes": 3,
+            "training_mistakes": 2,
+            "pgn_mistakes": 1,
+            "first_mistake": 10.0,
+            "last_mistake": 30.0,
+        } == weakest[0]
+        assert 1 == weakest[1]["mistakes"]
+        assert 1 == len(store.weakest(1))
+
+        assert 3 == len(store.position_mistakes(after("d3")))
+
+
+def test_store_flushes_on_timer(tmp_path: str) -> None:
+    filename = f"{tmp_path}/mistakes.sqlite3"
+
+    with MistakeStore(filename, flush_size=100, flush_interval=0.05) as store:
+        # an isolated mistake waits for the timer instead of flushing at once
+        store.record(after("f5"), Board.field_to_index("f6"), "training")
+        assert 1 == len(store.buffer)
+
+        deadline = time.monotonic() + 5
+        while store.buffer and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [] == store.buffer
+        assert store.timer is None
+
+        with sqlite3.connect(filename) as connection:
+            assert [(1,)] == connection.execute(
+                "SELECT COUNT(*) FROM mistakes"
+            ).fetchall()
+
+
+def test_check_records_mistakes(tmp_path: str) -> None:
+    tree = OpeningsTree()
+    tree.upsert(after("f5"), after("f5 d6"))
+    game = Game.from_moves(["f5", "f6"], {"Black": "bob", "White": "alice"})
+
+    with MistakeStore(f"{tmp_path}/mistakes.sqlite3") as store:
+        assert "wrong" == tree.check(game, "alice", store).status
+        assert [normalize_mistake(after("f5"), Board.field_to_index("f6"))[1]] == [
+            move for move, _, _ in store.position_mistakes(after("f5"))
+        ]
+
+
+def test_mistake_endpoints(tmp_path: str) -> None:
+    app.config["MISTAKES_DATABASE"] = f"{tmp_path}/mistakes.sqlite3"
+    app.extensions.pop("mistake_store", None)
+    client = app.test_client()
+
+    board_id = after("f5").to_id()
+    for move in ["f6", "f6", "d6"]:
+        response = client.post(
+            "/api/mistakes",
+            json={"board": board_id, "move": Board.field_to_index(move)},
+        )
+        assert 204 == response.status_code
+
+    assert (
+        400 == client.post("/api/mistakes", json={"board": "x", "move": 1}).status_code
+    )
+    assert 400 == client.post("/api/mistakes", json={"board": board_id}).status_code
+    assert (
+        400
+        == client.post("/api/mistakes", json={"board": board_id, "move": 0}).status_code
+    )
+
+    weakest = client.get("/api/mistakes?top=5").get_json()
+    assert [after("f5").get_normalized_id()] == [row["position"] for row in weakest]
+    assert 3 == weakest[0]["mistakes"]
+    assert 400 == client.get("/api/mistakes?top=x").status_code
+    assert 400 == client.get("/api/mistakes?top=-1").status_code
+    assert 400 == client.get("/api/mistakes?top=0").status_code
+
+    app.extensions.pop("mistake_store").close()
+    del app.config["MISTAKES_DATABASE"]
@@ -0,0 +1,125 @@
+import os
+from typing import Optional
+
+import pytest
+
+from othello.archive import GameArchiveWriter
+from othello.board import BLACK, WHITE
+from othello.game import Game
+from othello.novelties import find_novelties, first_novelty, game_score
+from othello.openings_tree import NestedTree, OpeningsTree
+
+BLACK_TREE: NestedTree = {"e6": {"f4": {"c3": "+1"}, "d6": {"c5": "0"}}}
+
+GAMES = [
+    ("alice", "bob", "e6 f4 c3 c4 d3"),
+    # the same game rotated
+    ("alice", "bob", "f5 d6 c3 d3 c4"),
+    ("alice", "bob", "e6 f4 d3"),
+    ("alice", "bob", "e6 d6 c5"),
+    ("bob", "alice", "e6 f4"),
+    ("bob", "carol", "e6 f4 e3"),
+]
+
+
+def make_game(black: str, white: str, moves: str) -> Game:
+    return Game.from_moves(moves.split(), {"Black": black, "White": white})
+
+
+def black_book() -> OpeningsTree:
+    openings_tree = OpeningsTree()
+    openings_tree.import_nested(BLACK_TREE, BLACK)
+    return openings_tree
+
+
+def to_pgn(black: str, white: str, moves: str, variant: Optional[str] = None) -> str:
+    headers = f'[Black "{black}"]\n[White "{white}"]\n'
+    if variant:
+        headers += f'[Variant "{variant}"]\n'
+    return f"{headers}\n1. {moves}\n"
+
+
+@pytest.mark.parametrize(
+    ["moves", "color", "kind", "ply"],
+    [
+        ("e6 f4 c3 c4 d3", BLACK, "missing", 5),
+        ("e6 f4 d3", BLACK, "wrong", 3),
+        ("e6 f4 c3", BLACK, "", 0),
+        ("e6 f4", WHITE, "missing", 2),
+    ],
+)
+def test_first_novelty(moves: str, color: int, kind: str, ply: int) -> None:
+    game = make_game("alice", "bob", moves)
+    novelty = first_novelty(black_book(), game, "game", color)
+
+    assert (kind, ply) == (novelty.kind, novelty.ply)
+    if kind:
+        board = game.boards[ply - 1]
+        assert board.get_normalized_id() == novelty.position
+        assert " ".join(moves.split()[: ply - 1]) == novelty.line
+    else:
+        assert novelty.position is None
+
+
+def test_game_score() -> None:
+    # black has 4 discs and white 1 after the first move
+    game = make_game("alice", "bob", "e6")
+    assert (1.0, 0.0) == (game_score(game, BLACK), game_score(game, WHITE))
+    assert 0.5 == game_score(make_game("alice", "bob", ""), BLACK)
+
+    # black resigned while ahead on discs
+    game.metadata["Result"] = "0-1"
+    assert (0.0, 1.0) == (game_score(game, BLACK), game_score(game, WHITE))
+
+    game.metadata["Result"] = "1/2-1/2"
+    assert 0.5 == game_score(game, WHITE)
+
+    game.metadata["Result"] = "20-44"
+    assert 1.0 == game_score(game, WHITE)
+
+    # unfinished, the discs decide
+    game.metadata["Result"] = "*"
+    assert 1.0 == game_score(game, BLACK)
+
+
+@pytest.mark.parametrize(["source", "jobs"], [("pgn", 1), ("archive", 2)])
+def test_find_novelties(tmp_path: str, source: str, jobs: int) -> None:
+    book_spec = f"{tmp_path}/openings.json"
+    black_book().save(book_spec)
+
+    path = f"{tmp_path}/pgn"
+    os.makedirs(path)
+    for index, game in enumerate(GAMES):
+        with open(f"{path}/{index}.pgn", "w") as file:
+            file.write(to_pgn(*game))
+    with open(f"{path}/xot.pgn", "w") as file:
+        file.write(to_pgn("alice", "bob", "e6 f4", "xot"))
+
+    if source == "archive":
+        path = f"{tmp_path}/games.oga"
+        with GameArchiveWriter(path) as writer:
+            for index, game in enumerate(GAMES):
+                writer.add(make_game(*game))
+
+    report = find_novelties(path, "alice", book_spec, jobs, chunk_size=2)
+
+    assert (5, 1) == (report.games, report.in_book)
+    assert (2 if source == "pgn" else 1) == report.skipped
+
+    top = report.top(1)[0]
+    after_c4 = make_game("alice", "bob", "e6 f4 c3 c4").boards[-1]
+    assert (after_c4.get_normalized_id(), "missing", 5, 2) == (
+        top.position,
+        top.kind,
+        top.ply,
+        top.games,
+    )
+    assert "e6 f4 c3 c4" == top.line
+    assert 2 == len(top.examples)
+
+    expected_score = sum(game_score(make_game(*game), BLACK) for game in GAMES[:2]) / 2
+    assert expected_score == top.win_rate()
+
+    assert {("missing", 5), ("wrong", 3), ("missing", 2)} == {
+        (stats.kind, stats.ply) for stats in report.novelties.values()
+    }
@@ -0,0 +1,197 @@
+import threading
+from typing import List
+
+import pytest
+
+from othello import openings_db
+from othello.board import BLACK, WHITE, Board
+from othello.openings_db import SQLiteOpeningsTree, connection_pool
+from othello.openings_tree import NestedTree, OpeningsTree
+from training.app import app
+from training.blueprints.api import views
+
+WHITE_TREE: NestedTree = {"e6": {"f4": {"e3": {"f6": "+2"}, "c3": {"c4": "0"}}}}
+
+BLACK_TREE: NestedTree = {"e6": {"f4": {"c3": "+1"}, "d6": {"c5": "0"}}}
+
+TRANSPOSED_TREE: NestedTree = {
+    "e6": {
+        "f4": {
+            "d3": {"c4": {"c3": {"d6": "+1"}}},
+            "c3": {"c4": {"d3": "transposition"}},
+        },
+    },
+}
+
+
+def play(moves: str) -> Board:
+    board = Board()
+    for field in moves.split():
+        board = board.do_move(Board.field_to_index(field))
+    return board
+
+
+def test_sqlite_openings_tree_matches_json(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    book = SQLiteOpeningsTree(database, "alice")
+    tree = OpeningsTree()
+
+    for openings_tree in [book, tree]:
+        openings_tree.import_nested(WHITE_TREE, WHITE)
+        openings_tree.import_nested(BLACK_TREE, BLACK)
+
+    assert dict(tree.entries()) == dict(book.entries())
+    assert len(tree) == len(book)
+    assert tree.lines(WHITE) == book.lines(WHITE)
+    assert tree.export_nested(BLACK) == book.export_nested(BLACK)
+
+    board = play("e6 f4")
+    assert tree.lookup(board) == book.lookup(board)
+    assert tree.best_move(board) == book.best_move(board)
+
+    # a new instance sees the same book
+    assert dict(tree.entries()) == dict(SQLiteOpeningsTree(database, "alice").entries())
+
+
+def test_sqlite_openings_tree_users(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    alice = SQLiteOpeningsTree(database, "alice")
+    bob = SQLiteOpeningsTree(database, "bob")
+
+    assert "bob:0" == bob.version()
+    alice.import_nested(WHITE_TREE, WHITE)
+    version = alice.version()
+
+    board = play("e6")
+    bob.upsert(board, board.do_move(Board.field_to_index("d6")))
+
+    assert version == alice.version()
+    assert Board.field_to_index("f4") == alice.best_move(board)
+    assert Board.field_to_index("d6") == bob.best_move(board)
+    assert 1 == len(bob)
+
+    alice.upsert(board, board.do_move(Board.field_to_index("d6")))
+    assert version != alice.version()
+
+
+def test_sqlite_openings_tree_subtree(tmp_path: str) -> None:
+    book = SQLiteOpeningsTree(f"{tmp_path}/openings.sqlite3", "alice")
+    book.import_nested(TRANSPOSED_TREE, WHITE)
+
+    after_f4 = play("e6 f4")
+    subtree = book.subtree(after_f4)
+
+    # the replies d3 and c3 and the position both lines transpose into
+    assert {
+        play("e6 f4 d3").get_normalized_id(),
+        play("e6 f4 c3").get_normalized_id(),
+        play("e6 f4 d3 c4 c3").get_normalized_id(),
+    } == {board_id for board_id, _ in subtree.entries()}
+
+    assert 2 == len(book.subtree(play("e6 f4 c3")))
+    assert 4 == len(book.subtree(play("e6")))
+    assert 0 == len(book.subtree(play("e6 f4 d3 c4 c3 d6")))
+
+
+def test_sqlite_openings_tree_threads(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    boards = [play("e6 f4"), play("e6 f6"), play("e6 d6"), play("e6 f4 c3 c4")]
+    errors: List[Exception] = []
+
+    def work(user: str) -> None:
+        try:
+            book = SQLiteOpeningsTree(database, user)
+            with book.batch():
+                for board in boards:
+                    book.upsert(board, board.get_children()[0])
+            assert len(boards) == len(book)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(f"user{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [] == errors
+    assert 4 == len(SQLiteOpeningsTree(database, "user7"))
+
+
+def test_openings_endpoint_user(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    SQLiteOpeningsTree(database, "alice").import_nested(BLACK_TREE, BLACK)
+
+    app.config["OPENINGS_DATABASE"] = database
+    client = app.test_client()
+
+    try:
+        assert 2 == len(client.get("/api/openings?user=alice").get_json())
+        assert [] == client.get("/api/openings?user=bob").get_json()
+    finally:
+        del app.config["OPENINGS_DATABASE"]
+
+
+def test_openings_endpoint_releases_connections(tmp_path: str) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    SQLiteOpeningsTree(database, "alice").import_nested(BLACK_TREE, BLACK)
+    opened = len(connection_pool(database).connections)
+
+    app.config["OPENINGS_DATABASE"] = database
+    client = app.test_client()
+
+    def work() -> None:
+        assert 200 == client.get("/api/openings?user=alice").status_code
+
+    try:
+        # like the threaded server, a new thread for every request
+        for _ in range(10):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+    finally:
+        del app.config["OPENINGS_DATABASE"]
+
+    assert opened == len(connection_pool(database).connections)
+
+
+def test_openings_cache_size(tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    monkeypatch.setattr(views, "MAX_CACHED_OPENINGS", 2)
+
+    for user in ["alice", "bob", "carol"]:
+        SQLiteOpeningsTree(database, user).import_nested(BLACK_TREE, BLACK)
+        views.load_openings(database, user)
+
+    assert [(database, "bob"), (database, "carol")] == list(views._openings_cache)
+
+
+def test_sqlite_openings_tree_query_chunks(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(openings_db, "MAX_QUERY_VARIABLES", 2)
+    book = SQLiteOpeningsTree(f"{tmp_path}/openings.sqlite3", "alice")
+    tree = OpeningsTree()
+
+    for openings_tree in [book, tree]:
+        with openings_tree.batch():
+            openings_tree.import_nested(WHITE_TREE, WHITE)
+
+    assert dict(tree.entries()) == dict(book.entries())
+
+
+def test_openings_built_without_lock(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    database = f"{tmp_path}/openings.sqlite3"
+    SQLiteOpeningsTree(database, "alice").import_nested(BLACK_TREE, BLACK)
+    opening_steps = views.opening_steps
+
+    def unlocked_opening_steps(openings_tree: OpeningsTree, color: int) -> list:
+        assert not views.openings_lock.locked()
+        return opening_steps(openings_tree, color)
+
+    monkeypatch.setattr(views, "opening_steps", unlocked_opening_steps)
+    openings = views.load_openings(database, "alice")
+
+    assert openings is views.load_openings(database, "alice")
@@ -0,0 +1,180 @@
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from othello.board import Board
+from othello.features import random_boards
+from othello.openings_merge import (
+    DiffReport,
+    MergeReport,
+    decode_entry,
+    diff_books,
+    encode_entry,
+    merge_books,
+    merged_entries,
+    open_book,
+    write_book,
+    write_json_book,
+)
+from othello.openings_tree import OpeningsTree
+
+
+def random_tree(boards: List[Board], seed: int) -> OpeningsTree:
+    rng = random.Random(seed)
+    tree = OpeningsTree()
+    for board in boards:
+        children = board.get_children()
+        if children and rng.random() < 0.7:
+            score = rng.choice([None, "0", "+4", "-12"])
+            tree.upsert(board, rng.choice(children), score)
+    return tree
+
+
+def test_encode_entry() -> None:
+    board = Board()
+    entry = {"best_child": board.get_children()[0].get_normalized_id(), "score": "+4"}
+
+    assert (board.to_id(), entry) == decode_entry(encode_entry(board.to_id(), entry))
+
+    del entry["score"]
+    assert (board.to_id(), entry) == decode_entry(encode_entry(board.to_id(), entry))
+
+    with pytest.raises(ValueError):
+        encode_entry(board.to_id(), {**entry, "score": "+123456789"})
+
+
+def test_merged_entries_spill(tmp_path: str) -> None:
+    boards = random_boards(300, 4)
+    trees = [random_tree(boards, seed) for seed in range(3)]
+
+    merged = list(merged_entries(trees, buffer_size=16, directory=tmp_path))
+
+    expected: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+    for index, tree in enumerate(trees):
+        for board_id, entry in tree.entries():
+            expected.setdefault(board_id, [None] * len(trees))[index] = entry
+
+    assert expected == dict(merged)
+    keys = [Board.from_id(board_id).to_key() for board_id, _ in merged]
+    assert sorted(keys) == keys
+
+
+def test_diff_books() -> None:
+    board = Board()
+    e6 = board.do_move(Board.field_to_index("e6"))
+    f4 = e6.do_move(Board.field_to_index("f4"))
+    d6 = e6.do_move(Board.field_to_index("d6"))
+    c3 = f4.do_move(Board.field_to_index("c3"))
+
+    lhs = OpeningsTree()
+    rhs = OpeningsTree()
+
+    # e6 and f5 are the same move rotated
+    lhs.upsert(board, e6)
+    rhs.upsert(board, board.do_move(Board.field_to_index("f5")))
+    lhs.upsert(e6, f4)
+    rhs.upsert(e6, d6)
+    lhs.upsert(f4, c3, "+2")
+    rhs.upsert(f4, c3)
+    lhs.upsert(c3, c3.get_children()[0])
+    rhs.upsert(d6, d6.get_children()[0])
+
+    shown: List[Tuple[str, str]] = []
+    report = diff_books(
+        merged_entries([lhs, rhs]),
+        DiffReport(),
+        lambda kind, board_id, _: shown.append((kind, board_id)),
+    )
+
+    assert (1, 1, 1, 1, 1) == (
+        report.removed,
+        report.added,
+        report.changed,
+        report.rescored,
+        report.same,
+    )
+    assert {
+        ("-", c3.get_normalized_id()),
+        ("+", d6.get_normalized_id()),
+        ("!", e6.get_normalized_id()),
+        ("~", f4.get_normalized_id()),
+    } == set(shown)
+
+
+@pytest.mark.parametrize(
+    ["policy", "best_children", "unresolved"],
+    [
+        ("first", ["e6", "e6"], 0),
+        ("last", ["d3", "e6"], 0),
+        ("strict", [None, "e6"], 1),
+    ],
+)
+def test_merge_books(
+    policy: str, best_children: List[Optional[str]], unresolved: int
+) -> None:
+    board = Board()
+    e6 = board.do_move(Board.field_to_index("e6"))
+    d3 = board.do_move(Board.field_to_index("d3"))
+    f4 = e6.do_move(Board.field_to_index("f4"))
+
+    books = [OpeningsTree() for _ in range(3)]
+    books[0].upsert(e6, f4)
+    books[1].upsert(e6, e6.do_move(Board.field_to_index("d6")))
+    # d3 is e6 rotated, so this is the same position, the best child is illegal
+    books[2].upsert(d3, board)
+
+    books[0].upsert(board, e6)
+    books[2].upsert(board, d3)
+
+    conflicts: List[Tuple[str, List[int]]] = []
+    report = MergeReport()
+    merged = dict(
+        merge_books(
+            merged_entries(books),
+            policy,
+            report,
+            lambda board_id, _, invalid: conflicts.append((board_id, invalid)),
+        )
+    )
+
+    # books 0 and 2 agree on the initial board, as e6 and d3 are the same
+    assert [(e6.get_normalized_id(), [2])] == conflicts
+    assert (1, unresolved) == (report.conflicts, report.unresolved)
+
+    fields = {"e6": f4, "d3": e6.do_move(Board.field_to_index("d6")), None: None}
+    expected_e6 = fields[best_children[0]]
+    assert (expected_e6.get_normalized_id() if expected_e6 else None) == (
+        merged.get(e6.get_normalized_id(), {}).get("best_child")
+    )
+    assert e6.get_normalized_id() == merged[board.get_normalized_id()]["best_child"]
+
+
+def test_write_json_book(tmp_path: str) -> None:
+    tree = random_tree(random_boards(20, 1), 0)
+    tree.save(f"{tmp_path}/saved.json")
+
+    write_json_book(f"{tmp_path}/written.json", tree.entries())
+    write_json_book(f"{tmp_path}/empty.json", [])
+    OpeningsTree().save(f"{tmp_path}/empty_saved.json")
+
+    for written, saved in [("written", "saved"), ("empty", "empty_saved")]:
+        with open(f"{tmp_path}/{written}.json") as lhs, open(
+            f"{tmp_path}/{saved}.json"
+        ) as rhs:
+            saved_data = json.load(rhs)
+            assert {"version", "black", "white"} == saved_data.pop("lines").keys()
+            assert json.dumps(saved_data, indent=4) + "\n" == lhs.read()
+
+
+def test_merge_into_database(tmp_path: str) -> None:
+    tree = random_tree(random_boards(50, 2), 0)
+    tree.save(f"{tmp_path}/openings.json")
+    spec = f"{tmp_path}/openings.sqlite3:alice"
+
+    entries = merged_entries([open_book(f"{tmp_path}/openings.json")])
+    count = write_book(spec, merge_books(entries, "first", MergeReport(), print), 7)
+
+    assert len(tree) == count
+    assert dict(tree.entries()) == dict(open_book(spec).entries())
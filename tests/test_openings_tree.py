@@ -0,0 +1,154 @@
+import os
+from typing import List
+
+from othello.board import BLACK, WHITE, Board
+from othello.openings_tree import TRANSPOSITION, NestedTree, OpeningsTree
+from training.blueprints.api.views import read_openings
+
+WHITE_TREE: NestedTree = {
+    "e6": {
+        "f4": {
+            "e3": {"f6": "+2"},
+            "c3": {"c4": "0"},
+        },
+    },
+}
+
+BLACK_TREE: NestedTree = {
+    "e6": {
+        "f4": {"c3": "+1"},
+        "d6": {"c5": "0"},
+    },
+}
+
+# both lines reach the same position after five moves
+TRANSPOSED_TREE: NestedTree = {
+    "e6": {
+        "f4": {
+            "d3": {"c4": {"c3": {"d6": "+1"}}},
+            "c3": {"c4": {"d3": TRANSPOSITION}},
+        },
+    },
+}
+
+
+def fields(line: List[int]) -> str:
+    return " ".join(Board.index_to_field(move) for move in line)
+
+
+def test_openings_tree_import_nested_lines() -> None:
+    tree = OpeningsTree()
+    assert ([], []) == tree.import_nested(WHITE_TREE, WHITE)
+    assert ([], []) == tree.import_nested(BLACK_TREE, BLACK)
+
+    assert ["e6 f4 c3 c4", "e6 f4 e3 f6"] == sorted(
+        fields(line) for line in tree.lines(WHITE)
+    )
+    assert ["e6 d6 c5", "e6 f4 c3"] == sorted(
+        fields(line) for line in tree.lines(BLACK)
+    )
+    assert WHITE_TREE == tree.export_nested(WHITE)
+    assert BLACK_TREE == tree.export_nested(BLACK)
+
+
+def test_openings_tree_transposition() -> None:
+    tree = OpeningsTree()
+    tree.import_nested(TRANSPOSED_TREE, WHITE)
+
+    # the transposed line only adds the decisions before it joins the other line
+    assert 4 == len(tree.data["openings"])
+    assert ["e6 f4 c3 c4", "e6 f4 d3 c4 c3 d6"] == sorted(
+        fields(line) for line in tree.lines(WHITE)
+    )
+    assert TRANSPOSED_TREE == tree.export_nested(WHITE)
+
+
+def test_openings_tree_lines_best_child_transposition() -> None:
+    # both lines reach the same position with the last book move
+    tree = OpeningsTree()
+    tree.import_nested(
+        {"e6": {"f4": {"d3": {"d6": {"f5": "+1"}}}, "d6": {"c4": {"f4": {"f5": "0"}}}}},
+        BLACK,
+    )
+
+    assert ["e6 d6 c4 f4 f5", "e6 f4 d3 d6 f5"] == sorted(
+        fields(line) for line in tree.lines(BLACK)
+    )
+
+
+def test_openings_tree_import_nested_conflict() -> None:
+    tree = OpeningsTree()
+    board = Board().do_move(Board.field_to_index("e6"))
+    tree.upsert(board, board.do_move(Board.field_to_index("d6")))
+
+    conflicts, invalid = tree.import_nested(WHITE_TREE, WHITE)
+
+    assert [board.get_normalized_id()] == conflicts
+    assert [] == invalid
+    assert Board.field_to_index("d6") == tree.best_move(board)
+
+    # the decisions after the conflicting move are still imported
+    assert 3 == len(tree.data["openings"])
+    after_e3 = board.do_move(Board.field_to_index("f4")).do_move(
+        Board.field_to_index("e3")
+    )
+    assert Board.field_to_index("f6") == tree.best_move(after_e3)
+    assert {"best_child", "score"} == set(
+        tree.get_entry(after_e3.get_normalized_id()) or {}
+    )
+
+
+def test_openings_tree_import_nested_illegal_move() -> None:
+    tree = OpeningsTree()
+    conflicts, invalid = tree.import_nested({"e6": {"f4": {"a1": "+4"}}}, WHITE)
+
+    board = Board().do_move(Board.field_to_index("e6"))
+    board = board.do_move(Board.field_to_index("f4"))
+
+    assert [] == conflicts
+    assert [board.get_normalized_id()] == invalid
+    assert 1 == len(tree.data["openings"])
+
+
+def test_read_openings_reloads_changed_file(tmp_path: str) -> None:
+    filename = f"{tmp_path}/openings.json"
+    tree = OpeningsTree()
+    tree.import_nested(BLACK_TREE, BLACK)
+    tree.save(filename)
+
+    assert 2 == len(read_openings(BLACK, filename))
+    assert [] == read_openings(WHITE, filename)
+
+    tree.import_nested(WHITE_TREE, WHITE)
+    tree.save(filename)
+    os.utime(filename, (0, 0))
+
+    assert 2 == len(read_openings(WHITE, filename))
+    assert [
+        {
+            "board": Board()
+            .do_move(Board.field_to_index("e6"))
+            .do_move(Board.field_to_index("f4"))
+            .to_id(),
+            "best_child": Board.field_to_index("c3"),
+        }
+    ] in read_openings(BLACK, filename)
+
+
+def test_openings_tree_saved_lines(tmp_path: str) -> None:
+    filename = f"{tmp_path}/openings.json"
+    tree = OpeningsTree()
+    tree.import_nested(WHITE_TREE, WHITE)
+    tree.save(filename)
+
+    loaded = OpeningsTree.from_file(filename)
+    assert loaded.version() == loaded.data["lines"]["version"]
+    assert ["e6 f4 c3 c4", "e6 f4 e3 f6"] == sorted(loaded.data["lines"]["white"])
+    assert tree.lines(WHITE) == loaded.lines(WHITE)
+
+    # lines saved for another book are computed again
+    loaded.data["lines"]["white"] = ["e6 f4 e3 f6"]
+    loaded.import_nested(BLACK_TREE, BLACK)
+    assert ["e6 f4 c3 c4", "e6 f4 e3 f6"] == sorted(
+        fields(line) for line in loaded.lines(WHITE)
+    )
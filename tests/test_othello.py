@@ -1,6 +1,6 @@
 import pytest
 
-from othello.bits import bits_rotate
+from othello.bits import bits_rotate, bits_rotations
 from othello.board import BLACK, EMPTY, MOVE_PASS, VALID_MOVE, WHITE, Board
 
 
@@ -42,6 +42,12 @@ def test_board_from_xot() -> None:
             "Bffffffffffffffffffffffffffffffff",
             Board.from_discs(0xFFFFFFFFFFFFFFFF, 0xFFFFFFFFFFFFFFFF, BLACK),
         ],
+        ["BAAAAAAAAAAEAAAAAAAAAAg", Board.from_discs(1, 2, BLACK)],
+        ["WAAAAAAAAAAEAAAAAAAAAAg", Board.from_discs(2, 1, WHITE)],
+        [
+            "B_____________________w",
+            Board.from_discs(0xFFFFFFFFFFFFFFFF, 0xFFFFFFFFFFFFFFFF, BLACK),
+        ],
     ),
 )
 def test_board_from_id_ok(id_str: str, expected_board: Board) -> None:
@@ -62,6 +68,11 @@ def test_board_from_id_ok(id_str: str, expected_board: Board) -> None:
         ["123456789012345678901234567890123", "unexpected turn value"],
         ["B0000000X000000000000000000000000", "unexpected base 16 char in discs"],
         ["B00000000000000000000000000X00000", "unexpected base 16 char in discs"],
+        ["XAAAAAAAAAAEAAAAAAAAAAg", "unexpected turn value"],
+        ["BAAAAAAAAAAEAAAAAAAAA+g", "unexpected base 64 char in discs"],
+        ["BAAAACBAAAAAAAAAQCAAAA=", "unexpected base 64 char in discs"],
+        # padding bits set, the same discs as BAAAACBAAAAAAAAAQCAAAAA
+        ["BAAAACBAAAAAAAAAQCAAAAB", "unexpected base 64 char in discs"],
     ),
 )
 def test_board_from_id_fail(id_str: str, expected_error_message: str) -> None:
@@ -99,6 +110,18 @@ def test_board_to_id() -> None:
     assert "B00000008100000000000001008000000" == Board().to_id()
 
 
+def test_board_compact_id_and_key() -> None:
+    assert "BAAAACBAAAAAAAAAQCAAAAA" == Board().to_compact_id()
+    assert bytes.fromhex("0000000008100000000000001008000000") == Board().to_key()
+
+    board = Board.from_discs(0x8000000000000001, 0x10, WHITE)
+    assert board == Board.from_id(board.to_compact_id())
+    assert board == Board.from_key(board.to_key())
+
+    with pytest.raises(ValueError):
+        Board.from_key(b"\x02" + bytes(16))
+
+
 def test_board_field_index_conversion() -> None:
 
     pairs = [(MOVE_PASS, "--")]
@@ -132,6 +155,11 @@ def test_bits_rotate(expected: int, rotation: int) -> None:
     assert expected == bits_rotate(0x22120A0E1222221E, rotation)
 
 
+def test_bits_rotations() -> None:
+    x = 0x22120A0E1222221E
+    assert [bits_rotate(x, rotation) for rotation in range(8)] == bits_rotations(x)
+
+
 @pytest.mark.parametrize(
     ["bits", "rotation"],
     (
@@ -0,0 +1,162 @@
+import os
+from typing import List, Optional
+
+import pytest
+
+from othello.board import Board
+from othello.game import Game
+from othello.jobs import JobQueue
+from othello.mistakes import MistakeStore
+from othello.openings_tree import CheckResult, OpeningsTree
+from othello.pgn_watch import CHECK_STATE_FILENAME, FolderWatcher, PGNChecker
+
+
+def write_pgn(filename: str, moves: str, black: str = "bob") -> None:
+    with open(filename, "w") as file:
+        file.write(f'[Black "{black}"]\n[White "alice"]\n\n1. {moves}\n')
+
+
+def make_tree() -> OpeningsTree:
+    tree = OpeningsTree()
+    after_f5 = Board().do_move(Board.field_to_index("f5"))
+    tree.upsert(after_f5, after_f5.do_move(Board.field_to_index("d6")))
+    return tree
+
+
+def make_checker(
+    folder: str, monkeypatch: pytest.MonkeyPatch, checked: List[str]
+) -> PGNChecker:
+    tree = make_tree()
+    check = tree.check
+
+    def counting_check(
+        game: Game,
+        player_name: str,
+        mistake_store: Optional[MistakeStore] = None,
+        job_queue: Optional[JobQueue] = None,
+    ) -> CheckResult:
+        checked.append(" ".join(game.moves))
+        return check(game, player_name, mistake_store, job_queue)
+
+    monkeypatch.setattr(tree, "check", counting_check)
+    return PGNChecker(folder, tree, f"{folder}/openings.json", "alice")
+
+
+def test_check_folder_incremental(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    folder = str(tmp_path)
+    write_pgn(f"{folder}/1.pgn", "f5 d6")
+    write_pgn(f"{folder}/2.pgn", "f5 f6")
+
+    checked: List[str] = []
+    checker = make_checker(folder, monkeypatch, checked)
+    results = checker.check_folder()
+
+    assert "correct" == results[f"{folder}/1.pgn"].status
+    assert CheckResult("wrong", 2) == results[f"{folder}/2.pgn"]
+    assert 2 == len(checked)
+    assert os.path.exists(f"{folder}/{CHECK_STATE_FILENAME}")
+
+    # unchanged files are skipped, also after a restart
+    checker = make_checker(folder, monkeypatch, checked)
+    assert {} == checker.check_folder()
+    assert 2 == len(checked)
+
+    # a new file with an already checked game uses the cached result
+    write_pgn(f"{folder}/3.pgn", "f5 f6")
+    assert {f"{folder}/3.pgn": CheckResult("wrong", 2)} == checker.check_folder()
+    assert 2 == len(checked)
+
+    # changed contents are checked again
+    write_pgn(f"{folder}/1.pgn", "f5 d6 c3")
+    checker.check_folder()
+    assert 3 == len(checked)
+
+
+def test_book_version_invalidates_cache(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    folder = str(tmp_path)
+    write_pgn(f"{folder}/1.pgn", "f5 f6")
+
+    checked: List[str] = []
+    make_checker(folder, monkeypatch, checked).check_folder()
+
+    write_pgn(f"{folder}/2.pgn", "f5 f6", black="carol")
+    checker = make_checker(folder, monkeypatch, checked)
+    after_f5 = Board().do_move(Board.field_to_index("f5"))
+    checker.openings_tree.upsert(after_f5, after_f5.do_move(Board.field_to_index("f6")))
+
+    # the unchanged file is checked again with the new book, the new one too
+    results = checker.check_folder()
+    assert "correct" == results[f"{folder}/1.pgn"].status
+    assert "correct" == results[f"{folder}/2.pgn"].status
+    assert 3 == len(checked)
+
+    # until the book changes again
+    assert {} == checker.check_folder()
+    assert 3 == len(checked)
+
+
+def test_folder_watcher_debounce(tmp_path: str) -> None:
+    folder = str(tmp_path)
+    now = [0.0]
+    watcher = FolderWatcher(folder, debounce=1.0, clock=lambda: now[0])
+
+    write_pgn(f"{folder}/1.pgn", "f5")
+    assert [] == watcher.poll()
+
+    now[0] = 0.5
+    assert [] == watcher.poll()
+
+    now[0] = 1.0
+    assert [f"{folder}/1.pgn"] == watcher.poll()
+    assert [] == watcher.poll()
+
+    # still being written: the size keeps changing
+    with open(f"{folder}/1.pgn", "a") as file:
+        file.write("d6\n")
+    now[0] = 2.0
+    assert [] == watcher.poll()
+
+    with open(f"{folder}/1.pgn", "a") as file:
+        file.write("c3\n")
+    now[0] = 3.0
+    assert [] == watcher.poll()
+
+    now[0] = 4.0
+    assert [f"{folder}/1.pgn"] == watcher.poll()
+
+
+def test_check_state_saved_once_and_pruned(
+    tmp_path: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    folder = str(tmp_path)
+    for i in range(3):
+        write_pgn(f"{folder}/{i}.pgn", "f5 f6", black=f"player{i}")
+
+    checked: List[str] = []
+    checker = make_checker(folder, monkeypatch, checked)
+    saves: List[str] = []
+    save = checker.state.save
+
+    def counting_save() -> None:
+        saves.append(checker.state.filename)
+        save()
+
+    monkeypatch.setattr(checker.state, "save", counting_save)
+
+    checker.check_folder()
+    assert 1 == len(saves)
+    assert 3 == len(checker.state.results)
+
+    # the results of the old book are dropped with the next batch
+    after_f5 = Board().do_move(Board.field_to_index("f5"))
+    checker.openings_tree.upsert(after_f5, after_f5.do_move(Board.field_to_index("f6")))
+    checker.check_folder()
+
+    book_version = checker.openings_tree.version()
+    assert 2 == len(saves)
+    assert 3 == len(checker.state.results)
+    assert all(key.endswith(f":{book_version}") for key in checker.state.results)
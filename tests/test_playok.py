@@ -0,0 +1,165 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+import pytest
+
+from othello.playok import (
+    KNOWN_GAMES_RUN,
+    GameLink,
+    Manifest,
+    PlayOKDownloader,
+    parse_stats_page,
+)
+
+PGN = """[Event "Reversi"]
+[Black "alice"]
+[White "bob"]
+
+1. f5 d6 2. c3 d3
+"""
+
+
+class StubPlayOK:
+    def __init__(self) -> None:
+        self.base_url = ""
+        self.game_ids: List[str] = []
+        self.requests: List[str] = []
+        self.failures: Dict[str, int] = {}
+
+    def stats_page(self) -> str:
+        rows = "".join(
+            f'<tr><td>2021-01-0{i + 1} 12:00</td><td><a href="/p/?g=rv{game_id}.txt">'
+            "game</a></td></tr>"
+            for i, game_id in enumerate(self.game_ids)
+        )
+        return f"<table><tr><th>date</th><th>game</th></tr>{rows}</table>"
+
+
+@pytest.fixture
+def stub() -> Iterator[StubPlayOK]:
+    stub = StubPlayOK()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            stub.requests.append(self.path)
+
+            if self.path.startswith("/en/stat.phtml"):
+                body = stub.stats_page()
+            else:
+                game_id = self.path.split("rv")[1].split(".")[0]
+                if stub.failures.get(game_id, 0) > 0:
+                    stub.failures[game_id] -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = PGN
+
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.base_url = f"http://127.0.0.1:{server.server_port}"
+
+    yield stub
+
+    server.shutdown()
+    server.server_close()
+
+
+def make_downloader(stub: StubPlayOK, pgn_folder: str) -> PlayOKDownloader:
+    return PlayOKDownloader(
+        pgn_folder,
+        base_url=stub.base_url,
+        workers=3,
+        requests_per_second=0,
+        backoff=0,
+    )
+
+
+def test_download(stub: StubPlayOK, tmp_path: str) -> None:
+    stub.game_ids = ["103", "102", "101"]
+    pgn_folder = str(tmp_path)
+
+    result = make_downloader(stub, pgn_folder).download("alice")
+
+    assert {"101", "102", "103"} == set(result.downloaded)
+    assert ["f5", "d6", "c3", "d3"] == result.downloaded["101"].moves
+    assert os.path.exists(os.path.join(pgn_folder, "2021-01-03", "101.pgn"))
+    assert {"101", "102", "103"} == set(Manifest.load(pgn_folder).games)
+
+
+def test_download_stops_at_known_games(stub: StubPlayOK, tmp_path: str) -> None:
+    stub.game_ids = ["102", "101"]
+    make_downloader(stub, str(tmp_path)).download("alice")
+
+    stub.game_ids = ["104", "103", "102", "101"]
+    stub.requests = []
+    result = make_downloader(stub, str(tmp_path)).download("alice")
+
+    assert {"103", "104"} == set(result.downloaded)
+    assert 3 == len(stub.requests)
+
+
+def test_download_retries_failed_games(stub: StubPlayOK, tmp_path: str) -> None:
+    stub.game_ids = ["103", "102", "101"]
+    stub.failures["102"] = 10
+
+    result = make_downloader(stub, str(tmp_path)).download("alice")
+    assert {"101", "103"} == set(result.downloaded)
+    assert {"102"} == set(result.failed)
+    assert {"102"} == set(Manifest.load(str(tmp_path)).failed)
+
+    # newer games are known, the failed one in between is still fetched
+    stub.failures = {}
+    result = make_downloader(stub, str(tmp_path)).download("alice")
+    assert {"102"} == set(result.downloaded)
+    assert {} == Manifest.load(str(tmp_path)).failed
+
+
+def test_download_stops_after_known_run(stub: StubPlayOK, tmp_path: str) -> None:
+    known = [str(game_id) for game_id in range(120, 100, -1)]
+    stub.game_ids = known[: KNOWN_GAMES_RUN + 1]
+    make_downloader(stub, str(tmp_path)).download("alice")
+
+    stub.game_ids = ["121"] + known
+    result = make_downloader(stub, str(tmp_path)).download("alice")
+
+    assert {"121"} == set(result.downloaded)
+
+
+def test_download_retries(stub: StubPlayOK, tmp_path: str) -> None:
+    stub.game_ids = ["101"]
+    stub.failures["101"] = 2
+
+    result = make_downloader(stub, str(tmp_path)).download("alice")
+
+    assert {"101"} == set(result.downloaded)
+    assert 4 == len(stub.requests)
+
+
+def test_manifest_picks_up_existing_files(tmp_path: str) -> None:
+    os.makedirs(os.path.join(tmp_path, "2021-01-01"))
+    open(os.path.join(tmp_path, "2021-01-01", "42.pgn"), "w").close()
+
+    assert {"42": os.path.join("2021-01-01", "42.pgn")} == Manifest.load(
+        str(tmp_path)
+    ).games
+
+
+def test_parse_stats_page_skips_rows_without_link() -> None:
+    html = (
+        "<table><tr><th>date</th><th>game</th></tr>"
+        "<tr><td>2021-01-01 12:00</td><td>playing</td></tr>"
+        "<tr></tr>"
+        '<tr><td>2021-01-02 12:00</td><td><a href="/p/?g=rv42.txt">game</a></td></tr>'
+        "</table>"
+    )
+    assert [GameLink("42", "2021-01-02", "/p/?g=rv42.txt")] == parse_stats_page(html)
@@ -0,0 +1,84 @@
+import pstats
+import time
+from collections import Counter
+
+import pytest
+
+from othello.board import Board
+from othello.profiling import (
+    Profiler,
+    SamplingProfiler,
+    collapse_samples,
+    collapse_stats,
+    stats_from_samples,
+)
+
+MAIN = ("manage.py", 1, "main")
+DO_MOVE = ("board.py", 200, "do_move")
+ROTATE = ("bits.py", 34, "bits_rotate")
+
+
+def test_stats_from_samples() -> None:
+    stacks = Counter({(MAIN, DO_MOVE): 3, (MAIN, ROTATE): 1, (MAIN,): 1})
+    stats = stats_from_samples(stacks, 0.5)
+
+    assert (3, 3, 1.5, 1.5, {MAIN: (3, 3, 0.0, 1.5)}) == stats[DO_MOVE]
+    assert (5, 5, 0.5, 2.5, {}) == stats[MAIN]
+
+
+def test_collapse_samples() -> None:
+    stacks = Counter({(MAIN, DO_MOVE): 3, (MAIN,): 1})
+
+    assert {
+        "main (manage.py:1);do_move (board.py:200)": 3000,
+        "main (manage.py:1)": 1000,
+    } == collapse_samples(stacks, 0.001)
+
+
+def test_collapse_stats_splits_time_over_callers() -> None:
+    stats = {
+        MAIN: (1, 1, 1.0, 4.0, {}),
+        DO_MOVE: (2, 2, 1.0, 3.0, {MAIN: (2, 2, 1.0, 3.0)}),
+        ROTATE: (4, 4, 2.0, 2.0, {DO_MOVE: (4, 4, 2.0, 2.0)}),
+    }
+
+    assert {
+        "main (manage.py:1)": 1000000,
+        "main (manage.py:1);do_move (board.py:200)": 1000000,
+        "main (manage.py:1);do_move (board.py:200);bits_rotate (bits.py:34)": 2000000,
+    } == collapse_stats(stats)
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sampling"])
+def test_profiler_write(mode: str, tmp_path: str) -> None:
+    profiler = Profiler(mode, interval=0.001)
+    profiler.start()
+
+    # a short workload can go without a single sample, so keep going until one
+    # lands in normalized, the deadline only guards against a broken profiler
+    deadline = time.monotonic() + 10
+    while True:
+        for _ in range(200):
+            for child in Board().get_children():
+                child.normalized()
+
+        if not isinstance(profiler.profiler, SamplingProfiler):
+            break
+        sampled = {
+            name for stack in list(profiler.profiler.stacks) for *_, name in stack
+        }
+        if "normalized" in sampled or time.monotonic() > deadline:
+            break
+
+    profiler.stop()
+
+    pstats_filename, collapsed_filename = profiler.write(f"{tmp_path}/profile")
+
+    functions = {name for _, _, name in pstats.Stats(pstats_filename).stats}
+    assert "normalized" in functions
+
+    with open(collapsed_filename) as collapsed_file:
+        lines = collapsed_file.read().splitlines()
+
+    assert any("normalized (board.py" in line for line in lines)
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
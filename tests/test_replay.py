@@ -0,0 +1,66 @@
+import pytest
+
+from othello.board import Board
+from othello.game import Game
+from othello.replay import ReplayCache
+
+
+def fields(moves: str) -> list:
+    return [Board.field_to_index(field) for field in moves.split()]
+
+
+def test_replay() -> None:
+    cache = ReplayCache()
+    boards = cache.replay(fields("f5 d6 c3"))
+
+    expected = [Board()]
+    for move in fields("f5 d6 c3"):
+        expected.append(expected[-1].do_move(move))
+
+    assert expected == boards
+    assert 3 == cache.misses
+
+
+def test_replay_shares_prefixes() -> None:
+    cache = ReplayCache()
+    cache.replay(fields("f5 d6 c3 d3"))
+    cache.replay(fields("f5 d6 c5"))
+    cache.replay(fields("f5 d6 c3 d3 c4"))
+
+    assert 6 == cache.misses
+    assert 6 == cache.hits
+    assert 7 == cache.size
+
+
+def test_replay_evicts_least_recently_used_leaves() -> None:
+    cache = ReplayCache(max_size=5)
+    cache.replay(fields("f5 d6 c3 d3"))
+    cache.replay(fields("f5 f6"))
+
+    assert 5 == cache.size
+    assert 1 == cache.evictions
+
+    # only the deep end of the first line was evicted
+    misses = cache.misses
+    cache.replay(fields("f5 d6 c3"))
+    assert misses == cache.misses
+
+    cache.replay(fields("f5 d6 c3 d3"))
+    assert misses + 1 == cache.misses
+
+
+def test_replay_invalid_move() -> None:
+    cache = ReplayCache()
+
+    with pytest.raises(ValueError):
+        cache.replay(fields("f5 f5"))
+
+    assert 2 == cache.size
+
+
+def test_game_from_moves() -> None:
+    game = Game.from_moves(["f5", "d6"], {"Black": "alice"})
+
+    assert ["f5", "d6"] == game.moves
+    assert Board().do_move(37).do_move(43) == game.boards[-1]
+    assert "alice" == game.metadata["Black"]
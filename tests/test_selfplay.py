@@ -0,0 +1,53 @@
+from othello.archive import GameArchive
+from othello.board import BLACK, WHITE, Board
+from othello.game import Game
+from othello.selfplay import (
+    SelfPlayConfig,
+    generate_games,
+    opening_moves,
+    play_game,
+    xot_positions,
+)
+
+
+def test_opening_moves() -> None:
+    for me, opp in xot_positions()[:20]:
+        moves = opening_moves(me, opp)
+        game = Game.from_moves([Board.index_to_field(move) for move in moves])
+        final = game.boards[-1]
+        assert (me, opp, BLACK) == (final.me, final.opp, final.turn)
+
+
+def test_play_game() -> None:
+    config = SelfPlayConfig(xot=True, seed=3)
+    moves, metadata = play_game(7, config)
+    assert (moves, metadata) == play_game(7, config)
+    assert "xot" == metadata["Variant"]
+
+    game = Game.from_moves(moves, metadata)
+    final = game.boards[-1]
+    assert not final.get_moves() and not final.do_move(-1).get_moves()
+
+    black, white = metadata["Result"].split("-")
+    assert (int(black), int(white)) == (final.count(BLACK), final.count(WHITE))
+
+
+def test_generate_games_resumes(tmp_path: str) -> None:
+    config = SelfPlayConfig(seed=1)
+
+    filename = f"{tmp_path}/resumed.oga"
+    report = generate_games(filename, 5, 1, config, checkpoint_interval=2)
+    assert (5, 0) == (report.games, report.skipped)
+
+    report = generate_games(filename, 12, 2, config)
+    assert (7, 5) == (report.games, report.skipped)
+
+    generate_games(f"{tmp_path}/single.oga", 12, 1, config)
+
+    with GameArchive(filename) as resumed, GameArchive(
+        f"{tmp_path}/single.oga"
+    ) as single:
+        assert 12 == len(resumed)
+        for i in range(12):
+            assert single[i].moves == resumed[i].moves
+            assert str(i) == resumed.metadata(i)["Game"]
@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Tuple
+
+from othello.board import WHITE, Board
+from training.app import app
+from training.blueprints.api.views import read_openings
+from training.steps import (
+    TrainingStepCache,
+    decode_openings,
+    next_step_boards,
+)
+
+
+def test_next_step_boards() -> None:
+    openings = [
+        [{"board": "a"}, {"board": "b"}, {"board": "c"}],
+        [{"board": "a"}, {"board": "d"}],
+    ]
+    assert {"a": {"b", "d"}, "b": {"c"}} == next_step_boards(openings)
+
+
+def test_training_step_cache() -> None:
+    computed: List[Tuple[str, Tuple[int, ...]]] = []
+
+    def compute(board_id: str, mistakes: Tuple[int, ...]) -> Dict[str, Any]:
+        computed.append((board_id, mistakes))
+        return {"id": board_id}
+
+    cache = TrainingStepCache(compute, max_size=2)
+
+    assert {"id": "a"} == cache.get("a", [3, 1])
+    assert {"id": "a"} == cache.get("a", [1, 3])
+    assert [("a", (1, 3))] == computed
+    assert (1, 1) == (cache.hits, cache.misses)
+
+    cache.prefetch(["b", "c"])
+    cache.join()
+    assert 2 == cache.prefetched
+
+    # prefetched steps are hits, the oldest entry was evicted
+    cache.get("c")
+    assert 2 == cache.hits
+    assert [("a", (1, 3)), ("b", ()), ("c", ())] == computed
+    assert ("a", (1, 3)) not in cache.entries
+    cache.close()
+
+
+def test_training_step_endpoint() -> None:
+    client = app.test_client()
+    opening = read_openings(WHITE)[0]
+    board_id = opening[0]["board"]
+
+    response = client.get(f"/api/training/{board_id}?mistakes=1,x")
+    assert 200 == response.status_code
+    data = response.get_json()
+    assert Board.from_id(board_id).to_id() == data["board"]["id"]
+    assert data["svg"].startswith("<?xml")
+
+    # the svg endpoint renders the same image
+    image = client.get(f"/svg/boards/{board_id}?mistakes=1").get_data(as_text=True)
+    assert image == data["svg"]
+
+    cache = app.extensions["step_cache"]
+    cache.join()
+    hits = cache.hits
+    client.get(f"/api/training/{opening[1]['board']}")
+    assert hits + 1 == cache.hits
+
+    assert 400 == client.get("/api/training/invalid").status_code
+
+
+def test_compact_ids_and_binary_openings() -> None:
+    client = app.test_client()
+    openings = client.get("/api/openings").get_json()
+    board = Board.from_id(openings[0][0]["board"])
+
+    # compact IDs are accepted wherever the long ones are
+    for url in ["/api/boards/{}", "/api/training/{}", "/svg/boards/{}"]:
+        long_response = client.get(url.format(board.to_id()))
+        compact_response = client.get(url.format(board.to_compact_id()))
+        assert 200 == compact_response.status_code
+        assert long_response.get_data() == compact_response.get_data()
+
+    response = client.get("/api/openings?format=binary")
+    assert "application/octet-stream" == response.mimetype
+    assert openings == decode_openings(response.get_data())
+    assert len(response.get_data()) < len(client.get("/api/openings").get_data()) / 3
@@ -10,4 +10,5 @@ app.register_blueprint(api, url_prefix="/api")
 
 @app.route("/")
 def index() -> str:
-    return render_template("index.html")
+    # WebSocket URL of manage.py liveserver, without one the page only uses requests
+    return render_template("index.html", live_url=app.config.get("LIVE_URL", ""))
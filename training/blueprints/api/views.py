@@ -1,11 +1,38 @@
-import json
-from typing import Any, Dict, List
+import atexit
+import os
+import threading
+import tracemalloc
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from flask import Blueprint, Response, current_app, jsonify, make_response, request
+
+from othello.board import BLACK, MOVE_PASS, VALID_MOVE, WHITE, Board
+from othello.book import BookAnnotator
+from othello.features import board_features
+from othello.memory import MemorySite, memory_usage
+from othello.mistakes import MISTAKES_DATABASE_FILENAME, MistakeStore
+from othello.openings_db import (
+    OPENINGS_DATABASE_FILENAME,
+    SQLiteOpeningsTree,
+    release_connections,
+)
+from othello.openings_tree import OpeningsTree
+from othello.replay import ReplayCache, replay_cache
+from training.blueprints.svg.views import parse_mistakes, render_board
+from training.steps import (
+    TrainingStep,
+    TrainingStepCache,
+    encode_openings,
+    next_step_boards,
+)
 
-from flask import Blueprint, Response, jsonify, make_response
+api = Blueprint("api", __name__)
 
-from othello.board import BLACK, MOVE_PASS, VALID_MOVE, WHITE, Board, opponent
+mistake_store_lock = threading.Lock()
 
-api = Blueprint("api", __name__)
+step_cache_lock = threading.Lock()
 
 
 def board_details_children(board: Board) -> Dict[str, dict]:
@@ -40,6 +67,7 @@ def board_dict(board: Board) -> Dict[str, Any]:
                 "white": board.count(WHITE),
             },
             "moves": len(children),
+            "features": board_features(board),
         },
     }
 
@@ -51,74 +79,297 @@ def board_details(board_id: str) -> Response:
     except ValueError:
         return make_response("invalid board id", 400)
 
-    return jsonify(board_dict(board))  # type: ignore
+    data = board_dict(board)
 
+    # ?book=1 marks the book move and the book reply after every move
+    if request.args.get("book"):
+        annotations = request_openings().book.children(board)
+        for move, child in data["children"].items():
+            child.update(annotations[move])
 
-def get_openings_recursive(
-    tree: dict, openings: List[List[str]], prefix: List[str]
-) -> None:
+    return jsonify(data)  # type: ignore
 
-    if isinstance(tree, str):
-        try:
-            Board.field_to_index(tree)
-        except ValueError:
-            if tree == "transposition":
-                return
 
-            openings.append(prefix)
-            return
+OPENINGS_FILENAME = "openings.json"
 
-        openings.append(prefix + [tree])
-        return
+openings_lock = threading.Lock()
 
-    if isinstance(tree, dict):
-        for move, subtree in tree.items():
-            get_openings_recursive(subtree, openings, prefix + [move])
-        return
 
-    raise TypeError(f"unexpected type {type(tree)}")
+@dataclass
+class TrainingOpenings:
+    steps: Dict[int, list]
+    next_boards: Dict[str, Set[str]]
+    book: BookAnnotator
+    # the openings of both colors for ?format=binary, see openings_binary
+    binary: Optional[bytes] = None
 
 
-def read_openings(color: int) -> list:
-    filename = {WHITE: "white", BLACK: "black"}[color] + ".json"
-    tree = json.load(open(filename, "r"))
+# books kept in _openings_cache, the least recently used one is dropped
+MAX_CACHED_OPENINGS = 32
 
-    openings_list: List[List[str]] = []
-    get_openings_recursive(tree, openings_list, [])
-
-    response = []
+CachedOpenings = Tuple[object, TrainingOpenings]
 
-    for opening in openings_list:
-        moves: List[int] = [Board.field_to_index(field) for field in opening]
+# (filename, user) -> (book version, openings), rebuilt once the book changes
+_openings_cache: "OrderedDict[Tuple[str, Optional[str]], CachedOpenings]" = (
+    OrderedDict()
+)
 
-        opening_steps: List[dict] = []
 
-        board = Board()
+def opening_steps(openings_tree: OpeningsTree, color: int) -> list:
+    response = []
 
-        if color == BLACK:
-            board = board.do_move(moves[0])
-            moves = moves[1:]
+    # black openings start with our own move, the steps are the pairs after it
+    start = 1 if color == BLACK else 0
 
-        for i in range(len(moves) // 2):
-            move = moves[i * 2]
-            best_child = moves[i * 2 + 1]
+    previous_moves: List[int] = []
+    previous_steps: List[dict] = []
 
-            assert opponent(color) == board.turn
-            board = board.do_move(move)
+    for moves in openings_tree.lines(color):
+        step_count = (len(moves) - start) // 2
+        boards = replay_cache.replay(moves[: start + 2 * step_count])
 
-            opening_steps.append(
-                {"board": board.to_id(), "best_child": moves[i * 2 + 1]}
-            )
+        # lines come in tree order, steps before the first other move are shared
+        shared = 0
+        for move, previous_move in zip(moves, previous_moves):
+            if move != previous_move:
+                break
+            shared += 1
+        opening_steps = previous_steps[: max(0, shared - start) // 2]
 
+        # the board after the opponent's move and our best move on it
+        for index in range(start + 1 + 2 * len(opening_steps), len(boards) - 1, 2):
+            board = boards[index]
             assert color == board.turn
-            board = board.do_move(best_child)
+            opening_steps.append({"board": board.to_id(), "best_child": moves[index]})
 
+        previous_moves, previous_steps = moves, opening_steps
         response.append(opening_steps)
 
     return response
 
 
+def load_openings(
+    filename: str = OPENINGS_FILENAME, user: Optional[str] = None
+) -> TrainingOpenings:
+    # with a user, filename is a database with a book per user
+    key = (filename, user)
+    with openings_lock:
+        cached = _openings_cache.get(key)
+
+    openings_tree: Optional[OpeningsTree] = None
+    version: object
+    if user:
+        # the book of a cached user is reused, it knows its user ID already
+        if cached:
+            openings_tree = cached[1].book.openings_tree
+        else:
+            openings_tree = SQLiteOpeningsTree(filename, user)
+        version = openings_tree.version()
+    else:
+        version = os.stat(filename).st_mtime
+
+    with openings_lock:
+        cached = _openings_cache.get(key)
+        if cached and cached[0] == version:
+            _openings_cache.move_to_end(key)
+            return cached[1]
+
+    # built without the lock, so other books keep loading meanwhile
+    if openings_tree is None:
+        openings_tree = OpeningsTree.from_file(filename)
+
+    steps = {
+        WHITE: opening_steps(openings_tree, WHITE),
+        BLACK: opening_steps(openings_tree, BLACK),
+    }
+    openings = TrainingOpenings(
+        steps,
+        next_step_boards(steps[WHITE] + steps[BLACK]),
+        BookAnnotator(openings_tree),
+    )
+
+    with openings_lock:
+        # a concurrent load of the same version won, everyone shares its openings
+        cached = _openings_cache.get(key)
+        if cached and cached[0] == version:
+            _openings_cache.move_to_end(key)
+            return cached[1]
+
+        _openings_cache[key] = (version, openings)
+        _openings_cache.move_to_end(key)
+        while len(_openings_cache) > MAX_CACHED_OPENINGS:
+            _openings_cache.popitem(last=False)
+        return openings
+
+
+@api.teardown_app_request
+def close_connections(_: Optional[BaseException]) -> None:
+    # the threaded server runs every request on a new thread
+    release_connections()
+
+
+def openings_binary(openings: TrainingOpenings) -> bytes:
+    # encoded on first use, most clients ask for JSON
+    if openings.binary is None:
+        openings.binary = encode_openings(openings.steps[WHITE] + openings.steps[BLACK])
+    return openings.binary
+
+
+def read_openings(
+    color: int, filename: str = OPENINGS_FILENAME, user: Optional[str] = None
+) -> list:
+    return load_openings(filename, user).steps[color]
+
+
+def request_openings() -> TrainingOpenings:
+    # ?user=name trains the book of that user in the OPENINGS_DATABASE
+    user = request.args.get("user")
+    if not user:
+        return load_openings()
+
+    database = current_app.config.get("OPENINGS_DATABASE", OPENINGS_DATABASE_FILENAME)
+    return load_openings(database, user)
+
+
 @api.route("/openings")
 def openings_list() -> Response:
-    openings = read_openings(WHITE) + read_openings(BLACK)
-    return jsonify(openings)  # type: ignore
+    openings = request_openings()
+    if request.args.get("format") == "binary":
+        return Response(openings_binary(openings), mimetype="application/octet-stream")
+
+    steps = openings.steps
+    return jsonify(steps[WHITE] + steps[BLACK])  # type: ignore
+
+
+def training_step(board_id: str, mistakes: Tuple[int, ...]) -> TrainingStep:
+    board = Board.from_id(board_id)
+    return {
+        "board": board_dict(board),
+        "svg": render_board(board, set(mistakes)),
+    }
+
+
+def get_step_cache() -> TrainingStepCache:
+    with step_cache_lock:
+        cache: Optional[TrainingStepCache] = current_app.extensions.get("step_cache")
+        if not cache:
+            cache = TrainingStepCache(training_step)
+            current_app.extensions["step_cache"] = cache
+        return cache
+
+
+@api.route("/training/<board_id>")
+def training_step_details(board_id: str) -> Response:
+    # board details and image in one response, see training/steps.py
+    try:
+        board = Board.from_id(board_id)
+    except ValueError:
+        return make_response("invalid board id", 400)
+
+    mistakes = tuple(sorted(parse_mistakes(request.args.get("mistakes", ""))))
+
+    # a random xot board is different for every request
+    if board_id == "xot":
+        return jsonify(training_step(board.to_id(), mistakes))  # type: ignore
+
+    cache = get_step_cache()
+    step = cache.get(board.to_id(), mistakes)
+    cache.prefetch(request_openings().next_boards.get(board.to_id(), set()))
+    return jsonify(step)  # type: ignore
+
+
+def get_mistake_store() -> MistakeStore:
+    # opened on first use, the database can be set with the MISTAKES_DATABASE config
+    with mistake_store_lock:
+        store: Optional[MistakeStore] = current_app.extensions.get("mistake_store")
+        if not store:
+            store = MistakeStore(
+                current_app.config.get("MISTAKES_DATABASE", MISTAKES_DATABASE_FILENAME)
+            )
+            current_app.extensions["mistake_store"] = store
+            atexit.register(store.close)
+        return store
+
+
+@api.route("/mistakes", methods=["POST"])
+def add_mistake() -> Response:
+    data = request.get_json(silent=True) or {}
+
+    try:
+        board = Board.from_id(str(data["board"]))
+        move = int(data["move"])
+    except (KeyError, TypeError, ValueError):
+        return make_response("expected board ID and move", 400)
+
+    if move not in range(64) or not board.get_moves() & (1 << move):
+        return make_response("invalid move", 400)
+
+    get_mistake_store().record(board, move, "training")
+    return make_response("", 204)
+
+
+@api.route("/mistakes")
+def weakest_positions() -> Response:
+    try:
+        top = min(int(request.args.get("top", 10)), 100)
+    except ValueError:
+        return make_response("invalid top value", 400)
+
+    # SQLite takes a negative LIMIT as no limit at all
+    if top < 1:
+        return make_response("invalid top value", 400)
+
+    return jsonify(get_mistake_store().weakest(top))  # type: ignore
+
+
+def memory_sites() -> List[MemorySite]:
+    # the long-lived structures of the server and the code allocating them
+    return [
+        ("book", OpeningsTree),
+        ("book", SQLiteOpeningsTree),
+        ("training_openings", load_openings),
+        ("training_openings", opening_steps),
+        ("training_openings", next_step_boards),
+        ("training_openings", encode_openings),
+        ("book_annotations", BookAnnotator),
+        ("step_cache", TrainingStepCache),
+        ("replay_cache", ReplayCache),
+    ]
+
+
+def memory_entries(step_cache: Optional[TrainingStepCache]) -> Dict[str, int]:
+    loaded = [openings for _, openings in _openings_cache.values()]
+    return {
+        "book": sum(len(openings.book.openings_tree) for openings in loaded),
+        "training_openings": sum(
+            len(line)
+            for openings in loaded
+            for lines in openings.steps.values()
+            for line in lines
+        ),
+        "book_annotations": sum(len(openings.book.cache) for openings in loaded),
+        "step_cache": len(step_cache.entries) if step_cache else 0,
+        "replay_cache": replay_cache.size,
+    }
+
+
+@api.route("/debug/memory")
+def debug_memory() -> Response:
+    # needs a server started with runserver --trace-memory
+    if not tracemalloc.is_tracing():
+        return make_response("memory is not traced, see runserver --trace-memory", 404)
+
+    usages = memory_usage(
+        memory_sites(), memory_entries(current_app.extensions.get("step_cache"))
+    )
+    return jsonify(  # type: ignore
+        [
+            {
+                "name": usage.name,
+                "bytes": usage.size,
+                "entries": usage.entries,
+                "bytes_per_entry": usage.bytes_per_entry(),
+            }
+            for usage in usages
+        ]
+    )
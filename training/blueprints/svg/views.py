@@ -7,13 +7,19 @@ from othello.board import BLACK, EMPTY, VALID_MOVE, WHITE, Board
 svg = Blueprint("svg", __name__)
 
 
-@svg.route("/boards/<board_id>")
-def board_image(board_id: str) -> Response:
-    try:
-        board = Board.from_id(board_id)
-    except ValueError:
-        return make_response("Invalid board", 400)
+def parse_mistakes(mistakes: str) -> Set[int]:
+    mistake_indexes: Set[int] = set()
 
+    for index in mistakes.split(","):
+        try:
+            mistake_indexes.add(int(index))
+        except ValueError:
+            pass
+
+    return mistake_indexes
+
+
+def render_board(board: Board, mistake_indexes: Set[int]) -> str:
     image_size = 800
     cell_size = image_size / 8
     disc_radius = 0.38 * cell_size
@@ -44,16 +50,6 @@ def board_image(board_id: str) -> Response:
         body += f"""<line x1="0" y1="{offset}" x2="{image_size}" y2="{offset}"
         style="stroke:black; stroke-width:2" />\n"""
 
-    mistakes = request.args.get("mistakes", "")
-
-    mistake_indexes: Set[int] = set()
-
-    for index in mistakes.split(","):
-        try:
-            mistake_indexes.add(int(index))
-        except ValueError:
-            pass
-
     for index, field in enumerate(board.get_fields()):
         circle_x = (cell_size / 2) + cell_size * (index % 8)
         circle_y = (cell_size / 2) + cell_size * (index // 8)
@@ -105,8 +101,19 @@ def board_image(board_id: str) -> Response:
             """
 
     body += "</svg>"
+    return body
+
+
+@svg.route("/boards/<board_id>")
+def board_image(board_id: str) -> Response:
+    try:
+        board = Board.from_id(board_id)
+    except ValueError:
+        return make_response("Invalid board", 400)
+
+    mistake_indexes = parse_mistakes(request.args.get("mistakes", ""))
 
-    response = make_response(body)
+    response = make_response(render_board(board, mistake_indexes))
     response.content_type = "image/svg+xml"
 
     if board_id == "xot":
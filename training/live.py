@@ -0,0 +1,387 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from othello.board import MOVE_PASS, Board
+from othello.mistakes import MistakeStore
+from training.blueprints.api.views import OPENINGS_FILENAME, load_openings
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+MAX_MESSAGE_SIZE = 1 << 20
+
+Message = Dict[str, Any]
+
+
+class WebSocketError(Exception):
+    pass
+
+
+def accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def apply_mask(payload: bytes, key: bytes) -> bytes:
+    # xor with the repeated key as one big integer, much faster than per byte
+    repeated = (key * (len(payload) // 4 + 1))[: len(payload)]
+    masked = int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    return masked.to_bytes(len(payload), "big")
+
+
+def encode_frame(
+    payload: bytes, opcode: int = OPCODE_TEXT, mask: bool = False
+) -> bytes:
+    # clients mask their frames, servers don't
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+
+    if len(payload) < 126:
+        header.append(mask_bit | len(payload))
+    elif len(payload) < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", len(payload))
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", len(payload))
+
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = apply_mask(payload, key)
+
+    return bytes(header) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    first, second = await reader.readexactly(2)
+    fin = bool(first & 0x80)
+    opcode = first & 0x0F
+    length = second & 0x7F
+
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+
+    if length > MAX_MESSAGE_SIZE:
+        raise WebSocketError("message too large")
+
+    key = await reader.readexactly(4) if second & 0x80 else b""
+    payload = await reader.readexactly(length)
+
+    if key:
+        payload = apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+async def read_message(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, mask: bool = False
+) -> Optional[str]:
+    # the next text message, None once the other side closes, pings are answered
+    fragments: List[bytes] = []
+
+    while True:
+        fin, opcode, payload = await read_frame(reader)
+
+        if opcode == OPCODE_CLOSE:
+            writer.write(encode_frame(payload[:2], OPCODE_CLOSE, mask))
+            await writer.drain()
+            return None
+
+        if opcode == OPCODE_PING:
+            writer.write(encode_frame(payload, OPCODE_PONG, mask))
+            continue
+
+        if opcode == OPCODE_PONG:
+            continue
+
+        if opcode not in [OPCODE_TEXT, OPCODE_CONTINUATION]:
+            raise WebSocketError(f"unsupported opcode {opcode}")
+
+        fragments.append(payload)
+        if sum(len(fragment) for fragment in fragments) > MAX_MESSAGE_SIZE:
+            raise WebSocketError("message too large")
+
+        if fin:
+            return b"".join(fragments).decode()
+
+
+async def accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    request = await reader.readuntil(b"\r\n\r\n")
+
+    headers: Dict[str, str] = {}
+    for line in request.decode("latin-1").split("\r\n")[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    key = headers.get("sec-websocket-key")
+    if headers.get("upgrade", "").lower() != "websocket" or not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        return False
+
+    writer.write(
+        (
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n"
+        ).encode()
+    )
+    await writer.drain()
+    return True
+
+
+class LiveSession:
+    # State of one connected page. Moves are checked against the board kept here,
+    # so the page only sends clicks and gets back what changed. Boards are sent as
+    # ID and mistakes, the page gets their details and image from /api/training.
+    def __init__(
+        self,
+        openings_filename: str = OPENINGS_FILENAME,
+        database: Optional[str] = None,
+        mistake_store: Optional[MistakeStore] = None,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.openings_filename = openings_filename
+        self.database = database
+        self.mistake_store = mistake_store
+        self.rng = rng or random.Random()
+
+        self.board = Board()
+        self.mode = "game"
+        self.openings: List[list] = []
+        self.opening_index = 0
+        self.step_index = 0
+        self.mistakes: Set[int] = set()
+        self.flawless = True
+        self.total_openings = 0
+
+    def handle(self, message: Message) -> List[Message]:
+        kind = message.get("type")
+
+        if kind == "new_game":
+            return self.start_game(Board())
+
+        if kind == "xot_game":
+            return self.start_game(Board.from_xot())
+
+        if kind == "training":
+            return self.start_training(message.get("user"))
+
+        if kind == "move":
+            try:
+                move = int(message["move"])
+            except (KeyError, TypeError, ValueError):
+                return [{"type": "error", "message": "expected move"}]
+            return self.move(move)
+
+        return [{"type": "error", "message": f"unknown message type {kind}"}]
+
+    def board_message(self) -> Message:
+        return {
+            "type": "board",
+            "id": self.board.to_id(),
+            "mistakes": sorted(self.mistakes),
+        }
+
+    def progress_message(self) -> Message:
+        return {
+            "type": "progress",
+            "done": self.total_openings - len(self.openings),
+            "total": self.total_openings,
+        }
+
+    def start_game(self, board: Board) -> List[Message]:
+        self.mode = "game"
+        self.board = board
+        self.mistakes = set()
+        return [self.board_message()]
+
+    def start_training(self, user: Optional[str]) -> List[Message]:
+        if user and self.database:
+            openings = load_openings(self.database, user)
+        else:
+            openings = load_openings(self.openings_filename)
+
+        self.openings = [
+            opening
+            for color_openings in openings.steps.values()
+            for opening in color_openings
+            if opening
+        ]
+        self.rng.shuffle(self.openings)
+        self.total_openings = len(self.openings)
+        self.opening_index = 0
+        self.step_index = 0
+        self.flawless = True
+        self.mistakes = set()
+        self.mode = "training"
+
+        if not self.openings:
+            return [self.progress_message()]
+
+        self.board = Board.from_id(self.openings[0][0]["board"])
+        return [self.progress_message(), self.board_message()]
+
+    def move(self, move: int) -> List[Message]:
+        if move not in range(64) or not self.board.get_moves() & (1 << move):
+            return [{"type": "move", "move": move, "valid": False}]
+
+        if self.mode == "training":
+            return self.training_move(move)
+
+        child = self.board.do_move(move)
+
+        # make sure we pass if there are no moves
+        if not child.has_moves():
+            child = child.do_move(MOVE_PASS)
+
+        self.board = child
+        return [{"type": "move", "move": move, "valid": True}, self.board_message()]
+
+    def training_move(self, move: int) -> List[Message]:
+        if not self.openings:
+            return [{"type": "move", "move": move, "valid": True, "correct": None}]
+
+        opening = self.openings[self.opening_index]
+        replies: List[Message] = []
+
+        if move != opening[self.step_index]["best_child"]:
+            replies.append(
+                {"type": "move", "move": move, "valid": True, "correct": False}
+            )
+
+            if move not in self.mistakes:
+                self.mistakes.add(move)
+                self.flawless = False
+                if self.mistake_store:
+                    self.mistake_store.record(self.board, move, "training")
+                replies.append(self.board_message())
+            return replies
+
+        replies.append({"type": "move", "move": move, "valid": True, "correct": True})
+
+        if self.step_index < len(opening) - 1:
+            # more steps remain in this opening
+            self.step_index += 1
+        else:
+            if self.flawless:
+                # no mistakes, the opening is done
+                self.openings.pop(self.opening_index)
+                replies.append(self.progress_message())
+            else:
+                self.opening_index += 1
+
+            if not self.openings:
+                return replies
+
+            self.opening_index %= len(self.openings)
+            self.step_index = 0
+            self.flawless = True
+
+        self.mistakes = set()
+        step = self.openings[self.opening_index][self.step_index]
+        self.board = Board.from_id(step["board"])
+        replies.append(self.board_message())
+        return replies
+
+
+class LiveServer:
+    # Pushes board IDs, move results and training progress over WebSockets. It runs
+    # next to the training app, see manage.py liveserver and runserver --live-url.
+    # All connections are served by one event loop. Messages are handled in the
+    # default executor, loading books and recording mistakes would block every
+    # other connection otherwise.
+    def __init__(
+        self,
+        openings_filename: str = OPENINGS_FILENAME,
+        database: Optional[str] = None,
+        mistake_store: Optional[MistakeStore] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.openings_filename = openings_filename
+        self.database = database
+        self.mistake_store = mistake_store
+        self.rng = random.Random(seed)
+        self.connections = 0
+
+    def new_session(self) -> LiveSession:
+        return LiveSession(
+            self.openings_filename,
+            self.database,
+            self.mistake_store,
+            random.Random(self.rng.random()),
+        )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            if not await accept(reader, writer):
+                return
+
+            self.connections += 1
+            try:
+                await self.serve_session(reader, writer, self.new_session())
+            finally:
+                self.connections -= 1
+
+        except (asyncio.IncompleteReadError, ConnectionError, WebSocketError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_session(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        session: LiveSession,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+
+        # the page gets the initial board without asking
+        replies = await loop.run_in_executor(None, session.handle, {"type": "new_game"})
+
+        while True:
+            for reply in replies:
+                writer.write(encode_frame(json.dumps(reply).encode()))
+            await writer.drain()
+
+            text = await read_message(reader, writer)
+            if text is None:
+                return
+
+            try:
+                message = json.loads(text)
+            except ValueError:
+                replies = [{"type": "error", "message": "invalid JSON"}]
+                continue
+
+            if not isinstance(message, dict):
+                replies = [{"type": "error", "message": "expected an object"}]
+                continue
+
+            # one message at a time, the session is never used by two threads
+            replies = await loop.run_in_executor(None, session.handle, message)
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def run(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
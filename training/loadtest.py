@@ -0,0 +1,272 @@
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+SERVER_MODES = ["subprocess", "thread"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class Server:
+    # Runs the training app on a free local port, in a thread or a subprocess. The
+    # clicked mistakes go to a temporary database, not to the one of the user.
+    def __init__(self, mode: str) -> None:
+        if mode not in SERVER_MODES:
+            raise ValueError(f"unknown server mode {mode}")
+
+        self.mode = mode
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process: Optional[subprocess.Popen] = None
+        self.server: Any = None
+        self.thread: Optional[threading.Thread] = None
+        self.mistakes_folder = tempfile.TemporaryDirectory()
+        self.mistakes_database = f"{self.mistakes_folder.name}/mistakes.sqlite3"
+
+    def __enter__(self) -> "Server":
+        if self.mode == "subprocess":
+            code = (
+                "from training.app import app\n"
+                f"app.config['MISTAKES_DATABASE'] = {self.mistakes_database!r}\n"
+                f"app.run(host='127.0.0.1', port={self.port}, threaded=True)\n"
+            )
+            self.process = subprocess.Popen(
+                [sys.executable, "-c", code],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            from training.app import app
+
+            app.config["MISTAKES_DATABASE"] = self.mistakes_database
+            app.extensions.pop("mistake_store", None)
+            self.server = make_server(
+                "127.0.0.1",
+                self.port,
+                app,
+                threaded=True,
+                request_handler=QuietRequestHandler,
+            )
+            self.thread = threading.Thread(target=self.server.serve_forever)
+            self.thread.daemon = True
+            self.thread.start()
+
+        wait_for_port(self.port, timeout=30)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+
+        if self.server:
+            self.server.shutdown()
+            assert self.thread
+            self.thread.join()
+
+            from training.app import app
+
+            store = app.extensions.pop("mistake_store", None)
+            if store:
+                store.close()
+            del app.config["MISTAKES_DATABASE"]
+
+        self.mistakes_folder.cleanup()
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def percentile(self, percent: float) -> float:
+        # nearest-rank percentile
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        rank = max(1, int(-(-percent * len(ordered) // 100)))
+        return ordered[rank - 1]
+
+
+@dataclass
+class LoadTestReport:
+    endpoints: Dict[str, EndpointStats]
+    sessions: int
+    seconds: float
+
+    def requests(self) -> int:
+        return sum(len(stats.latencies) for stats in self.endpoints.values())
+
+    def throughput(self, endpoint: Optional[str] = None) -> float:
+        if self.seconds == 0:
+            return 0.0
+        if endpoint:
+            return len(self.endpoints[endpoint].latencies) / self.seconds
+        return self.requests() / self.seconds
+
+
+class Client:
+    # replays the requests made by training/static/index.js for one browser tab
+    def __init__(self, url: str, rng: random.Random, mistake_rate: float) -> None:
+        parsed = urlparse(url)
+        assert parsed.hostname and parsed.port
+        self.connection = http.client.HTTPConnection(
+            parsed.hostname, parsed.port, timeout=30
+        )
+        self.rng = rng
+        self.mistake_rate = mistake_rate
+        self.results: List[Tuple[str, float, bool]] = []
+
+    def get(self, endpoint: str, path: str) -> Optional[Any]:
+        return self.request(endpoint, "GET", path)
+
+    def post(self, endpoint: str, path: str, data: Any) -> Optional[Any]:
+        return self.request(endpoint, "POST", path, data)
+
+    def request(
+        self, endpoint: str, method: str, path: str, data: Any = None
+    ) -> Optional[Any]:
+        start = time.perf_counter()
+        try:
+            if data is None:
+                self.connection.request(method, path)
+            else:
+                self.connection.request(
+                    method,
+                    path,
+                    json.dumps(data),
+                    {"Content-Type": "application/json"},
+                )
+            response = self.connection.getresponse()
+            body = response.read()
+            ok = response.status in (200, 204)
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            body = b""
+            ok = False
+
+        self.results.append((endpoint, time.perf_counter() - start, ok))
+
+        if not ok or not body:
+            return None
+        return json.loads(body)
+
+    def update_board(self, board_id: str, mistakes: List[int]) -> Optional[Any]:
+        mistakes_arg = ",".join(str(mistake) for mistake in mistakes)
+        step = self.get(
+            "/api/training", f"/api/training/{board_id}?mistakes={mistakes_arg}"
+        )
+        if step is None:
+            return None
+        return step["board"]
+
+    def session(self, deadline: float) -> None:
+        # page load, then the training button, then clicks until the deadline
+        self.update_board("initial", [])
+        openings = self.get("/api/openings", "/api/openings")
+        if not openings:
+            return
+
+        self.rng.shuffle(openings)
+
+        for opening in openings:
+            for step in opening:
+                board = self.update_board(step["board"], [])
+                if board is None:
+                    return
+
+                mistakes: List[int] = []
+                wrong_moves = [
+                    int(move)
+                    for move in board["children"]
+                    if int(move) != step["best_child"]
+                ]
+
+                while wrong_moves and self.rng.random() < self.mistake_rate:
+                    if time.perf_counter() >= deadline:
+                        return
+                    mistake = wrong_moves.pop(self.rng.randrange(len(wrong_moves)))
+                    mistakes.append(mistake)
+                    self.post(
+                        "/api/mistakes",
+                        "/api/mistakes",
+                        {"board": board["id"], "move": mistake},
+                    )
+                    self.update_board(board["id"], mistakes)
+
+                if time.perf_counter() >= deadline:
+                    return
+
+
+def run_load_test(
+    url: str,
+    clients: int,
+    seconds: float,
+    mistake_rate: float = 0.2,
+    seed: int = 0,
+) -> LoadTestReport:
+    deadline = time.perf_counter() + seconds
+    sessions = [0] * clients
+    workers: List[Client] = []
+
+    def work(index: int) -> None:
+        client = workers[index]
+        while time.perf_counter() < deadline:
+            client.session(deadline)
+            sessions[index] += 1
+        client.connection.close()
+
+    for index in range(clients):
+        workers.append(Client(url, random.Random(seed + index), mistake_rate))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+    for client in workers:
+        for endpoint, latency, ok in client.results:
+            if ok:
+                endpoints[endpoint].latencies.append(latency)
+            else:
+                endpoints[endpoint].errors += 1
+
+    return LoadTestReport(dict(endpoints), sum(sessions), elapsed)
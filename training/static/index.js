@@ -1,6 +1,11 @@
 
 let board = {};
 let mode = "game";
+
+// ?user=name trains the book of that user
+let user = new URLSearchParams(window.location.search).get('user');
+let user_query = user ? 'user=' + encodeURIComponent(user) : '';
+
 let training = {
     openings: [],
     opening_id: 0,
@@ -17,30 +22,102 @@ function shuffle_array(array) {
     }
 }
 
+// socket to the live server, see manage.py liveserver and runserver --live-url.
+// Without one, or once it closes, clicks are sent as requests.
+let live = null;
+
+// steps by board ID and mistakes, the live server only sends those
+let live_steps = new Map();
+const MAX_LIVE_STEPS = 256;
+let live_step_key = null;
+
+function show_board(data) {
+    board = data.board;
+    $("#board").attr('src', 'data:image/svg+xml;charset=utf-8,' + encodeURIComponent(data.svg));
+}
+
 function update_board(board_id, mistakes = '') {
+    // board details and image come in one response
     $.ajax({
-        url: 'api/boards/' + board_id,
+        url: 'api/training/' + board_id + '?mistakes=' + mistakes + '&' + user_query,
         dataType: 'json'
-    }).done(function (data) {
-        board = data;
-        $("#board").attr('src', 'svg/boards/' + data.id + '?mistakes=' + mistakes);
-    });
+    }).done(show_board);
 }
 
-function update_training_stats() {
-    let done = training.total_openings - training.openings.length;
-    let total = training.total_openings;
+function show_training_stats(done, total) {
     let ratio = Math.floor(100 * done / total);
 
     let text = "Training: " + done + " / " + total + " = " + ratio + "%";
     $('.training-stats-wrapper').text(text);
 }
 
+function update_training_stats() {
+    show_training_stats(training.total_openings - training.openings.length, training.total_openings);
+}
+
+function show_live_step(board_id, mistakes) {
+    // details and image of a pushed board, fetched once per board and mistakes
+    let key = board_id + '?mistakes=' + mistakes.join(',');
+    live_step_key = key;
+
+    if (live_steps.has(key)) {
+        show_board(live_steps.get(key));
+        return;
+    }
+
+    $.ajax({
+        url: 'api/training/' + key + '&' + user_query,
+        dataType: 'json'
+    }).done(function (data) {
+        live_steps.set(key, data);
+        if (live_steps.size > MAX_LIVE_STEPS) {
+            live_steps.delete(live_steps.keys().next().value);
+        }
+
+        // a later board may have been pushed meanwhile
+        if (live_step_key == key) {
+            show_board(data);
+        }
+    });
+}
+
+function connect_live(url) {
+    // the server checks moves and pushes board IDs and training progress
+    let socket = new WebSocket(url);
+
+    socket.onopen = function () {
+        live = socket;
+    };
+    socket.onclose = function () {
+        if (live) {
+            console.warn('live server ' + url + ' closed, sending requests instead');
+        } else {
+            console.warn('live server ' + url + ' unavailable, sending requests instead');
+        }
+        live = null;
+    };
+    socket.onmessage = function (e) {
+        let message = JSON.parse(e.data);
+
+        if (message.type == "board") {
+            show_live_step(message.id, message.mistakes);
+        }
+        if (message.type == "progress") {
+            show_training_stats(message.done, message.total);
+        }
+    };
+}
+
 $(document).ready(function (e) {
 
     $('.training-stats-wrapper').hide();
     update_board('initial');
 
+    let live_url = $('body').data('live-url');
+    if (live_url) {
+        connect_live(live_url);
+    }
+
     $('#board').mousedown(function (e) {
         let posX = e.pageX - $(this).offset().left;
         let posY = e.pageY - $(this).offset().top;
@@ -50,6 +127,11 @@ $(document).ready(function (e) {
 
         let field_id = 8 * Math.floor(posY / field_width) + Math.floor(posX / field_height);
 
+        if (live) {
+            live.send(JSON.stringify({type: "move", move: field_id}));
+            return;
+        }
+
         if (field_id in board.children) {
             if (mode == "game") {
                 update_board(board.children[field_id].id);
@@ -100,6 +182,12 @@ $(document).ready(function (e) {
                     }
                     training.mistakes[field_id] = true;
                     training.flawless = false;
+                    $.ajax({
+                        url: 'api/mistakes',
+                        method: 'POST',
+                        contentType: 'application/json',
+                        data: JSON.stringify({board: board.id, move: field_id})
+                    });
                     mistakes = Object.keys(training.mistakes).join(',');
                     update_board(board.id, mistakes);
                 }
@@ -108,20 +196,35 @@ $(document).ready(function (e) {
     });
 
     $('#new_game').click(function (e) {
-        update_board('initial');
+        if (live) {
+            live.send(JSON.stringify({type: "new_game"}));
+        } else {
+            update_board('initial');
+        }
         $('.training-stats-wrapper').hide();
         mode = "game";
     });
 
     $('#xot_game').click(function (e) {
-        update_board('xot');
+        if (live) {
+            live.send(JSON.stringify({type: "xot_game"}));
+        } else {
+            update_board('xot');
+        }
         $('.training-stats-wrapper').hide();
         mode = "game";
     });
 
     $('#training').click(function (e) {
+        if (live) {
+            live.send(JSON.stringify({type: "training", user: user}));
+            $('.training-stats-wrapper').show();
+            mode = "training";
+            return;
+        }
+
         $.ajax({
-            url: 'api/openings',
+            url: 'api/openings?' + user_query,
             dataType: 'json'
         }).done(function (data) {
             shuffle_array(data);
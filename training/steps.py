@@ -0,0 +1,123 @@
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from othello.board import KEY_SIZE, Board
+
+# board ID, sorted mistake indexes
+StepKey = Tuple[str, Tuple[int, ...]]
+
+TrainingStep = Dict[str, Any]
+
+
+def next_step_boards(openings: List[list]) -> Dict[str, Set[str]]:
+    # board of every opening step mapped to the boards of the steps following it
+    next_boards: Dict[str, Set[str]] = defaultdict(set)
+    for opening in openings:
+        for step, next_step in zip(opening, opening[1:]):
+            next_boards[step["board"]].add(next_step["board"])
+    return dict(next_boards)
+
+
+def encode_openings(openings: List[list]) -> bytes:
+    # per opening the number of steps, then per step the board key and best move
+    chunks: List[bytes] = []
+    # openings share their first steps, every board is encoded once
+    keys: Dict[str, bytes] = {}
+    for opening in openings:
+        chunks.append(struct.pack("!H", len(opening)))
+        for step in opening:
+            board_id = step["board"]
+            if board_id not in keys:
+                keys[board_id] = Board.from_id(board_id).to_key()
+            chunks.append(keys[board_id])
+            chunks.append(bytes([step["best_child"]]))
+    return b"".join(chunks)
+
+
+def decode_openings(data: bytes) -> List[list]:
+    openings: List[list] = []
+    offset = 0
+    while offset < len(data):
+        (step_count,) = struct.unpack_from("!H", data, offset)
+        offset += 2
+
+        opening: List[dict] = []
+        for _ in range(step_count):
+            board = Board.from_key(data[offset : offset + KEY_SIZE])
+            best_child = data[offset + KEY_SIZE]
+            opening.append({"board": board.to_id(), "best_child": best_child})
+            offset += KEY_SIZE + 1
+        openings.append(opening)
+    return openings
+
+
+class TrainingStepCache:
+    # Responses of the training step endpoint, least recently used first. The
+    # steps following a requested board are computed on a background thread, so
+    # the response for a correct answer is ready before it is clicked.
+    def __init__(
+        self,
+        compute: Callable[[str, Tuple[int, ...]], TrainingStep],
+        max_size: int = 10_000,
+    ) -> None:
+        self.compute = compute
+        self.max_size = max_size
+        self.entries: "OrderedDict[StepKey, TrainingStep]" = OrderedDict()
+        self.pending: Set[StepKey] = set()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def get(self, board_id: str, mistakes: Iterable[int] = ()) -> TrainingStep:
+        key = (board_id, tuple(sorted(mistakes)))
+
+        with self.lock:
+            step = self.entries.get(key)
+            if step is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return step
+            self.misses += 1
+
+        step = self.compute(*key)
+        self._store(key, step)
+        return step
+
+    def prefetch(self, board_ids: Iterable[str]) -> None:
+        for board_id in board_ids:
+            key: StepKey = (board_id, ())
+
+            with self.lock:
+                if key in self.entries or key in self.pending:
+                    continue
+                self.pending.add(key)
+
+            self.executor.submit(self._prefetch, key)
+
+    def join(self) -> None:
+        # the single worker runs tasks in order, so this waits for earlier prefetches
+        self.executor.submit(lambda: None).result()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def _prefetch(self, key: StepKey) -> None:
+        try:
+            self._store(key, self.compute(*key))
+            with self.lock:
+                self.prefetched += 1
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def _store(self, key: StepKey, step: TrainingStep) -> None:
+        with self.lock:
+            self.entries[key] = step
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)